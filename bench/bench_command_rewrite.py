@@ -0,0 +1,46 @@
+"""
+Rewriting long command strings with thousands of qualified {input.*} and
+{output.*} references, e.g. a generated script copying many files.
+
+    python -m bench.bench_command_rewrite
+"""
+
+import time
+
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.snakemake_rule import SnakemakeRule, PARSE_CACHE
+
+_WORKING_DIR = '/home/user/project'
+
+
+def _make_command(nFiles):
+    cmdString = '; '.join('cp raw/{0:05}.fq.gz backup/{0:05}.fq.gz'.format(i) for i in range(nFiles))
+    return Command(id=nFiles, command=cmdString, workingDir=_WORKING_DIR,
+                   fileReadEvents=[FileReadEvent(path='{}/raw/{:05}.fq.gz'.format(_WORKING_DIR, i))
+                                   for i in range(nFiles)],
+                   fileWriteEvents=[FileWriteEvent(path='{}/backup/{:05}.fq.gz'.format(_WORKING_DIR, i))
+                                    for i in range(nFiles)])
+
+
+class _TimedRule(SnakemakeRule):
+    def _generate_command_string_with_IO_vars(self, cmdMeta):
+        start = time.perf_counter()
+        result = super()._generate_command_string_with_IO_vars(cmdMeta)
+        self.rewriteSeconds = time.perf_counter() - start
+        return result
+
+
+def main():
+    PARSE_CACHE.maxSize = 0
+    for nFiles in (1000, 5000, 20000):
+        cmd = _make_command(nFiles)
+        start = time.perf_counter()
+        rule = _TimedRule(cmd)
+        elapsed = time.perf_counter() - start
+        assert rule.processedCommandString.startswith('cp {input.in_0} {output.out_0}; ')
+        print('{:6} files, {:7} chars: rewrite {:.4f}s, whole rule {:.3f}s'
+              .format(nFiles, len(cmd.command), rule.rewriteSeconds, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Dependency graph construction and topological ordering for large sessions:
+per-sample pipelines of a few steps each, all reading a shared reference.
+The time per command should stay constant with a growing session.
+Also prune the session to the rules needed for a single sample's output.
+
+    python -m bench.bench_dependency_graph
+"""
+
+import time
+
+from shournal_to_snakemake.command_loader import CommandLoader
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+
+_WORKING_DIR = '/home/user/project'
+_STEPS = ('trim', 'align', 'sort', 'count')
+
+
+def _make_commands(nSamples):
+    cmds = [Command(id=0, command='./make_ref.sh', workingDir=_WORKING_DIR, fileReadEvents=[],
+                    fileWriteEvents=[FileWriteEvent(path=_WORKING_DIR + '/ref.fa')])]
+    for s in range(nSamples):
+        previous = '{}/raw/{}.fq'.format(_WORKING_DIR, s)
+        for step in _STEPS:
+            out = '{}/{}/{}.out'.format(_WORKING_DIR, step, s)
+            cmds.append(Command(id=len(cmds), command='./{}.sh'.format(step), workingDir=_WORKING_DIR,
+                                fileReadEvents=[FileReadEvent(path=previous),
+                                                FileReadEvent(path=_WORKING_DIR + '/ref.fa')],
+                                fileWriteEvents=[FileWriteEvent(path=out)]))
+            previous = out
+    # the final report reads all counts
+    cmds.append(Command(id=len(cmds), command='./report.sh', workingDir=_WORKING_DIR,
+                        fileReadEvents=[FileReadEvent(path='{}/count/{}.out'.format(_WORKING_DIR, s))
+                                        for s in range(nSamples)],
+                        fileWriteEvents=[FileWriteEvent(path=_WORKING_DIR + '/report.html')]))
+    return cmds
+
+
+def main():
+    for nSamples in (5000, 10000, 25000, 50000):
+        cmds = _make_commands(nSamples)
+        loader = CommandLoader()
+        for c in cmds:
+            loader.maybde_add_command(c)
+        start = time.perf_counter()
+        loader.order_by_dependencies()
+        elapsed = time.perf_counter() - start
+        print('{:6} commands, {:7} edges: {:.3f}s, {:.2f}us/command'
+              .format(len(cmds), sum(len(loader.dependencyGraph.successors(i)) for i in range(len(cmds))),
+                      elapsed, elapsed / len(cmds) * 1e6))
+
+        start = time.perf_counter()
+        loader.restrict_to_targets(['{}/count/{}.out'.format(_WORKING_DIR, nSamples // 2)])
+        print('{:6} commands, pruned to {} for one target: {:.3f}s'
+              .format(len(cmds), len(loader.commands), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Duplicate detection for heavily repeated command strings, e.g. a loop
+running the same script 50k times with different output files. The time
+per command should stay constant with a growing number of repetitions.
+
+    python -m bench.bench_duplicate_detection
+"""
+
+import time
+
+from shournal_to_snakemake.command_loader import CommandLoader
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+
+
+def _make_commands(count, workingDir='/home/user/project'):
+    cmds = []
+    for i in range(count):
+        cmds.append(Command(id=i, command='./process.sh', workingDir=workingDir,
+                            fileReadEvents=[FileReadEvent(path=workingDir + '/process.sh'),
+                                            FileReadEvent(path='{}/in/{}.txt'.format(workingDir, i))],
+                            fileWriteEvents=[FileWriteEvent(path='{}/out/{}.txt'.format(workingDir, i))]))
+    # every tenth command is repeated exactly
+    cmds.extend(Command(id=count + i, command=c.command, workingDir=workingDir,
+                        fileReadEvents=list(c.fileReadEvents), fileWriteEvents=list(c.fileWriteEvents))
+                for i, c in enumerate(cmds[::10]))
+    return cmds
+
+
+def main():
+    for count in (5000, 10000, 25000, 50000):
+        cmds = _make_commands(count)
+        loader = CommandLoader()
+        start = time.perf_counter()
+        for c in cmds:
+            loader.maybde_add_command(c)
+        elapsed = time.perf_counter() - start
+        print('{:6} commands ({} duplicates): {:.3f}s, {:.2f}us/command'
+              .format(len(cmds), len(cmds) - len(loader.commands), elapsed, elapsed / len(cmds) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Compare the json backends for decoding shournal's COMMAND-lines into Command objects.
+
+    python -m bench.bench_json_decoder
+"""
+
+import time
+
+from shournal_to_snakemake.json_decoder import JsonDecoder, BACKENDS
+from bench.synthetic import make_session_lines
+
+
+def main(nCommands=20000, readsPerCommand=50):
+    lines = [l[len(b'COMMAND:'):] for l in make_session_lines(nCommands, readsPerCommand)
+             if l.startswith(b'COMMAND:')]
+    nEvents = nCommands * (readsPerCommand + 2)
+    print('{} commands, {} file events'.format(nCommands, nEvents))
+
+    baseline = None
+    for backend in reversed(BACKENDS):
+        try:
+            decoder = JsonDecoder(backend)
+        except ImportError:
+            print('{:>8}: not installed'.format(backend))
+            continue
+        start = time.perf_counter()
+        for line in lines:
+            decoder.decode_command(line)
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = elapsed
+        print('{:>8}: {:.3f}s  ({:.0f} events/s, speedup {:.2f}x)'
+              .format(backend, elapsed, nEvents / elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare the memory footprint of the slotted Command/FileReadEvent/FileWriteEvent
+model with the former dict-backed one on a synthetic session, after all
+read events were materialized.
+
+    python -m bench.bench_memory_model [N_EVENTS]
+"""
+
+import gc
+import sys
+import json
+import tracemalloc
+
+from shournal_to_snakemake.command import Command
+from bench.synthetic import make_raw_command
+
+
+class _DictCommand:
+    """ The former model: the decoded json-dicts are adopted as __dict__ """
+    @classmethod
+    def from_json(cls, rawJson):
+        cmd = cls()
+        cmd.__dict__ = rawJson
+        for i in range(len(cmd.fileReadEvents)):
+            f = _DictEvent()
+            f.__dict__ = cmd.fileReadEvents[i]
+            cmd.fileReadEvents[i] = f
+        for i in range(len(cmd.fileWriteEvents)):
+            f = _DictEvent()
+            f.__dict__ = cmd.fileWriteEvents[i]
+            cmd.fileWriteEvents[i] = f
+        return cmd
+
+
+class _DictEvent:
+    pass
+
+
+def _measure(model, lines):
+    gc.collect()
+    tracemalloc.start()
+    cmds = [model.from_json(json.loads(l)) for l in lines]
+    # Command decodes the read events lazily and keeps the raw dicts until then.
+    # Materialize them, as for every accepted command, to compare the retained models.
+    for cmd in cmds:
+        cmd.fileReadEvents
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cmds
+    return current
+
+
+def main(nEvents=1000000, eventsPerCommand=100):
+    nCommands = nEvents // eventsPerCommand
+    lines = []
+    for i in range(nCommands):
+        readPaths = ['/home/user/project/data/sample{}/part{}.txt'.format(i, j) for j in range(eventsPerCommand - 1)]
+        raw = make_raw_command(i, 'cat data/sample{0}/* > out{0}'.format(i), '/home/user/project',
+                               readPaths=readPaths, writePaths=['/home/user/project/out{}'.format(i)])
+        lines.append(json.dumps(raw))
+    print('{} commands, {} file events'.format(nCommands, nCommands * eventsPerCommand))
+
+    dictBytes = _measure(_DictCommand, lines)
+    slotBytes = _measure(Command, lines)
+    print('dict-backed: {:8.1f} MiB'.format(dictBytes / 2**20))
+    print('slotted:     {:8.1f} MiB  ({:.0f}% less)'.format(slotBytes / 2**20,
+                                                           100 * (1 - slotBytes / dictBytes)))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,47 @@
+"""
+Normalization of the file events of a single command touching tens of
+thousands of files (e.g. a python interpreter importing site-packages),
+with many of them dropped. The time per event should stay constant with
+a growing number of events.
+
+    python -m bench.bench_normalize_events
+"""
+
+import time
+
+from shournal_to_snakemake.command_loader import CommandLoader
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+
+_WORKING_DIR = '/home/user/project'
+
+
+def _make_command(cmdId, nReadEvents):
+    readEvents = []
+    for i in range(nReadEvents):
+        if i % 3 == 0:
+            path = '/usr/lib/python3/site-packages/pkg{}/mod{}.py'.format(i % 101, i)
+        elif i % 3 == 1:
+            path = '{}/data/{}.csv'.format(_WORKING_DIR, i)
+        else:
+            # re-read of an earlier file -> duplicate
+            path = '{}/data/{}.csv'.format(_WORKING_DIR, i - 1)
+        readEvents.append(FileReadEvent(path=path))
+    return Command(id=cmdId, command='python analyze.py', workingDir=_WORKING_DIR,
+                   fileReadEvents=readEvents,
+                   fileWriteEvents=[FileWriteEvent(path=_WORKING_DIR + '/out{}'.format(cmdId))])
+
+
+def main():
+    for nReadEvents in (10000, 50000, 100000, 200000):
+        cmd = _make_command(nReadEvents, nReadEvents)
+        loader = CommandLoader()
+        loader.excludeRoots = ['/usr']
+        start = time.perf_counter()
+        loader.maybde_add_command(cmd)
+        elapsed = time.perf_counter() - start
+        print('{:6} read events ({} kept): {:.3f}s, {:.2f}us/event'
+              .format(nReadEvents, len(cmd.fileReadEvents), elapsed, elapsed / nReadEvents * 1e6))
+
+
+if __name__ == '__main__':
+    main()
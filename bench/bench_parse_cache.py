@@ -0,0 +1,43 @@
+"""
+Rule generation for a session in which few, long command strings recur many
+times with different files, with and without the parse cache.
+
+    python -m bench.bench_parse_cache
+"""
+
+import time
+
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.rule_generator import RuleGenerator
+from shournal_to_snakemake.snakemake_rule import PARSE_CACHE
+
+_WORKING_DIR = '/home/user/project'
+_SCRIPTS = ['./run.sh --threads 8 --config config/{}.yaml --log logs/run.log'.format(i) for i in range(20)] + \
+           ['make -j 8 -C build all 2>&1 | tee build.log',
+            'python analyze.py ' + ' '.join('data/part_{:03}.csv'.format(i) for i in range(200)) + ' > out.tsv']
+
+
+def _make_commands(count):
+    cmds = []
+    for i in range(count):
+        cmd = _SCRIPTS[i % len(_SCRIPTS)]
+        cmds.append(Command(id=i, command=cmd, workingDir=_WORKING_DIR,
+                            fileReadEvents=[FileReadEvent(path=_WORKING_DIR + '/data/part_{:03}.csv'.format(i % 200))],
+                            fileWriteEvents=[FileWriteEvent(path=_WORKING_DIR + '/out.tsv')]))
+    return cmds
+
+
+def main():
+    cmds = _make_commands(20000)
+    for cacheSize in (0, PARSE_CACHE.maxSize):
+        PARSE_CACHE.clear()
+        PARSE_CACHE.maxSize = cacheSize
+        start = time.perf_counter()
+        for _ in RuleGenerator().generate(cmds):
+            pass
+        print('cache size {:5}: {:.3f}s, {} hits, {} misses'
+              .format(cacheSize, time.perf_counter() - start, PARSE_CACHE.hits, PARSE_CACHE.misses))
+
+
+if __name__ == '__main__':
+    main()
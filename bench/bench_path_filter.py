@@ -0,0 +1,71 @@
+"""
+Filter commands carrying 10k+ read events by many include/exclude roots:
+the compiled prefix trie against checking every root with util.is_subpath.
+
+    python -m bench.bench_path_filter
+"""
+
+import time
+
+from shournal_to_snakemake.command_loader import CommandLoader
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.path_filter import PathPrefixFilter
+from shournal_to_snakemake.util import is_subpath
+
+_WORKING_DIR = '/home/user/project'
+_EXCLUDE_ROOTS = ['/usr', '/proc', '/sys', '/dev', '/etc', '/opt/conda/envs', '/home/user/.cache',
+                  '/home/user/.local', '/var', '/tmp'] + ['/mnt/vol{}'.format(i) for i in range(20)]
+_INCLUDE_ROOTS = ['/mnt/vol3/data', '/mnt/vol7/data']
+
+
+def _make_paths(count):
+    prefixes = ['/usr/lib/python3/site-packages/pkg{}', '/home/user/project/data/{}',
+                '/mnt/vol3/data/sample{}', '/opt/conda/envs/py3/lib/mod{}', '/srv/shared/ref{}']
+    return ['{}/file{}'.format(prefixes[i % len(prefixes)].format(i % 97), i) for i in range(count)]
+
+
+def _naive_keeps(path):
+    # the most specific root wins
+    best = None
+    for root, keep in [(r, False) for r in _EXCLUDE_ROOTS] + [(r, True) for r in _INCLUDE_ROOTS]:
+        if is_subpath(path, root, allowEquals=True) and (best is None or len(root) > len(best[0])):
+            best = (root, keep)
+    return True if best is None else best[1]
+
+
+def main(nReadEvents=20000):
+    paths = _make_paths(nReadEvents)
+
+    start = time.perf_counter()
+    naive = [_naive_keeps(p) for p in paths]
+    naiveElapsed = time.perf_counter() - start
+
+    pathFilter = PathPrefixFilter()
+    for r in _EXCLUDE_ROOTS:
+        pathFilter.add_root(r, False)
+    for r in _INCLUDE_ROOTS:
+        pathFilter.add_root(r, True)
+    start = time.perf_counter()
+    compiled = [pathFilter.keeps(p) for p in paths]
+    trieElapsed = time.perf_counter() - start
+    assert naive == compiled
+
+    print('{} paths, {} roots'.format(len(paths), len(_EXCLUDE_ROOTS) + len(_INCLUDE_ROOTS)))
+    print('is_subpath per root: {:.3f}s'.format(naiveElapsed))
+    print('prefix trie:         {:.3f}s ({:.1f}x)'.format(trieElapsed, naiveElapsed / trieElapsed))
+
+    # end-to-end: the same files are read by many commands (decisions are cached per path)
+    loader = CommandLoader()
+    loader.excludeRoots = _EXCLUDE_ROOTS
+    loader.includeRoots = _INCLUDE_ROOTS
+    start = time.perf_counter()
+    for i in range(10):
+        loader.maybde_add_command(Command(id=i, command='python analyze.py', workingDir=_WORKING_DIR,
+                                          fileReadEvents=[FileReadEvent(path=p) for p in paths],
+                                          fileWriteEvents=[FileWriteEvent(path=_WORKING_DIR + '/out{}'.format(i))]))
+    print('CommandLoader, 10 commands with {} read events each: {:.3f}s'
+          .format(len(paths), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
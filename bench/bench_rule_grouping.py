@@ -0,0 +1,40 @@
+"""
+Wildcard inference for a session dominated by per-sample loops: the time
+per rule should stay constant with a growing number of samples.
+
+    python -m bench.bench_rule_grouping
+"""
+
+import time
+
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.rule_generator import RuleGenerator
+from shournal_to_snakemake.rule_grouping import group_rules
+
+_WORKING_DIR = '/home/user/project'
+
+
+def _make_commands(nSamples):
+    cmds = []
+    for s in range(nSamples):
+        for step, cmdTemplate in (('sam', 'bwa mem ref.fa raw/s{0}.fq > aln/s{0}.sam'),
+                                  ('bam', 'samtools sort aln/s{0}.sam -o aln/s{0}.bam')):
+            readPaths = ['ref.fa', 'raw/s{}.fq'.format(s)] if step == 'sam' else ['aln/s{}.sam'.format(s)]
+            cmds.append(Command(id=len(cmds), command=cmdTemplate.format(s), workingDir=_WORKING_DIR,
+                                fileReadEvents=[FileReadEvent(path=_WORKING_DIR + '/' + p) for p in readPaths],
+                                fileWriteEvents=[FileWriteEvent(path='{}/aln/s{}.{}'.format(_WORKING_DIR, s, step))]))
+    return cmds
+
+
+def main():
+    for nSamples in (1000, 5000, 20000):
+        rules = list(RuleGenerator().build_rules(_make_commands(nSamples)))
+        start = time.perf_counter()
+        grouped = group_rules(rules)
+        elapsed = time.perf_counter() - start
+        print('{:6} rules -> {} rules: {:.3f}s, {:.2f}us/rule'
+              .format(len(rules), len(grouped), elapsed, elapsed / len(rules) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
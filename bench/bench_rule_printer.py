@@ -0,0 +1,64 @@
+"""
+Writing 200k rules: print() per line, as RulePrinter did before, against
+rendering to memory and writing large chunks, directly or in a background thread.
+
+    python -m bench.bench_rule_printer
+"""
+
+import contextlib
+import os
+import time
+
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.rule_printer import RulePrinter, OutputSink, ThreadedOutputSink
+from shournal_to_snakemake.snakemake_rule import SnakemakeRule
+
+_WORKING_DIR = '/home/user/project'
+
+
+def _make_rules(count):
+    rules = []
+    for i in range(count):
+        cmd = Command(id=i, command='bwa mem ref.fa raw/s{0}.fq > aln/s{0}.sam'.format(i), workingDir=_WORKING_DIR,
+                      fileReadEvents=[FileReadEvent(path=_WORKING_DIR + '/ref.fa'),
+                                      FileReadEvent(path='{}/raw/s{}.fq'.format(_WORKING_DIR, i))],
+                      fileWriteEvents=[FileWriteEvent(path='{}/aln/s{}.sam'.format(_WORKING_DIR, i))])
+        rule = SnakemakeRule(cmd)
+        rule.rulename = 'undefined_{}'.format(i + 1)
+        rules.append(rule)
+    return rules
+
+
+def _print_line_by_line(printer, rule):
+    # the former RulePrinter.print
+    for line in printer.render(rule).split('\n')[:-1]:
+        print(line)
+
+
+def main():
+    rules = _make_rules(200000)
+    printer = RulePrinter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for rule in rules:
+            _print_line_by_line(printer, rule)
+        devnull.flush()
+        lineByLine = time.perf_counter() - start
+
+    results = []
+    for sinkClass in (OutputSink, ThreadedOutputSink):
+        with open(os.devnull, 'wb') as devnull:
+            printer.sink = sinkClass(devnull)
+            start = time.perf_counter()
+            for rule in rules:
+                printer.print(rule)
+            printer.sink.close()
+            results.append((sinkClass.__name__, time.perf_counter() - start))
+
+    print('{} rules, print per line: {:.3f}s'.format(len(rules), lineByLine))
+    for name, elapsed in results:
+        print('{} rules, {}: {:.3f}s'.format(len(rules), name, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Tokenizer throughput of the scanner-based ShellTokenizer against the original
+character-by-character implementation, for typical and for long commands.
+Further 1 MB commands and deeply nested command-substitutions, which exceed
+the recursion limit of the original implementation.
+
+    python -m bench.bench_shell_tokenizer
+"""
+
+import sys
+import time
+
+from shournal_to_snakemake.shell_tokenizer import ShellTokenizer
+from test.reference_shell_tokenizer import ReferenceShellTokenizer
+
+_TYPICAL = [
+    'cat "$(ls -1 *.txt)" > all.txt',
+    'bwa mem -t 8 /data/ref/hg38.fa raw/sample_01_R1.fq.gz raw/sample_01_R2.fq.gz > aln/sample_01.sam',
+    "awk -F'\\t' '{print $1, $3}' counts/sample_01.tsv | sort -u >> summary.tsv",
+    'python analyze.py --input=data/measurements.csv --output=results/plot.png --dpi 300 # final',
+]
+
+
+def _measure(makeTokenizer, commands, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for cmd in commands:
+            makeTokenizer().split(cmd)
+    return time.perf_counter() - start
+
+
+def main():
+    longCmd = 'cat ' + ' '.join('data/file_{:05}.txt'.format(i) for i in range(5000)) + ' > all.txt'
+    for name, commands, repeat in (('typical commands', _TYPICAL, 5000), ('5000 arguments', [longCmd], 10)):
+        nChars = sum(len(c) for c in commands) * repeat
+        reference = _measure(ReferenceShellTokenizer, commands, repeat)
+        scanner = _measure(ShellTokenizer, commands, repeat)
+        print('{:18} reference: {:6.2f} MB/s, scanner: {:6.2f} MB/s ({:.1f}x)'
+              .format(name, nChars / reference / 1e6, nChars / scanner / 1e6, reference / scanner))
+
+    megabyte = 1024 * 1024
+    hugeCommands = (
+        ('1 MB arguments', 'cat ' + ' '.join('f{:07}'.format(i) for i in range(megabyte // 9))),
+        ('1 MB single-quoted', "printf '" + 'x' * megabyte + "' > out"),
+        ('1 MB double-quoted', 'printf "' + '$HOME/x ' * (megabyte // 8) + '" > out'),
+    )
+    for name, cmd in hugeCommands:
+        elapsed = _measure(ShellTokenizer, [cmd], 1)
+        print('{:18} scanner: {:.3f}s'.format(name, elapsed))
+
+    for depth in (100, 1000, 10000):
+        cmd = 'echo ' + '"$(echo ' * depth + 'x' + ')"' * depth
+        try:
+            _measure(ReferenceShellTokenizer, [cmd], 1)
+            reference = 'ok'
+        except RecursionError:
+            reference = 'RecursionError (limit {})'.format(sys.getrecursionlimit())
+        print('nesting depth {:5}  scanner: {:.3f}s, reference: {}'
+              .format(depth, _measure(ShellTokenizer, [cmd], 1), reference))
+
+
+if __name__ == '__main__':
+    main()
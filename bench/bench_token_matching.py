@@ -0,0 +1,36 @@
+"""
+Assignment of file events to the tokens of a command with many arguments
+(cat over thousands of files, many sharing their file names). The time per
+file should stay constant with a growing number of arguments.
+
+    python -m bench.bench_token_matching
+"""
+
+import time
+
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.snakemake_rule import SnakemakeRule, PARSE_CACHE
+
+_WORKING_DIR = '/home/user/project'
+
+
+def _make_command(nFiles):
+    paths = ['samples/s{}/counts.tsv'.format(i) for i in range(nFiles)]
+    return Command(id=nFiles, command='cat ' + ' '.join(paths) + ' > all_counts.tsv', workingDir=_WORKING_DIR,
+                   fileReadEvents=[FileReadEvent(path=_WORKING_DIR + '/' + p) for p in paths],
+                   fileWriteEvents=[FileWriteEvent(path=_WORKING_DIR + '/all_counts.tsv')])
+
+
+def main():
+    PARSE_CACHE.maxSize = 0
+    for nFiles in (1000, 2000, 5000):
+        cmd = _make_command(nFiles)
+        start = time.perf_counter()
+        rule = SnakemakeRule(cmd)
+        elapsed = time.perf_counter() - start
+        assert rule.processedCommandString == 'cat {input} > {output}'
+        print('{:5} files: {:.3f}s, {:.1f}us/file'.format(nFiles, elapsed, elapsed / nFiles * 1e6))
+
+
+if __name__ == '__main__':
+    main()
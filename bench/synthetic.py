@@ -0,0 +1,45 @@
+"""
+Generate synthetic shournal sessions for the benchmarks.
+"""
+
+import json
+
+
+def make_raw_command(cmdId, command, workingDir, readPaths=(), writePaths=(), startTime=None):
+    """
+    :return: a dict in the layout of shournal's json output for a single command
+    """
+    if startTime is None:
+        startTime = '2020-01-01T00:00:00.{:06d}'.format(cmdId % 1000000)
+    readEvents = [{'hash': 1234567, 'id': cmdId * 100000 + i, 'isStoredToDisk': False,
+                   'mtime': '2020-01-01T00:00:00', 'path': p, 'size': 4096}
+                  for i, p in enumerate(readPaths)]
+    writeEvents = [{'hash': 1234567, 'id': cmdId * 100000 + i, 'mtime': '2020-01-01T00:00:00',
+                    'path': p, 'size': 4096}
+                   for i, p in enumerate(writePaths)]
+    return {'command': command, 'endTime': startTime, 'fileReadEvents': readEvents,
+            'fileWriteEvents': writeEvents, 'hashChunkSize': 4096, 'hashMaxCountOfReads': 20,
+            'hostname': 'host', 'id': cmdId, 'returnValue': 0, 'sessionUuid': 'c2Vzc2lvbg==',
+            'startTime': startTime, 'username': 'user', 'workingDir': workingDir}
+
+
+def make_session_lines(nCommands, readsPerCommand=20, workingDir='/home/user/project'):
+    """
+    :return: list of shournal json lines (bytes): header, commands and footer.
+    Every command reads shared library paths and its predecessor's output and writes one file.
+    """
+    libPaths = ['/usr/lib/python3/site-packages/pkg/mod{}.py'.format(i) for i in range(readsPerCommand)]
+    lines = [b'HEADER:' + _dumps({'pathToReadFiles': '/tmp/readfiles'})]
+    for i in range(1, nCommands + 1):
+        out = '{}/out{}.txt'.format(workingDir, i)
+        inp = '{}/out{}.txt'.format(workingDir, i - 1)
+        raw = make_raw_command(i, 'python analyze.py out{}.txt > out{}.txt'.format(i - 1, i),
+                               workingDir, readPaths=libPaths + [inp], writePaths=[out])
+        lines.append(b'COMMAND:' + _dumps(raw))
+    lines.append(b'FOOTER:' + _dumps({}))
+    return lines
+
+
+def _dumps(obj):
+    # compact, like shournal's output
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True).encode() + b'\n'
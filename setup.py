@@ -12,6 +12,10 @@ with open("README.md", "r") as fh:
     long_description = fh.read()
 
 requirements = ['ordered-set', ]
+# optional, faster json decoding of shournal's output
+extras_requirements = {'fast-json': ['orjson', ],
+                       # optional, --format msgpack
+                       'msgpack': ['msgpack', ], }
 
 packages = ['shournal_to_snakemake']
 for p in setuptools.find_packages('shournal_to_snakemake'):
@@ -29,6 +33,7 @@ setuptools.setup(
     packages=packages,
     license='MIT',
     install_requires=requirements,
+    extras_require=extras_requirements,
 
     command_options={
         'build_sphinx': {
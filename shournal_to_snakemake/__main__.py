@@ -1,17 +1,28 @@
 
 
+import os
 import sys
-import json
 import logging
+import sqlite3
 import argparse
 
 from shournal_to_snakemake.command_loader import CommandLoader
-from shournal_to_snakemake.util import eprint, SimpleJsonToObject
-from shournal_to_snakemake.snakemake_rule import SnakemakeRule
-from shournal_to_snakemake.command import Command
+from shournal_to_snakemake.util import eprint
+from shournal_to_snakemake.rule_generator import RuleGenerator
+from shournal_to_snakemake.snakemake_rule import PARSE_CACHE
+from shournal_to_snakemake.json_decoder import JsonDecoder, BACKENDS as JSON_BACKENDS
+from shournal_to_snakemake.shournal_database import ShournalDatabase
 from shournal_to_snakemake import app, __version__
-from shournal_to_snakemake.rule_printer import RulePrinter
-from shournal_to_snakemake.argparse_helpers import ActionNoYes
+from shournal_to_snakemake.rule_printer import RulePrinter, ThreadedOutputSink, AtomicFile
+from shournal_to_snakemake.record_printer import FORMATS, JsonLinesPrinter, MsgpackPrinter
+from shournal_to_snakemake.snakefile_update import update_snakefile
+from shournal_to_snakemake.sharded_output import (RULES_DIR, SHARD_BY, shard_by_count,
+                                                  shard_by_component, write_shards)
+from shournal_to_snakemake.argparse_helpers import ActionNoYes, id_range
+from shournal_to_snakemake.command_selection import CommandSelection
+from shournal_to_snakemake.state_file import load_state, save_state
+from shournal_to_snakemake.indexed_json_file import IndexedJsonFile, INDEX_SUFFIX
+from shournal_to_snakemake.json_input import open_input, parse_header, iter_commands, merge_by_start_time
 
 
 def real_main():
@@ -22,8 +33,10 @@ def real_main():
                     'Matched file-paths are automatically replaced in the command string with '
                     '{input} and {output}',
         usage='shournal --query --output-format json --history 3 | {0} [options]\n'
-              'Alternatively read from a file:\n'
-              '{0} [options] FILE\n'.format(app.APP_NAME),
+              'Alternatively read from one or more, possibly compressed, files:\n'
+              '{0} [options] FILE...\n'
+              'or directly from shournal\'s database:\n'
+              '{0} [options] --database ~/.local/share/shournal/database.db\n'.format(app.APP_NAME),
     )
 
     parser.add_argument('--version', action='version', version='{} {}'.format(app.APP_NAME, __version__))
@@ -46,6 +59,100 @@ def real_main():
                         .format(WFILES_OUTSIDE_CWD)
                         )
 
+    parser.add_argument('--exclude-root', action='append', default=[], metavar='DIR',
+                        help='Drop read and written files below DIR, e.g. /usr, /proc or ~/.cache. '
+                             'May be passed multiple times')
+    parser.add_argument('--include-root', action='append', default=[], metavar='DIR',
+                        help='Keep read and written files below DIR, even if outside the working directory '
+                             'or below an excluded root (the most specific root wins), e.g. a data mount '
+                             'below an excluded /mnt. May be passed multiple times')
+    parser.add_argument('--output', '-o', metavar='FILE',
+                        help='Write the rules to FILE instead of stdout. FILE is only replaced once all '
+                             'rules were written successfully')
+    parser.add_argument('--format', choices=FORMATS, default=FORMATS[0],
+                        help='Print the rules as Snakefile or as machine-readable records, one per rule, '
+                             'either as JSON Lines (jsonl) or msgpack. A record holds the rule name, the '
+                             'input and output paths with their variable names, the raw and the processed '
+                             'command string, the command id and its start and end time. msgpack requires '
+                             'the msgpack package. Default is %(default)s')
+    parser.add_argument('--shards', type=int, metavar='N',
+                        help='Split the rules into N files {}/part_1.smk ... next to the --output file, which '
+                             'then only includes them. Snakemake parses several small files considerably '
+                             'faster than a single huge one. Can not be combined with --stream'
+                             .format(RULES_DIR))
+    parser.add_argument('--shard-by', choices=SHARD_BY, default=SHARD_BY[0],
+                        help='With --shards, either split the rules into runs of equal size (count) or keep '
+                             'rules depending on each other within the same file (component). '
+                             'Default is %(default)s')
+
+    parser.add_argument('--update', metavar='FILE',
+                        help='Update the Snakefile FILE previously generated with --update (or create it): '
+                             'rules are identified by a fingerprint comment of their command string and '
+                             'file paths. Unchanged rules keep their names and positions, a changed rule '
+                             'replaces the rule writing the same files and new rules are appended')
+
+    parser.add_argument('--stream', action='store_true',
+                        help='Print each rule as soon as its command is accepted, instead of reading '
+                             'the whole input first. Memory usage stays flat regardless of the input size, '
+                             'because only the state needed for duplicate detection and rule numbering is kept. '
+                             'Rules are printed in execution order.')
+
+    parser.add_argument('--target', action='append', default=[], metavar='PATH',
+                        help='Only print the rules needed to create the given files, i.e. the rules writing '
+                             'them and all rules they transitively depend on. Relative paths are resolved '
+                             'against the working directory of the commands. Pass it once per file. '
+                             'Can not be combined with --stream')
+
+    parser.add_argument('--infer-wildcards', action='store_true',
+                        help='Collapse rules of repetitive commands, e.g. of a loop over samples, whose '
+                             'command strings are equal after replacing the file paths and whose file '
+                             'paths differ by the same substring, into a single rule with a {wildcard}. '
+                             'Can not be combined with --stream')
+
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='Build the rules in N worker processes. The rule order and names are the '
+                             'same as with a single process. Default is 1')
+
+    parser.add_argument('--parse-cache-size', type=int, default=PARSE_CACHE.maxSize, metavar='N',
+                        help='Number of parsed command strings to keep, so repeatedly executed commands '
+                             '(e.g. make or ./run.sh) are only tokenized once per working directory. '
+                             '0 disables the cache. Default is {}'.format(PARSE_CACHE.maxSize))
+
+    parser.add_argument('--json-backend', choices=('auto',) + JSON_BACKENDS, default='auto',
+                        help='The library used to decode shournal\'s json output. By default the fastest '
+                             'installed one is used (orjson, msgspec, json)')
+
+    parser.add_argument('--state', metavar='FILE',
+                        help='Continue a previous conversion: load the state (working directory, duplicate '
+                             'index, last command id and rule counter) from FILE, if it exists, and only '
+                             'process commands newer than the last run\'s. FILE is updated at the end, so '
+                             'the printed rules may be appended to the previously generated ones')
+
+    dbGroup = parser.add_argument_group('database input',
+                                        'Read the commands directly from shournal\'s sqlite database instead '
+                                        'of its json output.')
+    dbGroup.add_argument('--database', metavar='FILE',
+                         help='Path to shournal\'s database file, which is opened read-only')
+    dbGroup.add_argument('--db-session-id', metavar='ID',
+                         help='Only read commands of the given shell session, e.g. $SHOURNAL_SESSION_ID')
+    dbGroup.add_argument('--db-cwd', metavar='DIR',
+                         help='Only read commands executed within the given working directory')
+
+    selGroup = parser.add_argument_group('command selection',
+                                         'Restrict the input to a subset of the commands. With --indexed or '
+                                         '--database only the selected commands are decoded.')
+    selGroup.add_argument('--id-range', type=id_range, metavar='FIRST:LAST',
+                          help='Only select commands with FIRST <= id <= LAST. Either side may be omitted')
+    selGroup.add_argument('--since', metavar='TIME',
+                          help='Only select commands started at or after TIME, e.g. 2020-05-18T17:00')
+    selGroup.add_argument('--until', metavar='TIME',
+                          help='Only select commands started before TIME')
+    selGroup.add_argument('--last', type=int, metavar='N',
+                          help='Of the otherwise selected commands, only select the last N')
+    selGroup.add_argument('--indexed', action='store_true',
+                          help='Memory-map the input file and use a sidecar index ({}) of its commands, '
+                               'which is created on first use. Requires (uncompressed) input files'.format(INDEX_SUFFIX))
+
     # The overall working dir for *all rules* is taken from the first accepted command. If that is not the
     # desired working dir, specify it using shournal's --query -cwd argument.
     # Therefor it's not necessary to duplicate the cwd argument here(parser.add_argument('--working-dir'))
@@ -58,55 +165,282 @@ def real_main():
 
     cmdLoader.ignoreRfilesOutsideCwd = not parsed_args.rfiles_outside_cwd
     cmdLoader.ignoreWfilesOutsideCwd = not parsed_args.wfiles_outside_cwd
+    cmdLoader.excludeRoots = [_clean_path(p) for p in parsed_args.exclude_root]
+    cmdLoader.includeRoots = [_clean_path(p) for p in parsed_args.include_root]
+
+    if parsed_args.stream and parsed_args.target:
+        eprint("--target can not be combined with --stream")
+        exit(1)
+    if parsed_args.stream and parsed_args.infer_wildcards:
+        eprint("--infer-wildcards can not be combined with --stream")
+        exit(1)
 
-    inputDev = sys.stdin
-    if unknown_args:
-        if len(unknown_args) != 1:
-            eprint("Expected exactly one input file but received", unknown_args)
+    if parsed_args.shards is not None:
+        if parsed_args.shards < 1:
+            eprint("--shards must be at least 1")
+            exit(1)
+        if parsed_args.output is None:
+            eprint("--shards requires --output")
+            exit(1)
+        if parsed_args.stream:
+            eprint("--shards can not be combined with --stream")
+            exit(1)
+        if parsed_args.format != 'snakefile':
+            eprint("--shards can not be combined with --format", parsed_args.format)
             exit(1)
 
-        # dash: read from stdin
-        if unknown_args[0] != '-':
-            try:
-                inputDev = open(unknown_args[0], 'r')
-            except OSError as e:
-                eprint("Failed to open input file:", e)
-                exit(1)
-
-    header = inputDev.readline()
-    if not header:
-        eprint("No input given")
+    if parsed_args.update is not None:
+        if parsed_args.output is not None or parsed_args.shards is not None:
+            eprint("--update can not be combined with --output or --shards")
+            exit(1)
+        if parsed_args.format != 'snakefile':
+            eprint("--update can not be combined with --format", parsed_args.format)
+            exit(1)
+
+    if parsed_args.format == 'msgpack':
+        rulePrinter = MsgpackPrinter
+    elif parsed_args.format == 'jsonl':
+        rulePrinter = JsonLinesPrinter
+    else:
+        rulePrinter = RulePrinter
+    try:
+        rulePrinter = rulePrinter()
+    except ImportError as e:
+        eprint("Failed to load output format {}: {}".format(parsed_args.format, e))
         exit(1)
 
-    header = header.rstrip()
-    if not header.startswith('HEADER:'):
-        eprint("Unable to parse shournal's output - please make sure to use the json output format, e.g. "
-               "shournal --query --output-format json --history 5")
+    if parsed_args.jobs < 1:
+        eprint("--jobs must be at least 1")
         exit(1)
-    header = json.loads(header[len('HEADER:'):])
-    header = SimpleJsonToObject(header)
 
-    cmdLoader.pathToReadFiles = header.pathToReadFiles
+    try:
+        decoder = JsonDecoder(parsed_args.json_backend)
+    except ImportError as e:
+        eprint("Failed to load json backend:", e)
+        exit(1)
+
+    ruleGenerator = RuleGenerator()
+    ruleGenerator.jobs = parsed_args.jobs
+    ruleGenerator.inferWildcards = parsed_args.infer_wildcards
+    PARSE_CACHE.maxSize = parsed_args.parse_cache_size
+    if parsed_args.state is not None:
+        try:
+            load_state(parsed_args.state, cmdLoader, ruleGenerator)
+        except (OSError, ValueError) as e:
+            eprint("Failed to load state file {}: {}".format(parsed_args.state, e))
+            exit(1)
+
+    selection = CommandSelection()
+    if parsed_args.id_range is not None:
+        selection.firstId, selection.lastId = parsed_args.id_range
+    selection.startTimeFrom = parsed_args.since
+    selection.startTimeTo = parsed_args.until
+    selection.lastCount = parsed_args.last
 
-    for line in inputDev:
-        line = line.rstrip()
-        if(line.startswith('COMMAND:')):
-            rawJsonCmd = json.loads(line[len('COMMAND:'):])
-            cmd = Command.from_json(rawJsonCmd)
+    if parsed_args.database is not None:
+        if unknown_args:
+            eprint("Input files can not be combined with --database, received", unknown_args)
+            exit(1)
+        if cmdLoader.lastCommandIds:
+            # continue where the previous run stopped. All hosts share the id space of the
+            # database, the loader rejects the already processed commands of each host.
+            selection.firstId = max(min(cmdLoader.lastCommandIds.values()) + 1, selection.firstId or 0)
+        inputCmds = _iter_database_commands(parsed_args, selection)
+    else:
+        # dash: read from stdin
+        inputPaths = unknown_args if unknown_args else ['-']
+        if parsed_args.indexed and '-' in inputPaths:
+            eprint("--indexed requires input files, stdin is not supported")
+            exit(1)
+        # Skip commands which would be rejected anyway without decoding them - unless
+        # the last N commands are to be selected after decoding.
+        lineFilter = cmdLoader.quick_reject
+        if selection.lastCount is not None and not parsed_args.indexed:
+            lineFilter = None
+        cmdStreams = []
+        for path in inputPaths:
+            if parsed_args.indexed:
+                cmdStreams.append(_iter_indexed_commands(path, decoder, cmdLoader, selection, lineFilter))
+            else:
+                cmdStreams.append(_iter_json_commands(path, decoder, cmdLoader, lineFilter))
+        # multiple sessions or hosts -> a single stream ordered by start time
+        inputCmds = merge_by_start_time(cmdStreams)
+        if selection.is_restricted():
+            # For indexed files, this only matters for --last with multiple files.
+            inputCmds = selection.filter_commands(inputCmds)
+
+    if parsed_args.stream:
+        # decode -> filter -> rule -> print, one command at a time
+        cmdLoader.keepCommands = False
+        # don't hold back rules while waiting for more input of a growing session
+        ruleGenerator.idleTimeout = 0.1
+        acceptedCmds = cmdLoader.iter_accepted(inputCmds)
+    else:
+        for cmd in inputCmds:
             cmdLoader.maybde_add_command(cmd)
-        else:
-            assert line.startswith('FOOTER:')
-            # footer = SimpleJsonToObject( json.loads(line[len('FOOTER:'):]))
-
-    cmdLoader.order_by_dependencies()
-
-    ruleCounter = 0
-    rulePrinter = RulePrinter()
-    for cmd in cmdLoader.commands:
-        rule = SnakemakeRule(cmd)
-        ruleCounter += 1
-        rule.rulename = "undefined_{}".format(ruleCounter)
-        rulePrinter.print(rule)
+        if parsed_args.target:
+            # relative to the session's working dir, not necessarily ours
+            targetPaths = [_clean_path(p, cmdLoader.cwd) for p in parsed_args.target]
+            for path in cmdLoader.restrict_to_targets(targetPaths):
+                logging.warning("target {} is not written by any command".format(path))
+        cmdLoader.order_by_dependencies()
+        acceptedCmds = cmdLoader.commands
+
+    rules = ruleGenerator.generate(acceptedCmds)
+    if parsed_args.update is not None:
+        _update_rules(parsed_args.update, rules, rulePrinter)
+    elif parsed_args.shards is not None:
+        _write_sharded_rules(parsed_args, rules, rulePrinter, cmdLoader.dependencyGraph)
+    else:
+        _write_rules(parsed_args.output, rules, rulePrinter, binary=parsed_args.format == 'msgpack',
+                     autoFlush=parsed_args.stream)
+    logging.info("{} commands were skipped without decoding them".format(cmdLoader.quickRejectCount))
+    logging.info("parse cache: {} hits, {} misses".format(PARSE_CACHE.hits, PARSE_CACHE.misses))
+    for reason, count in sorted(cmdLoader.dropCounts.items()):
+        logging.info("dropped file events, {}: {}".format(reason, count))
+
+    if parsed_args.state is not None:
+        try:
+            save_state(parsed_args.state, cmdLoader, ruleGenerator)
+        except OSError as e:
+            eprint("Failed to save state file {}: {}".format(parsed_args.state, e))
+            exit(1)
+
+
+def _write_rules(outputPath, rules, rulePrinter, binary, autoFlush):
+    """
+    Print the rules to stdout or, if outputPath is not None, to that file.
+    :param rulePrinter: RulePrinter or one of the record printers
+    :param binary: True, if rulePrinter writes bytes instead of text
+    :param autoFlush: True, if each rule shall be written as soon as it is printed
+    """
+    if outputPath is None:
+        outputFile = sys.stdout.buffer
+        encoding = sys.stdout.encoding
+    else:
+        try:
+            outputFile = AtomicFile(outputPath)
+        except OSError as e:
+            eprint("Failed to open output file:", e)
+            exit(1)
+        encoding = 'utf-8'
+    if binary:
+        encoding = None
+
+    # rules are rendered to memory and written in large chunks by a background thread,
+    # unless each rule shall appear right away (--stream)
+    rulePrinter.sink = ThreadedOutputSink(outputFile, encoding)
+    rulePrinter.sink.autoFlush = autoFlush
+    try:
+        for rule in rules:
+            rulePrinter.print(rule)
+        rulePrinter.sink.close()
+    except BaseException:
+        if outputPath is not None:
+            outputFile.discard()
+        raise
+    if outputPath is not None:
+        try:
+            outputFile.commit()
+        except OSError as e:
+            eprint("Failed to write output file:", e)
+            exit(1)
+
+
+def _write_sharded_rules(parsed_args, rules, rulePrinter, dependencyGraph):
+    rules = list(rules)
+    if parsed_args.shard_by == 'component':
+        shards = shard_by_component(rules, dependencyGraph, parsed_args.shards)
+    else:
+        shards = shard_by_count(rules, parsed_args.shards)
+    try:
+        write_shards(parsed_args.output, shards, rulePrinter)
+    except OSError as e:
+        eprint("Failed to write output files:", e)
+        exit(1)
+
+
+def _update_rules(path, rules, rulePrinter):
+    try:
+        unchangedCount, changedCount, addedCount = update_snakefile(path, rules, rulePrinter)
+    except (OSError, UnicodeDecodeError) as e:
+        eprint("Failed to update {}: {}".format(path, e))
+        exit(1)
+    logging.info("updated {}: {} unchanged, {} changed and {} new rules".format(
+        path, unchangedCount, changedCount, addedCount))
+
+
+def _iter_json_commands(path, decoder, cmdLoader, lineFilter):
+    """
+    Open the input file (or stdin), check shournal's header and return the
+    commands of that file.
+    """
+    try:
+        inputDev = open_input(path)
+        header = inputDev.readline()
+    except OSError as e:
+        eprint("Failed to open input file:", e)
+        exit(1)
+    _apply_header(path, header, decoder, cmdLoader)
+    return iter_commands(inputDev, decoder, lineFilter)
+
+
+def _iter_indexed_commands(path, decoder, cmdLoader, selection, lineFilter):
+    try:
+        indexedFile = IndexedJsonFile(path, decoder)
+    except (OSError, ValueError) as e:
+        eprint("Failed to map input file {}: {}".format(path, e))
+        exit(1)
+    _apply_header(path, indexedFile.headerLine, decoder, cmdLoader)
+    lineNumbers = indexedFile.select(selection) if selection.is_restricted() else None
+
+    def iter_and_close():
+        try:
+            yield from indexedFile.iter_commands(lineNumbers, lineFilter)
+        finally:
+            indexedFile.close()
+    return iter_and_close()
+
+
+def _apply_header(path, header, decoder, cmdLoader):
+    """
+    Validate the header of an input file. Exit on error.
+    """
+    try:
+        header = parse_header(header, decoder)
+    except ValueError as e:
+        eprint("{}: {}".format('stdin' if path == '-' else path, e))
+        exit(1)
+    if cmdLoader.pathToReadFiles is None:
+        cmdLoader.pathToReadFiles = header.pathToReadFiles
+
+
+def _iter_database_commands(parsed_args, selection):
+    try:
+        db = ShournalDatabase(parsed_args.database)
+    except sqlite3.Error as e:
+        eprint("Failed to open database {}: {}".format(parsed_args.database, e))
+        exit(1)
+    db.sessionId = parsed_args.db_session_id
+    db.workingDir = parsed_args.db_cwd
+    db.selection = selection
+    try:
+        yield from db.iter_commands()
+    except (sqlite3.Error, ValueError) as e:
+        eprint("Failed to read database {}: {}".format(parsed_args.database, e))
+        exit(1)
+    finally:
+        db.close()
+
+
+def _clean_path(path, baseDir=None):
+    """
+    :param baseDir: directory relative paths are resolved against. By default the current one.
+    """
+    path = os.path.expanduser(path)
+    if baseDir is not None:
+        path = os.path.join(baseDir, path)
+    return os.path.normpath(os.path.abspath(path))
 
 
 def main():
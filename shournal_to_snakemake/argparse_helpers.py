@@ -20,4 +20,19 @@ class ActionNoYes(argparse.Action):
         if option_strings.startswith('--no-'):
             setattr(namespace, self.dest, False)
         else:
-            setattr(namespace, self.dest, True)
\ No newline at end of file
+            setattr(namespace, self.dest, True)
+
+def id_range(string):
+    """
+    argparse type for an inclusive range of integers FIRST:LAST,
+    where either side may be omitted.
+    :return: tuple (first, last), None for an omitted side
+    """
+    if ':' not in string:
+        raise argparse.ArgumentTypeError("expected FIRST:LAST, e.g. 10:20 or 10: but got {}".format(string))
+    first, last = string.split(':', 1)
+    try:
+        return (int(first) if first else None,
+                int(last) if last else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid range {}".format(string))
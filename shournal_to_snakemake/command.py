@@ -1,10 +1,16 @@
 """
 Representation of a shournal command and corresponding file-events
-(read/write).
+(read/write). All fields are declared as __slots__, which saves a dict
+per object for sessions with millions of file events.
 """
 
+from shournal_to_snakemake.path_table import PATHS
+
 
 class Command:
+    __slots__ = ('id', 'command', 'returnValue', 'username', 'hostname', 'hashChunkSize',
+                 'hashMaxCountOfReads', 'sessionUuid', 'startTime', 'endTime', 'workingDir',
+                 '_fileReadEvents', '_rawFileReadEvents', 'fileWriteEvents')
 
     def __init__(self, id=None, command=None, returnValue=None, username=None,
                  hostname=None, hashChunkSize=None, hashMaxCountOfReads=None,
@@ -37,27 +43,41 @@ class Command:
         self.endTime = endTime
         self.workingDir = workingDir
 
+        self._rawFileReadEvents = None
         self.fileReadEvents = fileReadEvents
         self.fileWriteEvents = fileWriteEvents
 
 
     @classmethod
     def from_json(cls, rawJson):
-        cmd = Command()
-        cmd.__dict__ = rawJson
+        """
+        :param rawJson: the decoded json-dict of a command, as output by shournal
+        """
+        get = rawJson.get
+        # Also resolve the nested json-arrays of write-file events. The often numerous
+        # read-file events are only resolved on first access, because most commands
+        # are dropped anyway (e.g. because they did not write any files).
+        cmd = cls(id=get('id'), command=get('command'), returnValue=get('returnValue'),
+                  username=get('username'), hostname=get('hostname'),
+                  hashChunkSize=get('hashChunkSize'), hashMaxCountOfReads=get('hashMaxCountOfReads'),
+                  sessionUuid=get('sessionUuid'), startTime=get('startTime'), endTime=get('endTime'),
+                  workingDir=get('workingDir'),
+                  fileWriteEvents=[FileWriteEvent.from_json(f) for f in rawJson['fileWriteEvents']])
+        cmd._fileReadEvents = None
+        cmd._rawFileReadEvents = rawJson['fileReadEvents']
+        return cmd
 
-        # Also resolve the nested json-arrays of read- and write-file events
-        for i in range(len(cmd.fileReadEvents)):
-            f = FileReadEvent()
-            f.__dict__ = cmd.fileReadEvents[i]
-            cmd.fileReadEvents[i] = f
+    @property
+    def fileReadEvents(self):
+        if self._fileReadEvents is None and self._rawFileReadEvents is not None:
+            self._fileReadEvents = [FileReadEvent.from_json(f) for f in self._rawFileReadEvents]
+            self._rawFileReadEvents = None
+        return self._fileReadEvents
 
-        for i in range(len(cmd.fileWriteEvents)):
-            f = FileWriteEvent()
-            f.__dict__ = cmd.fileWriteEvents[i]
-            cmd.fileWriteEvents[i] = f
-
-        return cmd
+    @fileReadEvents.setter
+    def fileReadEvents(self, fileReadEvents):
+        self._fileReadEvents = fileReadEvents
+        self._rawFileReadEvents = None
 
 
     def __eq__(self, other):
@@ -69,41 +89,100 @@ class Command:
         return self.id
 
 
-class FileWriteEvent:
-    def __init__(self, id=None, path=None, size=None, mtime=None, hash=None):
+class _FileEvent:
+    """
+    Common base of read- and write-events. Events compare equal by their path. The path
+    is only interned into the session-wide path table on first access of pathId, so
+    paths of dropped events, or of all events while streaming, do not end up in the table.
+    """
+    __slots__ = ('id', '_path', '_pathId', 'size', 'mtime', 'hash', 'varnameIO')
+
+    def __init__(self, id, path, size, mtime, hash):
         self.id = id
         self.path = path
         self.size = size
         self.mtime = mtime
         self.hash = hash
+        # name of the variable within the rule's input- or output-section, assigned by SnakemakeRule
+        self.varnameIO = None
+
+    @property
+    def path(self):
+        return self._path
+
+    @path.setter
+    def path(self, path):
+        self._path = path
+        self._pathId = None
+
+    @property
+    def pathId(self):
+        if self._pathId is None and self._path is not None:
+            self._pathId = PATHS.intern(self._path)
+            # share the path string with all other events of that path
+            self._path = PATHS.paths[self._pathId]
+        return self._pathId
+
+    def __hash__(self):
+        return hash(self._path)
+
+    def __reduce__(self):
+        # path ids are only valid within a process, so pickle the path and intern
+        # it again on unpickling (e.g. in the worker processes of --jobs).
+        return _unpickle_file_event, (type(self), self._init_args(), self.varnameIO)
+
+    def _init_args(self):
+        return self.id, self._path, self.size, self.mtime, self.hash
+
+
+def _unpickle_file_event(cls, initArgs, varnameIO):
+    f = cls(*initArgs)
+    f.varnameIO = varnameIO
+    return f
+
+
+class FileWriteEvent(_FileEvent):
+    __slots__ = ()
+
+    def __init__(self, id=None, path=None, size=None, mtime=None, hash=None):
+        super().__init__(id, path, size, mtime, hash)
+
+    @classmethod
+    def from_json(cls, rawJson):
+        get = rawJson.get
+        return cls(get('id'), get('path'), get('size'), get('mtime'), get('hash'))
 
     def __eq__(self, other):
         if isinstance(other, FileWriteEvent):
-            return self.path == other.path
+            return self._path == other._path
         elif isinstance(other, FileReadEvent):
             return False
         return NotImplemented
 
-    def __hash__(self):
-        return hash(self.path)
+    __hash__ = _FileEvent.__hash__
+
 
+class FileReadEvent(_FileEvent):
+    __slots__ = ('isStoredToDisk',)
 
-class FileReadEvent:
     def __init__(self, id=None, path=None, size=None, mtime=None, hash=None, isStoredToDisk=None):
-        self.id = id
-        self.path = path
-        self.size = size
-        self.mtime = mtime
-        self.hash = hash
+        super().__init__(id, path, size, mtime, hash)
         self.isStoredToDisk = isStoredToDisk
 
+    @classmethod
+    def from_json(cls, rawJson):
+        get = rawJson.get
+        return cls(get('id'), get('path'), get('size'), get('mtime'), get('hash'), get('isStoredToDisk'))
+
     def __eq__(self, other):
         if isinstance(other, FileReadEvent):
-            return self.path == other.path
+            return self._path == other._path
         elif isinstance(other, FileWriteEvent):
             return False
 
         return NotImplemented
 
-    def __hash__(self):
-        return hash(self.path)
+    __hash__ = _FileEvent.__hash__
+
+    def _init_args(self):
+        return super()._init_args() + (self.isStoredToDisk,)
@@ -1,23 +1,87 @@
 
+import json
+import os
+import hashlib
 import logging
-from _collections import defaultdict
+import re
+from collections import Counter
 
-from shournal_to_snakemake.util import is_subpath
+from shournal_to_snakemake.path_table import PATHS
+from shournal_to_snakemake.path_filter import PathPrefixFilter
+from shournal_to_snakemake.dependency_graph import DependencyGraph
 
 thislogger = logging.getLogger(__name__)
 
+# Matched against the raw json of a command. Within json strings quotes are escaped,
+# so these patterns only match the structural keys.
+_RE_NO_WRITE_EVENTS = re.compile(rb'"fileWriteEvents"\s*:\s*\[\s*\]')
+_RE_WORKING_DIR = re.compile(rb'"workingDir"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+# key of lastCommandIds restored from an old state, which applies to all hosts
+_ANY_HOST = '*'
+
+
+def _fingerprint(commandString, writtenPaths, readPaths):
+    """
+    :return: key of the duplicate index: the command string and 128-bit digests of the
+             written and read paths, which do not depend on the order of the paths. The
+             key's size does not grow with the number of paths and it does not reference
+             the path strings, so the index stays small, even while streaming.
+    """
+    return commandString, _digest_paths(writtenPaths), _digest_paths(readPaths)
+
+
+def _digest_paths(paths):
+    return hashlib.blake2b('\0'.join(sorted(paths)).encode(), digest_size=16).digest()
+
 
 class CommandLoader:
 
+    # keys of dropCounts, indexed by isWriteEvent
+    DROP_REASONS = {
+        True: ('duplicate written path', 'filtered written path'),
+        False: ('duplicate read path', 'filtered read path'),
+    }
+
+    # number of paths for which the normalized path and the filter decisions are cached
+    PATH_CACHE_SIZE = 1 << 16
+
     def __init__(self):
         self.commands = []
         self.cwd = None
         self.pathToReadFiles = None
         self.ignoreWfilesOutsideCwd = True
         self.ignoreRfilesOutsideCwd = False
-        # we allow equal command strings with different file events, so
-        # store a list of commands for a given command string.
-        self._cmdStringCmdsMap = defaultdict(list)
+        # Drop read and written files below these (clean, absolute) paths, unless below a
+        # more specific include root. Include roots also keep files outside the working dir.
+        self.excludeRoots = []
+        self.includeRoots = []
+        # If False, accepted commands are not stored in self.commands, so they can be
+        # processed one by one (streaming) without keeping the whole session in memory.
+        self.keepCommands = True
+        # dependencies between the kept commands, built while they are added
+        self.dependencyGraph = DependencyGraph()
+        # Duplicate index. We allow equal command strings with different file events, so
+        # the key is a fingerprint of command string and digests of the written and read paths,
+        # see _fingerprint. The value is the id of the first command with that fingerprint.
+        self._cmdFingerprintMap = {}
+        # (working dir, write-events?) -> (PathPrefixFilter, {clean path: keep the path?})
+        self._pathFilters = {}
+        # hostname -> the largest id of all commands of that host passed to maybde_add_command,
+        # accepted or not. Each host has its own id space, so the ids of different hosts can't be compared.
+        self.lastCommandIds = {}
+        # lastCommandIds of a previous run (see restore_state): commands up to these ids were
+        # already processed and are rejected.
+        self._previousCommandIds = {}
+        # number of commands rejected by quick_reject, before they were decoded
+        self.quickRejectCount = 0
+        # reason -> number of file events dropped by maybde_add_command, see DROP_REASONS
+        self.dropCounts = Counter()
+        # path -> normalized path. Like the decisions of _pathFilters, the cache is cleared when
+        # reaching PATH_CACHE_SIZE entries, so memory does not grow with the number of distinct
+        # paths seen while streaming.
+        self._cleanPaths = {}
 
     def maybde_add_command(self, command):
         """
@@ -26,106 +90,258 @@ class CommandLoader:
         * modified files AND
         * is not a duplicate.
         Drop file events outside the current working directory (cwd), as configured.
+        :return: True, if the command was accepted
         """
 
+        hostname = command.hostname or ''
+        previousId = self._previousCommandIds.get(hostname, self._previousCommandIds.get(_ANY_HOST))
+        if previousId is not None and command.id <= previousId:
+            thislogger.info("ignoring command {}, because it was processed by a previous run: {}"
+                            .format(command.id, command.command))
+            return False
+        lastId = self.lastCommandIds.get(hostname)
+        if lastId is None or command.id > lastId:
+            self.lastCommandIds[hostname] = command.id
+
         # maybe_todo:
         # it might also be of interest to check file hash to validate that a previously
         # created file is the same as the read one afterwards
 
-        self._discard_duplicate_file_paths(command.fileWriteEvents)
-        self._discard_duplicate_file_paths(command.fileReadEvents)
-
+        # Only look at the read events once all checks regarding the write events
+        # and working dir passed, so they are not even materialized for most commands.
         if not command.fileWriteEvents:
             thislogger.info("ignoring command {}, because it did not modify any files: {}"
                             .format(command.id, command.command))
-            return
+            return False
 
         # Enforce all commands which modify files to be executed within the same workingDir.
         if self.cwd is not None and command.workingDir != self.cwd:
             thislogger.info("ignoring command {}, because the working directory is not "
                   "{} but {}: {}".format(command.id, self.cwd, command.workingDir, command.command))
-            return
+            return False
 
-        for i in range(len(command.fileWriteEvents) - 1, -1, -1):
-            wfile = command.fileWriteEvents[i]
-            # Ignore written files outside the working dir or a sub-path?
-            # Should usually only be necessary, if the user also observes temporary- or cache-directories
-            # (which is not recommended).
-            if self.ignoreWfilesOutsideCwd and not is_subpath(wfile.path, command.workingDir):
-                thislogger.info("command {}, ignore written filepath {}, because not under working directory {} "
-                      .format(command.id, wfile.path, command.workingDir))
-                del command.fileWriteEvents[i]
+        # Ignore written files outside the working dir or a sub-path?
+        # Should usually only be necessary, if the user also observes temporary- or cache-directories
+        # (which is not recommended).
+        command.fileWriteEvents = self._normalize_file_events(command.fileWriteEvents, command.workingDir, True)
 
-
-        # we might have deleted all wfiles, so check again:
+        # we might have dropped all wfiles, so check again:
         if not command.fileWriteEvents:
-            thislogger.info("ignoring command {}, because it did not modify any files: {}"
+            thislogger.info("ignoring command {}, because all modified files were filtered: {}"
                             .format(command.id, command.command))
-            return
+            return False
 
-        for i in range(len(command.fileReadEvents) - 1, -1, -1):
-            rfile = command.fileReadEvents[i]
-
-            if self.ignoreRfilesOutsideCwd and not is_subpath(rfile.path, command.workingDir):
-                thislogger.info("command {}, ignore read file-path {}, because not under working directory {} "
-                      .format(command.id, rfile.path, command.workingDir))
-                del command.fileReadEvents[i]
-            # elif rfile.isStoredToDisk:
-                # shournal can be configured, to store specific read files within its database
-                # (e.g. certain file-extensions (.py, .sh) or mime-types. This typically done
-                # for script-files. If that is of interest, the file can be accessed by id using:
-                # os.path.join(self.pathToReadFiles, str(rfile.id))
-            #   pass
-
-        duplicateCmd = self._find_duplicate_command(command)
-        if duplicateCmd is not None:
+        command.fileReadEvents = self._normalize_file_events(command.fileReadEvents, command.workingDir, False)
+        # maybe_todo: rfile.isStoredToDisk
+        # shournal can be configured, to store specific read files within its database
+        # (e.g. certain file-extensions (.py, .sh) or mime-types. This typically done
+        # for script-files. If that is of interest, the file can be accessed by id using:
+        # os.path.join(self.pathToReadFiles, str(rfile.id))
+
+        # the paths are unique after normalization
+        fingerprint = _fingerprint(command.command, [f.path for f in command.fileWriteEvents],
+                                   [f.path for f in command.fileReadEvents])
+        duplicateCmdId = self._cmdFingerprintMap.get(fingerprint)
+        if duplicateCmdId is not None:
             thislogger.info("ignoring command {}, because it appears to be a duplicate of command {}: {}"
-                            .format(command.id, duplicateCmd.id, command.command))
-            return
+                            .format(command.id, duplicateCmdId, command.command))
+            return False
 
         if self.cwd is None:
             self.cwd = command.workingDir
 
-        self.commands.append(command)
-        self._cmdStringCmdsMap[command.command].append(command)
+        if self.keepCommands:
+            self.commands.append(command)
+            self.dependencyGraph.add_command(command)
+        self._cmdFingerprintMap[fingerprint] = command.id
+        return True
 
-    def order_by_dependencies(self):
-        # maybe_todo:
-        # It might be desirable to have
-        # the rules in a "natural" order. I'm sure snakemake
-        # has the logic already built-in - it might make
-        # sense to already check here for cyclic dependencies, etc.
-        # The commands are currently sorted by execution start time.
-        pass
+    def quick_reject(self, rawJson):
+        """
+        Cheap check of a command's raw json before it is decoded, which does not
+        parse it as a whole. Commands rejected here are not passed to maybde_add_command.
+        :param rawJson: bytes
+        :return: True, if maybde_add_command would certainly reject the command, because it
+                 did not write any files or was executed in another working directory.
+        """
+        if _RE_NO_WRITE_EVENTS.search(rawJson) is not None:
+            self.quickRejectCount += 1
+            return True
+        if self.cwd is not None:
+            m = _RE_WORKING_DIR.search(rawJson)
+            if m is not None and json.loads(m.group(1)) != self.cwd:
+                self.quickRejectCount += 1
+                return True
+        return False
 
+    def iter_accepted(self, commands):
+        """
+        Lazily filter the given commands by maybde_add_command.
+        :param commands: iterable of Command
+        :return: generator of the accepted commands, in input order
+        """
+        for command in commands:
+            if self.maybde_add_command(command):
+                yield command
 
-    def _find_duplicate_command(self, cmd):
+    def to_state(self):
         """
-        A command is considered equal to another, if the command-string
-        and all read and written file-paths are exactly the same.
-        :return: the duplicate command or None
+        :return: json-serializable dict of what was learned from the commands so far (working dir,
+                 duplicate index, last command id per host), so a later run may continue with newer commands.
         """
-        existingCmds = self._cmdStringCmdsMap.get(cmd.command, [])
-        for c in existingCmds:
-            if set(c.fileWriteEvents) == set(cmd.fileWriteEvents) and \
-               set(c.fileReadEvents) == set(cmd.fileReadEvents):
-                return c
+        return {
+            'cwd': self.cwd,
+            'lastCommandIds': self.lastCommandIds,
+            'duplicateIndex': self._duplicate_index_to_state(),
+        }
 
-        return None
+    def restore_state(self, state):
+        """
+        Restore a state previously returned by to_state.
+        """
+        self.cwd = state['cwd']
+        if 'lastCommandIds' in state:
+            lastCommandIds = dict(state['lastCommandIds'])
+        elif state['lastCommandId'] is not None:
+            # written by older versions: a single id for all hosts
+            lastCommandIds = {_ANY_HOST: state['lastCommandId']}
+        else:
+            lastCommandIds = {}
+        self.lastCommandIds = lastCommandIds
+        self._previousCommandIds = dict(lastCommandIds)
+        self._cmdFingerprintMap.clear()
+        duplicateIndex = state['duplicateIndex']
+        if isinstance(duplicateIndex, dict):
+            # written by older versions: command string -> [command id, written paths, read paths]
+            for cmdString, entries in duplicateIndex.items():
+                for cmdId, writtenPaths, readPaths in entries:
+                    self._cmdFingerprintMap.setdefault(_fingerprint(cmdString, writtenPaths, readPaths), cmdId)
+            return
+        for cmdString, writtenDigest, readDigest, cmdId in duplicateIndex:
+            self._cmdFingerprintMap[(cmdString, bytes.fromhex(writtenDigest), bytes.fromhex(readDigest))] = cmdId
 
-    def _discard_duplicate_file_paths(self, fileEvents):
+    def restrict_to_targets(self, targetPaths):
         """
-        Because shournal captures file events uniquely by device-inode number and
-        not by path, under some circumstances the same path may appear multiple times, e.g.
-        in the context of deleting/moving files.
-        This is not practical for snakemake -> discard them
+        Only keep the commands needed to create the given files, that is the commands
+        writing them and all commands they transitively depend on.
+        :param targetPaths: clean, absolute paths
+        :return: list of the target paths not written by any command
         """
-        uniquefiles = {}
-        for i in range(len(fileEvents) - 1, -1, -1):
-            f = fileEvents[i]
-            existing = uniquefiles.get(f.path, None)
-            if existing is None:
-                uniquefiles[f.path] = f
+        graph = self.dependencyGraph
+        targetPathIds = []
+        missingPaths = []
+        for path in targetPaths:
+            pathId = PATHS.get_id(path)
+            if pathId is None or pathId not in graph.producers:
+                missingPaths.append(path)
             else:
-                thislogger.info("Discarding duplicate file event at path {}".format(f.path))
-                del fileEvents[i]
\ No newline at end of file
+                targetPathIds.append(pathId)
+
+        self.commands = [graph.commands[i] for i in graph.required_commands(targetPathIds)]
+        self.dependencyGraph = DependencyGraph()
+        for command in self.commands:
+            self.dependencyGraph.add_command(command)
+        return missingPaths
+
+    def order_by_dependencies(self):
+        """
+        Order the commands, so each one comes after the commands writing the files
+        it reads. Otherwise the execution order is kept.
+        Warn about cyclic dependencies and files written by multiple commands,
+        which snakemake will not accept.
+        """
+        graph = self.dependencyGraph
+        for pathId, producers in graph.rewritten_paths().items():
+            thislogger.warning("file {} is written by multiple commands: {}".format(
+                PATHS.paths[pathId], ', '.join(str(graph.commands[i].id) for i in producers)))
+
+        order, cyclic = graph.topological_order()
+        if cyclic:
+            thislogger.warning("the following commands are part of or depend on a cyclic dependency "
+                               "and are not ordered: {}".format(
+                                ', '.join(str(graph.commands[i].id) for i in cyclic)))
+        self.commands = [graph.commands[i] for i in order]
+
+    def _duplicate_index_to_state(self):
+        return [[cmdString, writtenDigest.hex(), readDigest.hex(), cmdId]
+                for (cmdString, writtenDigest, readDigest), cmdId in self._cmdFingerprintMap.items()]
+
+    def _keeps_path(self, path, workingDir, isWriteEvent):
+        """
+        :param path: clean, absolute path of a file event
+        :return: True, if the path passes the working dir restriction and
+                 include/exclude roots. The decision is cached.
+        """
+        key = (workingDir, isWriteEvent)
+        pathFilter = self._pathFilters.get(key)
+        if pathFilter is None:
+            pathFilter = (self._compile_path_filter(workingDir, isWriteEvent), {})
+            self._pathFilters[key] = pathFilter
+        pathFilter, decisions = pathFilter
+        keep = decisions.get(path)
+        if keep is None:
+            if len(decisions) >= self.PATH_CACHE_SIZE:
+                decisions.clear()
+            keep = pathFilter.keeps(path)
+            decisions[path] = keep
+        return keep
+
+    def _compile_path_filter(self, workingDir, isWriteEvent):
+        ignoreOutsideCwd = self.ignoreWfilesOutsideCwd if isWriteEvent else self.ignoreRfilesOutsideCwd
+        pathFilter = PathPrefixFilter(default=not ignoreOutsideCwd)
+        if ignoreOutsideCwd:
+            # like is_subpath: only paths strictly below the working dir
+            pathFilter.add_root(workingDir, True, includeRoot=False)
+        # more specific roots win, equal ones are overwritten, so the user's roots come last.
+        for root in self.excludeRoots:
+            pathFilter.add_root(root, False)
+        for root in self.includeRoots:
+            pathFilter.add_root(root, True)
+        return pathFilter
+
+    def _normalize_file_events(self, fileEvents, workingDir, isWriteEvent):
+        """
+        Normalize the file events of a command in a single pass:
+        * normalize their paths (e.g. /a/./b -> /a/b)
+        * drop events with duplicate paths. Because shournal captures file events uniquely by
+          device-inode number and not by path, under some circumstances the same path may appear
+          multiple times, e.g. in the context of deleting/moving files. This is not practical for
+          snakemake. As before, the last event of a path is kept.
+        * drop events by working dir and include/exclude roots, see _keeps_path.
+        Dropped events are only counted in self.dropCounts, not logged one by one.
+        Paths are compared as strings, so only the paths of kept events are interned
+        into the path table (on first use of their pathId).
+        :return: new list of the kept file events in their original order
+        """
+        cleanPaths = self._cleanPaths
+        seenPaths = set()
+        kept = []
+        nDuplicates = 0
+        nFiltered = 0
+        for f in reversed(fileEvents):
+            path = f.path
+            cleanPath = cleanPaths.get(path)
+            if cleanPath is None:
+                if len(cleanPaths) >= self.PATH_CACHE_SIZE:
+                    cleanPaths.clear()
+                cleanPath = os.path.normpath(path)
+                cleanPaths[path] = cleanPath
+
+            if cleanPath in seenPaths:
+                nDuplicates += 1
+                continue
+            seenPaths.add(cleanPath)
+            if not self._keeps_path(cleanPath, workingDir, isWriteEvent):
+                nFiltered += 1
+                continue
+            if cleanPath != path:
+                f.path = cleanPath
+            kept.append(f)
+        kept.reverse()
+
+        duplicateReason, filterReason = self.DROP_REASONS[isWriteEvent]
+        if nDuplicates:
+            self.dropCounts[duplicateReason] += nDuplicates
+        if nFiltered:
+            self.dropCounts[filterReason] += nFiltered
+        return kept
@@ -0,0 +1,48 @@
+
+from collections import deque
+
+
+class CommandSelection:
+    """
+    Select commands by id range and start time window. Of the matching
+    commands, optionally only the last N are selected.
+    None means no restriction.
+    """
+
+    def __init__(self):
+        self.firstId = None  # inclusive
+        self.lastId = None  # inclusive
+        # start times are compared as ISO 8601 strings, e.g. 2020-05-18T17:00
+        self.startTimeFrom = None  # inclusive
+        self.startTimeTo = None  # exclusive
+        self.lastCount = None
+
+    def is_restricted(self):
+        return self.firstId is not None or self.lastId is not None or \
+               self.startTimeFrom is not None or self.startTimeTo is not None or \
+               self.lastCount is not None
+
+    def matches(self, cmdId, startTime):
+        """
+        :return: True, if the command matches id range and time window (lastCount is not considered)
+        """
+        if self.firstId is not None and cmdId < self.firstId:
+            return False
+        if self.lastId is not None and cmdId > self.lastId:
+            return False
+        if self.startTimeFrom is not None and startTime < self.startTimeFrom:
+            return False
+        if self.startTimeTo is not None and startTime >= self.startTimeTo:
+            return False
+        return True
+
+    def filter_commands(self, commands):
+        """
+        Apply the selection to a stream of commands. Note that if lastCount is set,
+        the selected commands are only known at the end of the stream.
+        :return: generator of the selected commands
+        """
+        selected = (c for c in commands if self.matches(c.id, c.startTime))
+        if self.lastCount is not None:
+            selected = deque(selected, maxlen=self.lastCount)
+        yield from selected
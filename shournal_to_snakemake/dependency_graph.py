@@ -0,0 +1,152 @@
+"""
+Dependencies between accepted commands, as snakemake will see them: a command
+reading a path depends on every command writing that path.
+"""
+
+import heapq
+import itertools
+from collections import defaultdict
+
+
+class DependencyGraph:
+    """
+    The graph is built incrementally from the file events of the added commands.
+    Nodes are identified by their index in self.commands, i.e. the order in which
+    the commands were added.
+    """
+
+    def __init__(self):
+        self.commands = []
+        # path id -> indices of the commands writing/reading it, in ascending order
+        self.producers = defaultdict(list)
+        self.consumers = defaultdict(list)
+        # node index -> indices of the directly dependent commands. Built on demand.
+        self._successors = None
+
+    def __len__(self):
+        return len(self.commands)
+
+    def add_command(self, command):
+        """
+        Add a command, whose file events were already normalized, i.e. do not
+        contain duplicate paths.
+        :return: the index of the new node
+        """
+        idx = len(self.commands)
+        self.commands.append(command)
+        for f in command.fileWriteEvents:
+            self.producers[f.pathId].append(idx)
+        for f in command.fileReadEvents:
+            self.consumers[f.pathId].append(idx)
+        self._successors = None
+        return idx
+
+    def successors(self, idx):
+        """
+        :return: set of the indices of the commands reading a path written by command idx
+        """
+        if self._successors is None:
+            self._successors = self._build_successors()
+        return self._successors[idx]
+
+    def predecessors(self, idx):
+        """
+        :return: set of the indices of the commands writing a path read by command idx
+        """
+        preds = set()
+        for f in self.commands[idx].fileReadEvents:
+            preds.update(self.producers.get(f.pathId, ()))
+        preds.discard(idx)
+        return preds
+
+    def required_commands(self, pathIds):
+        """
+        Traverse the graph backwards from the commands writing the given paths.
+        :return: sorted list of the indices of the commands writing the given paths and
+                 of all commands they transitively depend on
+        """
+        stack = [idx for pathId in pathIds for idx in self.producers.get(pathId, ())]
+        required = set(stack)
+        while stack:
+            for pred in self.predecessors(stack.pop()):
+                if pred not in required:
+                    required.add(pred)
+                    stack.append(pred)
+        return sorted(required)
+
+    def rewritten_paths(self):
+        """
+        :return: dict path id -> indices of the commands writing it, for all paths written
+                 by more than one command. Snakemake does not allow ambiguous outputs.
+        """
+        return {pathId: producers for pathId, producers in self.producers.items() if len(producers) > 1}
+
+    def topological_order(self):
+        """
+        Order the commands, so each one comes after all commands it depends on (Kahn's algorithm).
+        The order is stable: among the commands ready at a time the first added one is taken, so
+        without any backward dependencies the original order is kept.
+        Commands which are part of or depend on a cycle can't be ordered and are appended in
+        their original order.
+        :return: (list of node indices, list of the node indices which could not be ordered)
+        """
+        inDegrees = [0] * len(self.commands)
+        for idx in range(len(self.commands)):
+            for succ in self.successors(idx):
+                inDegrees[succ] += 1
+
+        ready = [idx for idx, inDegree in enumerate(inDegrees) if inDegree == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            idx = heapq.heappop(ready)
+            order.append(idx)
+            for succ in self.successors(idx):
+                inDegrees[succ] -= 1
+                if inDegrees[succ] == 0:
+                    heapq.heappush(ready, succ)
+
+        cyclic = [idx for idx, inDegree in enumerate(inDegrees) if inDegree > 0]
+        order.extend(cyclic)
+        return order, cyclic
+
+    def connected_components(self):
+        """
+        Group the commands which are connected by dependencies in either direction.
+        :return: list, which holds for each node the smallest node index of its component
+        """
+        parents = list(range(len(self.commands)))
+
+        def find(idx):
+            while parents[idx] != idx:
+                # path halving
+                parents[idx] = parents[parents[idx]]
+                idx = parents[idx]
+            return idx
+
+        for pathId, consumers in self.consumers.items():
+            producers = self.producers.get(pathId)
+            if producers is None:
+                continue
+            root = find(producers[0])
+            for idx in itertools.chain(producers, consumers):
+                other = find(idx)
+                if other != root:
+                    # the smaller index becomes the root
+                    root, other = min(root, other), max(root, other)
+                    parents[other] = root
+        return [find(idx) for idx in range(len(self.commands))]
+
+    def _build_successors(self):
+        # O(V+E): each (producer, consumer)-pair of a path is visited once
+        successors = [set() for _ in range(len(self.commands))]
+        for pathId, consumers in self.consumers.items():
+            producers = self.producers.get(pathId)
+            if producers is None:
+                continue
+            for producer in producers:
+                succs = successors[producer]
+                succs.update(consumers)
+                # reading and writing the same path is no dependency on itself
+                succs.discard(producer)
+        return successors
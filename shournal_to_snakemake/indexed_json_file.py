@@ -0,0 +1,152 @@
+"""
+Memory-mapped access to a file with shournal's json output. On first use a
+sidecar index with the offsets, ids and start times of all COMMAND-lines
+is written next to the file, so later runs can select commands by id or
+start time without reading the whole file. Only the selected lines are decoded.
+"""
+
+import array
+import json
+import logging
+import mmap
+import os
+
+thislogger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.s2s-index'
+_INDEX_VERSION = 1
+_COMMAND_PREFIX = b'COMMAND:'
+
+
+class IndexedJsonFile:
+
+    def __init__(self, path, decoder):
+        """
+        Map the file and load its index, (re-)building it if missing or outdated.
+        :type decoder: JsonDecoder
+        :raises OSError, ValueError: if the file can not be mapped (e.g. empty)
+        """
+        self.path = path
+        self._decoder = decoder
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        headerEnd = self._mmap.find(b'\n')
+        self.headerLine = self._mmap[:len(self._mmap) if headerEnd == -1 else headerEnd]
+
+        # line i spans offsets[i]:offsets[i+1]
+        self._offsets = array.array('q')
+        self._ids = array.array('q')
+        self._startTimes = []
+        self._load_or_build_index()
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def select(self, selection):
+        """
+        :type selection: CommandSelection
+        :return: list of the line numbers of the selected commands, decodable by iter_commands
+        """
+        selected = [i for i in range(len(self._ids))
+                    if selection.matches(self._ids[i], self._startTimes[i])]
+        if selection.lastCount is not None:
+            selected = selected[len(selected) - selection.lastCount:] if selection.lastCount else []
+        return selected
+
+    def iter_commands(self, lineNumbers=None, lineFilter=None):
+        """
+        Decode the given command lines (default: all) straight from the mapping.
+        :param lineFilter: see json_input.iter_commands
+        :return: generator of Command
+        """
+        if lineNumbers is None:
+            lineNumbers = range(len(self._ids))
+        view = memoryview(self._mmap)
+        try:
+            for i in lineNumbers:
+                data = view[self._offsets[i] + len(_COMMAND_PREFIX):self._offsets[i + 1]]
+                if lineFilter is not None and lineFilter(data):
+                    del data
+                    continue
+                if not self._decoder.acceptsBuffer:
+                    data = bytes(data)
+                cmd = self._decoder.decode_command(data)
+                # release the sub-view before handing out the command
+                del data
+                yield cmd
+        finally:
+            view.release()
+
+    def _load_or_build_index(self):
+        indexPath = self.path + INDEX_SUFFIX
+        st = os.stat(self._file.fileno())
+        try:
+            if self._load_index(indexPath, st):
+                return
+        except (OSError, ValueError, KeyError, EOFError) as e:
+            thislogger.info("rebuilding invalid index {}: {}".format(indexPath, e))
+            self._offsets = array.array('q')
+            self._ids = array.array('q')
+            self._startTimes = []
+        self._build_index()
+        try:
+            self._write_index(indexPath, st)
+        except OSError as e:
+            thislogger.warning("Failed to write index {}: {}".format(indexPath, e))
+
+    def _build_index(self):
+        mm = self._mmap
+        pos = mm.find(b'\n') + 1
+        if pos == 0:
+            # no commands at all
+            pos = len(mm)
+        while pos < len(mm) and mm[pos:pos + len(_COMMAND_PREFIX)] == _COMMAND_PREFIX:
+            end = mm.find(b'\n', pos)
+            end = len(mm) if end == -1 else end + 1
+            rawCmd = self._decoder.loads(mm[pos + len(_COMMAND_PREFIX):end])
+            self._offsets.append(pos)
+            self._ids.append(rawCmd['id'])
+            self._startTimes.append(rawCmd['startTime'])
+            pos = end
+        self._offsets.append(pos)
+
+    def _load_index(self, indexPath, st):
+        """
+        :return: False, if the index does not exist or belongs to another version of the file
+        """
+        try:
+            f = open(indexPath, 'rb')
+        except FileNotFoundError:
+            return False
+        with f:
+            meta = json.loads(f.readline())
+            if meta['version'] != _INDEX_VERSION or meta['sourceSize'] != st.st_size or \
+               meta['sourceMtimeNs'] != st.st_mtime_ns:
+                return False
+            count = meta['count']
+            self._offsets.fromfile(f, count + 1)
+            self._ids.fromfile(f, count)
+            startTimes = f.read().decode()
+            self._startTimes = startTimes.split('\n') if count else []
+            if len(self._startTimes) != count:
+                raise ValueError('corrupt start times')
+        return True
+
+    def _write_index(self, indexPath, st):
+        meta = {'version': _INDEX_VERSION, 'sourceSize': st.st_size,
+                'sourceMtimeNs': st.st_mtime_ns, 'count': len(self._ids)}
+        tmpPath = indexPath + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            f.write(json.dumps(meta).encode() + b'\n')
+            self._offsets.tofile(f)
+            self._ids.tofile(f)
+            f.write('\n'.join(self._startTimes).encode())
+        os.replace(tmpPath, indexPath)
@@ -0,0 +1,64 @@
+"""
+Pluggable json decoding backends for shournal's output. If installed,
+orjson or msgspec are used, otherwise python's json module.
+"""
+
+import json
+
+from shournal_to_snakemake.command import Command
+
+# in order of preference
+BACKENDS = ('orjson', 'msgspec', 'json')
+
+# backends which decode from a memoryview without copying it to bytes first
+_BUFFER_BACKENDS = {'orjson', 'msgspec'}
+
+
+def _load_orjson():
+    import orjson
+    return orjson.loads
+
+
+def _load_msgspec():
+    import msgspec
+    return msgspec.json.Decoder().decode
+
+
+def _load_json():
+    return json.loads
+
+
+_BACKEND_LOADERS = {
+    'orjson': _load_orjson,
+    'msgspec': _load_msgspec,
+    'json': _load_json,
+}
+
+
+class JsonDecoder:
+
+    def __init__(self, backend='auto'):
+        """
+        :param backend: one of BACKENDS or 'auto' to use the fastest installed one.
+        :raises ImportError: if the requested backend is not installed
+        """
+        if backend == 'auto':
+            for name in BACKENDS:
+                try:
+                    self.loads = _BACKEND_LOADERS[name]()
+                except ImportError:
+                    continue
+                self.backend = name
+                break
+        else:
+            self.loads = _BACKEND_LOADERS[backend]()
+            self.backend = backend
+        self.acceptsBuffer = self.backend in _BUFFER_BACKENDS
+
+    def decode_command(self, data):
+        """
+        :param data: the json of a single command as bytes or str (without the COMMAND: prefix).
+                     If self.acceptsBuffer, also a memoryview.
+        :rtype: Command
+        """
+        return Command.from_json(self.loads(data))
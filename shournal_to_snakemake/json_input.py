@@ -0,0 +1,91 @@
+"""
+Read shournal's json output (HEADER-line, COMMAND-lines, FOOTER-line) from
+one or more, possibly compressed, files.
+"""
+
+import bz2
+import gzip
+import heapq
+import lzma
+import sys
+from operator import attrgetter
+
+from shournal_to_snakemake.util import SimpleJsonToObject
+
+_COMPRESSION_MAGICS = (
+    (b'\x1f\x8b', gzip.open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open),
+)
+
+
+def open_input(path):
+    """
+    Open an input file in binary mode, transparently decompressing gzip, bzip2 and xz files.
+    :param path: file path or '-' for stdin
+    :raises OSError
+    """
+    f = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    magic = f.peek(6)[:6]
+    for compressionMagic, opener in _COMPRESSION_MAGICS:
+        if magic.startswith(compressionMagic):
+            if f is sys.stdin.buffer:
+                return opener(f, 'rb')
+            # opened by path, the decompressing file closes the underlying one
+            f.close()
+            return opener(path, 'rb')
+    return f
+
+
+def parse_header(header, decoder):
+    """
+    :param header: the first line of shournal's json output (bytes)
+    :type decoder: JsonDecoder
+    :return: the decoded header
+    :raises ValueError: if the line is not a valid header
+    """
+    if not header:
+        raise ValueError("No input given")
+
+    header = header.rstrip()
+    if not header.startswith(b'HEADER:'):
+        raise ValueError("Unable to parse shournal's output - please make sure to use the json output "
+                         "format, e.g. shournal --query --output-format json --history 5")
+    return SimpleJsonToObject(decoder.loads(header[len(b'HEADER:'):]))
+
+
+def iter_commands(inputDev, decoder, lineFilter=None):
+    """
+    Lazily decode the COMMAND-lines following the header.
+    :param inputDev: binary file object, e.g. from open_input. It is closed once all
+                     commands were read, unless it is stdin.
+    :type decoder: JsonDecoder
+    :param lineFilter: optional callable, which receives the raw json of each command and returns
+                       True, if it shall be skipped without decoding it.
+    :return: generator of Command
+    """
+    try:
+        for line in inputDev:
+            # trailing whitespace is ignored by all json backends, no need to strip
+            if(line.startswith(b'COMMAND:')):
+                rawJson = line[len(b'COMMAND:'):]
+                if lineFilter is not None and lineFilter(rawJson):
+                    continue
+                yield decoder.decode_command(rawJson)
+            else:
+                assert line.startswith(b'FOOTER:')
+                # footer = SimpleJsonToObject(decoder.loads(line[len(b'FOOTER:'):]))
+    finally:
+        if inputDev is not sys.stdin.buffer:
+            inputDev.close()
+
+
+def merge_by_start_time(commandStreams):
+    """
+    Lazily merge several command streams, each ordered by start time, into a single
+    stream ordered by start time (k-way merge). Only one command per stream is pending at once.
+    :return: iterator of Command
+    """
+    if len(commandStreams) == 1:
+        return iter(commandStreams[0])
+    return heapq.merge(*commandStreams, key=attrgetter('startTime'))
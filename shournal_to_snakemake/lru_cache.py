@@ -0,0 +1,45 @@
+"""
+A bounded cache, which evicts the least recently used entry when full.
+"""
+
+from collections import OrderedDict
+
+
+class LruCache:
+
+    def __init__(self, maxSize=1024):
+        """
+        :param maxSize: maximum number of entries. 0 disables the cache.
+        """
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        :return: the cached value or None
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.maxSize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,58 @@
+"""
+Decide whether to keep a file path based on include- and exclude-roots,
+which are compiled into a trie over the path components. The most specific
+(longest) matching root decides, so e.g. /mnt/data may be kept while
+everything else below /mnt is dropped.
+"""
+
+# keys of a trie-node's decisions (path components are never None or int): the
+# decision for the node's path and below it, or only for the paths strictly below it
+_DECISION = None
+_DECISION_BELOW = 0
+
+
+class PathPrefixFilter:
+
+    def __init__(self, default=True):
+        """
+        :param default: decision for paths below none of the roots
+        """
+        self.default = default
+        self._trie = {}
+
+    def add_root(self, root, keep, includeRoot=True):
+        """
+        Keep or drop the clean, absolute path root and all paths below it. An already
+        added equal root is overwritten.
+        :param includeRoot: if False, only the paths strictly below root are affected, root
+                            itself is classified as if this root did not exist.
+        """
+        node = self._trie
+        for component in _components(root):
+            node = node.setdefault(component, {})
+        if includeRoot:
+            node[_DECISION] = keep
+            node.pop(_DECISION_BELOW, None)
+        else:
+            node[_DECISION_BELOW] = keep
+
+    def keeps(self, path):
+        """
+        Classify a clean, absolute path in one pass over its components.
+        :return: True, if the path shall be kept
+        """
+        decision = self.default
+        node = self._trie
+        for component in _components(path):
+            # the path is below the current node
+            decision = node.get(_DECISION_BELOW, decision)
+            node = node.get(component)
+            if node is None:
+                break
+            decision = node.get(_DECISION, decision)
+        return decision
+
+
+def _components(path):
+    # '/' -> ['']; '/usr/lib' -> ['', 'usr', 'lib']
+    return path.rstrip('/').split('/')
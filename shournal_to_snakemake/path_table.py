@@ -0,0 +1,37 @@
+"""
+Session-wide table of interned file paths. Each distinct path is stored
+only once and identified by a small integer id, so file events can be
+compared and hashed by that id instead of the full path string.
+Path ids are only valid within the process that interned them.
+"""
+
+
+class PathTable:
+
+    def __init__(self):
+        self._ids = {}
+        self.paths = []  # path id -> path
+
+    def __len__(self):
+        return len(self.paths)
+
+    def intern(self, path):
+        """
+        :return: the id of path, which is added to the table, if not already existing
+        """
+        pathId = self._ids.get(path)
+        if pathId is None:
+            pathId = len(self.paths)
+            self._ids[path] = pathId
+            self.paths.append(path)
+        return pathId
+
+    def get_id(self, path):
+        """
+        :return: the id of path or None, if it was never interned
+        """
+        return self._ids.get(path)
+
+
+# the table used by all file events
+PATHS = PathTable()
@@ -0,0 +1,88 @@
+"""
+Machine-readable alternatives to RulePrinter: each rule is written as a
+self-contained record, either as a line of json (JSON Lines) or as a msgpack
+object, so downstream tools can consume the rules from a pipe without parsing
+the Snakefile. A record looks like
+    {"rulename": "undefined_1", "commandId": 42,
+     "startTime": "...", "endTime": "...", "workingDir": "/home/user",
+     "rawCommand": "cat a > b", "processedCommand": "cat {input} > {output}",
+     "input": [{"path": "/home/user/a", "varname": null}],
+     "output": [{"path": "/home/user/b", "varname": null}]}
+Records of rules with a wildcard (see rule_grouping) additionally hold the
+"wildcardValues" and the "memberCommandIds" of the collapsed rules.
+"""
+
+import sys
+import json
+
+FORMATS = ('snakefile', 'jsonl', 'msgpack')
+
+
+def rule_record(rule):
+    """
+    :param rule: SnakemakeRule or WildcardRule
+    :return: dict of plain values, which can be serialized by any json or msgpack library
+    """
+    command = rule.command
+    record = {
+        'rulename': rule.rulename,
+        'commandId': command.id,
+        'startTime': command.startTime,
+        'endTime': command.endTime,
+        'workingDir': command.workingDir,
+        'rawCommand': rule.rawCommandString,
+        'processedCommand': rule.processedCommandString,
+        'input': [{'path': f.path, 'varname': f.varnameIO} for f in rule.input],
+        'output': [{'path': f.path, 'varname': f.varnameIO} for f in rule.output],
+    }
+    members = getattr(rule, 'members', None)
+    if members is not None:
+        record['wildcardValues'] = rule.wildcardValues
+        record['memberCommandIds'] = [m.command.id for m in members]
+    return record
+
+
+class JsonLinesPrinter:
+    """
+    Print each rule as a single line of json. Like RulePrinter, the records are
+    written to self.sink, or to stdout, if it is None.
+    """
+
+    def __init__(self):
+        self.sink = None
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def print(self, rule):
+        text = self.render(rule)
+        if self.sink is None:
+            sys.stdout.write(text)
+        else:
+            self.sink.write(text)
+
+    def render(self, rule):
+        return self._encoder.encode(rule_record(rule)) + '\n'
+
+
+class MsgpackPrinter:
+    """
+    Write each rule as a msgpack map to self.sink, which must accept bytes
+    (OutputSink with encoding None), or to stdout, if it is None.
+    """
+
+    def __init__(self):
+        """
+        :raises ImportError: if msgpack is not installed
+        """
+        import msgpack
+        self.sink = None
+        self._packer = msgpack.Packer(use_bin_type=True)
+
+    def print(self, rule):
+        data = self.render(rule)
+        if self.sink is None:
+            sys.stdout.buffer.write(data)
+        else:
+            self.sink.write(data)
+
+    def render(self, rule):
+        return self._packer.pack(rule_record(rule))
@@ -0,0 +1,159 @@
+
+import itertools
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from shournal_to_snakemake.snakemake_rule import SnakemakeRule, PARSE_CACHE
+from shournal_to_snakemake.rule_grouping import group_rules
+
+
+class RuleGenerator:
+    """
+    Turn accepted commands into named snakemake rules. Rules are
+    generated lazily, so a rule can be printed before the next command
+    is even read.
+    """
+
+    def __init__(self):
+        # number of the last generated rule -> undefined_1, undefined_2, ...
+        self.ruleCounter = 0
+        # number of worker processes. If > 1, rules are built in a process pool.
+        self.jobs = 1
+        # number of commands sent to a worker at once
+        self.chunkSize = 64
+        # If not None, a partially filled chunk is sent to the workers once no command arrived
+        # for that many seconds, and all rules built so far are returned. Otherwise, e.g. while
+        # streaming a growing session, rules would wait for the chunk to fill.
+        self.idleTimeout = None
+        # If True, collapse rules differing only by a wildcard, see rule_grouping.
+        # All rules are built before the first one is returned.
+        self.inferWildcards = False
+
+    def generate(self, commands):
+        """
+        :param commands: iterable of accepted Command's, in the desired rule order
+        :return: generator of named SnakemakeRule's (or WildcardRule's)
+        """
+        rules = self.build_rules(commands)
+        if self.inferWildcards:
+            rules = group_rules(rules)
+        return self.name_rules(rules)
+
+    def build_rules(self, commands):
+        if self.jobs > 1:
+            yield from self._build_rules_parallel(commands)
+        else:
+            for cmd in commands:
+                yield SnakemakeRule(cmd)
+
+    def name_rules(self, rules):
+        for rule in rules:
+            self.ruleCounter += 1
+            rule.rulename = "undefined_{}".format(self.ruleCounter)
+            yield rule
+
+    def _build_rules_parallel(self, commands):
+        """
+        Send chunks of commands to a process pool and yield the rules in
+        the original command order. At most a few chunks per worker are in flight,
+        so the commands are still consumed lazily.
+        """
+        if self.idleTimeout is None:
+            chunks = ((chunk, False) for chunk in _chunked(commands, self.chunkSize))
+        else:
+            chunks = _chunked_until_idle(commands, self.chunkSize, self.idleTimeout)
+        maxPending = self.jobs * 2
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                 initargs=(PARSE_CACHE.maxSize,)) as executor:
+            pending = deque()
+            for chunk, idle in chunks:
+                if chunk:
+                    pending.append((executor.submit(_build_rule_chunk, chunk), chunk))
+                if idle:
+                    # no input for now, so return everything built so far
+                    while pending:
+                        yield from _collect_chunk(*pending.popleft())
+                elif len(pending) >= maxPending:
+                    yield from _collect_chunk(*pending.popleft())
+            while pending:
+                yield from _collect_chunk(*pending.popleft())
+
+
+def _init_worker(parseCacheSize):
+    # executed in a worker process
+    PARSE_CACHE.maxSize = parseCacheSize
+
+
+def _build_rule_chunk(commands):
+    # executed in a worker process. The cache statistics are reported to the parent.
+    hits, misses = PARSE_CACHE.hits, PARSE_CACHE.misses
+    rules = [SnakemakeRule(cmd) for cmd in commands]
+    return rules, PARSE_CACHE.hits - hits, PARSE_CACHE.misses - misses
+
+
+def _collect_chunk(future, commands):
+    rules, hits, misses = future.result()
+    PARSE_CACHE.hits += hits
+    PARSE_CACHE.misses += misses
+    # The rules hold unpickled copies of the commands. Point them back to the originals,
+    # so e.g. the dependency graph's nodes can be found by command identity.
+    for rule, command in zip(rules, commands):
+        rule.command = command
+    return rules
+
+
+def _chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _chunked_until_idle(iterable, size, idleTimeout):
+    """
+    Like _chunked, but the iterable is consumed in a background thread and a chunk
+    ends early, if no item arrived for idleTimeout seconds. An exception raised by
+    the iterable is re-raised here.
+    :return: generator of (chunk, True if the iterable is idle). The chunk of an idle
+             iterable may be empty. Idleness is reported only once until the next item arrives.
+    """
+    items = queue.Queue(maxsize=size)
+    end = object()
+
+    def read():
+        # executed in the reader thread
+        try:
+            for item in iterable:
+                items.put((item, None))
+        except BaseException as e:
+            items.put((end, e))
+            return
+        items.put((end, None))
+
+    threading.Thread(target=read, daemon=True).start()
+    chunk = []
+    timeout = idleTimeout
+    while True:
+        try:
+            item, error = items.get(timeout=timeout)
+        except queue.Empty:
+            yield chunk, True
+            chunk = []
+            # wait for the next item
+            timeout = None
+            continue
+        timeout = idleTimeout
+        if item is end:
+            if error is not None:
+                raise error
+            if chunk:
+                yield chunk, False
+            return
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk, False
+            chunk = []
@@ -0,0 +1,192 @@
+"""
+Collapse repetitive rules, e.g. of a per-sample loop
+    for s in s1 s2 s3; do cat raw/$s.fq > $s.out; done
+into a single rule with a wildcard:
+    input: "raw/s{wildcard}.fq"  output: "s{wildcard}.out"
+    wildcard_constraints: wildcard="1|2|3"
+The wildcard is constrained to the observed values, so the rule never competes with
+other rules for the same files (snakemake's AmbiguousRuleException).
+Rules are clustered by a structural signature (working dir, processed command
+string, number of input and output files), so grouping is linear in the number
+of rules. Within a cluster all varying file paths must differ by the same
+substring, otherwise the rules are kept as they are.
+"""
+
+import logging
+import os
+
+thislogger = logging.getLogger(__name__)
+
+WILDCARD_NAME = 'wildcard'
+
+# The constant part after a wildcard starts with one of these characters (or is empty),
+# e.g. for s1.fq and s21.fq the suffix is .fq and not 1.fq.
+_DELIMITERS = '/._-'
+
+
+class WildcardRule:
+    """
+    A rule generated from several SnakemakeRule's whose paths only differ by a wildcard.
+    It offers the same attributes as SnakemakeRule, so it can be printed alike.
+    """
+    __slots__ = ('members', 'wildcardValues', 'command', 'rulename', 'rawCommandString',
+                 'processedCommandString', 'input', 'output')
+
+    def __init__(self, members, wildcardValues, inputPaths, outputPaths):
+        """
+        :param members: the collapsed SnakemakeRule's
+        :param wildcardValues: the value of the wildcard for each member
+        :param inputPaths: list of WildcardPath
+        :param outputPaths: list of WildcardPath
+        """
+        first = members[0]
+        self.members = members
+        self.wildcardValues = wildcardValues
+        self.command = first.command
+        self.rulename = first.rulename
+        self.rawCommandString = first.rawCommandString
+        self.processedCommandString = first.processedCommandString
+        self.input = inputPaths
+        self.output = outputPaths
+
+
+class WildcardPath:
+    """
+    A file path of a WildcardRule, which may contain the wildcard.
+    """
+    __slots__ = ('path', 'varnameIO')
+
+    def __init__(self, path, varnameIO):
+        self.path = path
+        self.varnameIO = varnameIO
+
+
+def group_rules(rules):
+    """
+    Replace each cluster of equally structured rules whose paths differ by a consistent
+    wildcard with a WildcardRule, placed at the position of the cluster's first rule.
+    The very first rule is never collapsed: it is snakemake's default target, which
+    must not contain wildcards.
+    Reads all rules before returning.
+    :param rules: iterable of SnakemakeRule
+    :return: list of SnakemakeRule and WildcardRule
+    """
+    rules = list(rules)
+    clusters = {}
+    for idx, rule in enumerate(rules):
+        clusters.setdefault(_signature(rule), []).append(idx)
+
+    grouped = [None] * len(rules)
+    collapsed = set()
+    for indices in clusters.values():
+        if indices[0] == 0:
+            indices = indices[1:]
+        if len(indices) < 2:
+            continue
+        wildcardRule = _infer_wildcard_rule([rules[i] for i in indices])
+        if wildcardRule is None:
+            continue
+        thislogger.info("collapsed {} rules to a single rule with wildcard: {}"
+                        .format(len(indices), wildcardRule.processedCommandString))
+        grouped[indices[0]] = wildcardRule
+        collapsed.update(indices[1:])
+
+    return [grouped[idx] or rule for idx, rule in enumerate(rules) if idx not in collapsed]
+
+
+def _signature(rule):
+    return (rule.command.workingDir, rule.processedCommandString, len(rule.input), len(rule.output))
+
+
+def _slots(files):
+    """
+    :return: the files in a canonical order: files assigned to tokens in their order
+             within the command string, the others (which are not referenced in the
+             command string) sorted by path.
+    """
+    assigned = []
+    missing = []
+    for f in files:
+        if f.varnameIO is not None and '_missing_' in f.varnameIO:
+            missing.append(f)
+        else:
+            assigned.append(f)
+    missing.sort(key=lambda f: f.path)
+    return assigned + missing
+
+
+def _infer_wildcard_rule(members):
+    """
+    :return: WildcardRule, or None, if the paths of the members do not differ by
+             a single, consistent wildcard.
+    """
+    memberInputs = [_slots(m.input) for m in members]
+    memberOutputs = [_slots(m.output) for m in members]
+    wildcardValues = None
+    ioPaths = []
+    for memberFiles, isOutput in ((memberInputs, False), (memberOutputs, True)):
+        paths = []
+        missingCounter = 0
+        for slot in range(len(memberFiles[0])):
+            slotPaths = [files[slot].path for files in memberFiles]
+            varnameIO = memberFiles[0][slot].varnameIO
+            if varnameIO is not None and '_missing_' in varnameIO:
+                # renumber according to the canonical order
+                varnameIO = '{}_missing_{}'.format('out' if isOutput else 'in', missingCounter)
+                missingCounter += 1
+
+            if any('{' in p or '}' in p for p in slotPaths):
+                # would be interpreted as wildcards by snakemake
+                return None
+
+            if all(p == slotPaths[0] for p in slotPaths):
+                if isOutput:
+                    # snakemake does not allow multiple rules writing the same file
+                    return None
+                paths.append(WildcardPath(slotPaths[0], varnameIO))
+                continue
+
+            split = _split_at_wildcard(slotPaths)
+            if split is None:
+                return None
+            prefix, values, suffix = split
+            if isOutput and not suffix and (not prefix or prefix.endswith('/')):
+                # A whole file name as wildcard would match almost any file
+                return None
+            if wildcardValues is None:
+                if len(set(values)) != len(values):
+                    return None
+                wildcardValues = values
+            elif values != wildcardValues:
+                return None
+            paths.append(WildcardPath(prefix + '{' + WILDCARD_NAME + '}' + suffix, varnameIO))
+        ioPaths.append(paths)
+
+    if wildcardValues is None:
+        return None
+    return WildcardRule(members, wildcardValues, ioPaths[0], ioPaths[1])
+
+
+def _split_at_wildcard(paths):
+    """
+    The wildcard reaches from the end of the paths' common prefix to the start of their
+    common suffix, e.g. raw/s1.fq, raw/s2.fq -> raw/s, [1, 2], .fq.
+    The suffix is shortened to start at a delimiter and the prefix as far as necessary to
+    get non-empty wildcard values, e.g. s1.fq, s10.fq -> s, [1, 10], .fq.
+    Paths of different structure (e.g. a/x.fq, b/y/x.fq) end up with a wildcard
+    spanning directories, which snakemake allows.
+    :return: (prefix, list of the wildcard value of each path, suffix) or None,
+             if the paths don't differ by a non-empty wildcard.
+    """
+    suffix = os.path.commonprefix([p[::-1] for p in paths])[::-1]
+    delimiterIndices = [i for i in (suffix.find(d) for d in _DELIMITERS) if i != -1]
+    suffix = suffix[min(delimiterIndices):] if delimiterIndices else ''
+
+    # leave at least one character for the wildcard
+    shortestLen = min(len(p) for p in paths)
+    prefix = os.path.commonprefix(paths)[:max(shortestLen - len(suffix) - 1, 0)]
+
+    values = [p[len(prefix):len(p) - len(suffix)] for p in paths]
+    if not all(values):
+        return None
+    return prefix, values, suffix
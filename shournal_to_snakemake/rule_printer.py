@@ -1,46 +1,77 @@
 
+import os
+import re
+import sys
+import hashlib
+import queue
+import threading
 
 from shournal_to_snakemake.util import is_subpath
+from shournal_to_snakemake.rule_grouping import WILDCARD_NAME
 
 class RulePrinter:
 
     def __init__(self):
         self.indent1 = " " * 4
         self.indent2 = self.indent1 * 2
+        # OutputSink the rules are written to. If None, they are printed to stdout.
+        self.sink = None
+        # If True, each rule gets a fingerprint marker, see fingerprint_marker
+        self.fingerprints = False
 
     def print(self, rule):
         """
         :param rule: the snakemake rule to print
         :type rule: SnakemakeRule
         """
+        text = self.render(rule)
+        if self.sink is None:
+            sys.stdout.write(text)
+        else:
+            self.sink.write(text)
+
+    def render(self, rule):
+        """
+        :return: the text of the rule, including the trailing empty lines
+        """
         # TODO: wrap long IO-paths and commands to next line
-        print("rule", rule.rulename + ":")
+        lines = ["rule {}:".format(rule.rulename)]
+        if self.fingerprints:
+            lines.append(self.indent1 + fingerprint_marker(rule))
 
         if rule.input:
-            print("{}input:".format(self.indent1))
+            lines.append("{}input:".format(self.indent1))
             for f in rule.input:
-                self._print_file_at_indent(self.indent2, f, rule.command)
+                lines.append(self._format_file_at_indent(self.indent2, f, rule.command))
 
         if rule.output:
-            print("{}output:".format(self.indent1))
+            lines.append("{}output:".format(self.indent1))
             for f in rule.output:
-                self._print_file_at_indent(self.indent2, f, rule.command)
+                lines.append(self._format_file_at_indent(self.indent2, f, rule.command))
 
-        print("{}shell:".format(self.indent1))
-        print('{}# raw: {}'.format(self.indent2, rule.rawCommandString))
-        print('{}{}'.format(self.indent2, self._escape_and_quote(rule.processedCommandString)))
+        wildcardValues = getattr(rule, 'wildcardValues', None)
+        if wildcardValues:
+            # only match the observed values, e.g. prefix{wildcard}suffix must not match other rules' files
+            lines.append("{}wildcard_constraints:".format(self.indent1))
+            pattern = '|'.join(re.escape(v) for v in wildcardValues)
+            lines.append('{}{}={},'.format(self.indent2, WILDCARD_NAME, self._escape_and_quote(pattern)))
 
-        print('\n')
+        lines.append("{}shell:".format(self.indent1))
+        lines.append('{}# raw: {}'.format(self.indent2, rule.rawCommandString))
+        lines.append('{}{}'.format(self.indent2, self._escape_and_quote(rule.processedCommandString)))
 
+        lines.append('\n\n')
+        return '\n'.join(lines)
 
-    def _print_file_at_indent(self, indent, f, command):
+
+    def _format_file_at_indent(self, indent, f, command):
         # use relative paths if below working dir
         path = f.path[len(command.workingDir) + 1:] \
             if is_subpath(f.path, command.workingDir) \
             else f.path
         varnameStr = '' if f.varnameIO is None else f.varnameIO + '='
         # KISS: always trailing comma
-        print('{}{}{},'.format(indent, varnameStr, self._escape_and_quote(path)))
+        return '{}{}{},'.format(indent, varnameStr, self._escape_and_quote(path))
 
     def _escape_and_quote(self, string, quotechar='"'):
         """
@@ -54,3 +85,165 @@ class RulePrinter:
         escaped = string.replace("\\", "\\\\")
         escaped = escaped.replace(quotechar, '\\' + quotechar)
         return quotechar + escaped + quotechar
+
+
+FINGERPRINT_MARKER = '# fingerprint: '
+
+
+def fingerprint_marker(rule):
+    """
+    :return: a comment, which identifies the rule by its raw command string and file paths
+             and, separately, by its output paths, e.g.
+             # fingerprint: rule=3f2a... output=9c41...
+    """
+    return '{}rule={} output={}'.format(FINGERPRINT_MARKER, *rule_digests(rule))
+
+
+def rule_digests(rule):
+    """
+    :return: (hex digest of working dir, raw command string and file paths,
+              hex digest of the output paths)
+    """
+    inputPaths = '\0'.join(f.path for f in rule.input)
+    outputPaths = '\0'.join(f.path for f in rule.output)
+    ruleDigest = _digest('\n'.join((rule.command.workingDir, rule.rawCommandString, inputPaths, outputPaths)))
+    return ruleDigest, _digest(outputPaths)
+
+
+def _digest(string):
+    return hashlib.blake2b(string.encode(), digest_size=8).hexdigest()
+
+
+class OutputSink:
+    """
+    Collect rendered text in memory and write it encoded in large chunks to a binary
+    file object, which saves most of the system calls and encoding overhead of printing
+    line by line.
+    """
+
+    def __init__(self, fileobj, encoding='utf-8', chunkSize=1 << 20):
+        """
+        :param encoding: encoding of the written text. If None, bytes are written instead of text.
+        :param chunkSize: number of characters (or bytes) to collect before writing them
+        """
+        self.fileobj = fileobj
+        self.encoding = encoding
+        self.chunkSize = chunkSize
+        # If True, each write is passed on and flushed immediately, so e.g. streamed
+        # rules show up without delay.
+        self.autoFlush = False
+        self._parts = []
+        self._size = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self.autoFlush or self._size >= self.chunkSize:
+            self._flush_parts()
+
+    def close(self):
+        """
+        Write all collected text. The file object is flushed but not closed.
+        :raises OSError
+        """
+        self._flush_parts()
+        self.fileobj.flush()
+
+    def _flush_parts(self):
+        if not self._parts:
+            return
+        if self.encoding is None:
+            data = b''.join(self._parts)
+        else:
+            data = ''.join(self._parts).encode(self.encoding)
+        self._parts = []
+        self._size = 0
+        self._write_chunk(data)
+
+    def _write_chunk(self, data):
+        self.fileobj.write(data)
+        if self.autoFlush:
+            self.fileobj.flush()
+
+
+class ThreadedOutputSink(OutputSink):
+    """
+    Write the chunks in a background thread, so generating the next rules overlaps
+    with writing. At most maxPendingChunks chunks wait in the queue, so memory stays
+    bounded if writing is slower than generating.
+    An error of the writer thread is raised by the next write or close.
+    """
+
+    def __init__(self, fileobj, encoding='utf-8', chunkSize=1 << 20, maxPendingChunks=8):
+        super().__init__(fileobj, encoding, chunkSize)
+        self._queue = queue.Queue(maxsize=maxPendingChunks)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_pending_chunks, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._flush_parts()
+        # None: no more chunks
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+        self.fileobj.flush()
+
+    def _write_chunk(self, data):
+        self._raise_error()
+        self._queue.put(data)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _write_pending_chunks(self):
+        # executed in the writer thread
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            if self._error is not None:
+                # keep consuming, so the producer never blocks on a full queue
+                continue
+            try:
+                self.fileobj.write(data)
+                if self.autoFlush:
+                    self.fileobj.flush()
+            except Exception as e:
+                self._error = e
+
+
+class AtomicFile:
+    """
+    A binary file, which is written to path.tmp and only renamed to path on commit,
+    so the target file is never left partially written.
+    """
+
+    def __init__(self, path):
+        """
+        :raises OSError
+        """
+        self.path = path
+        self._tmpPath = path + '.tmp'
+        self._file = open(self._tmpPath, 'wb')
+
+    def write(self, data):
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def commit(self):
+        """
+        :raises OSError
+        """
+        self._file.close()
+        os.replace(self._tmpPath, self.path)
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self._tmpPath)
+        except OSError:
+            pass
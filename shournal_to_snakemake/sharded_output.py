@@ -0,0 +1,142 @@
+"""
+Split the rules into several files, which snakemake parses considerably
+faster than a single huge Snakefile:
+    Snakefile             include: "rules/part_1.smk" ...
+    rules/part_1.smk      rule undefined_1: ...
+The shards are written in parallel.
+"""
+
+import os
+import re
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+from shournal_to_snakemake.rule_printer import OutputSink, AtomicFile
+
+RULES_DIR = 'rules'
+_PART_NAME = re.compile(r'part_(\d+)\.smk$')
+SHARD_BY = ('count', 'component')
+
+
+def shard_by_count(rules, shardCount):
+    """
+    Split the rules into shardCount consecutive runs of (nearly) equal size.
+    :param rules: list of rules
+    :return: list of non-empty lists of rules
+    """
+    quotient, remainder = divmod(len(rules), shardCount)
+    shards = []
+    start = 0
+    for k in range(shardCount):
+        end = start + quotient + (1 if k < remainder else 0)
+        if end > start:
+            shards.append(rules[start:end])
+        start = end
+    return shards
+
+
+def shard_by_component(rules, graph, shardCount):
+    """
+    Keep the rules of each connected component of the dependency graph within the same
+    shard. Components are distributed largest first to the currently smallest shard.
+    Within a shard the rules keep their order and the shard holding the first rule
+    (snakemake's default target) comes first.
+    :param rules: list of rules, generated from the commands of graph
+    :param graph: DependencyGraph
+    :return: list of non-empty lists of rules
+    """
+    nodeOfCommand = {id(cmd): idx for idx, cmd in enumerate(graph.commands)}
+    nodeComponents = graph.connected_components()
+
+    # A rule with wildcard (see rule_grouping) may join several components.
+    parents = {}
+
+    def find(c):
+        while parents.setdefault(c, c) != c:
+            c = parents[c]
+        return c
+
+    ruleComponents = []
+    for rule in rules:
+        components = [nodeComponents[nodeOfCommand[id(m.command)]]
+                      for m in getattr(rule, 'members', (rule,))]
+        root = find(components[0])
+        for c in components[1:]:
+            other = find(c)
+            if other != root:
+                parents[other] = root
+        ruleComponents.append(components[0])
+
+    componentRules = {}
+    for ruleIdx, c in enumerate(ruleComponents):
+        componentRules.setdefault(find(c), []).append(ruleIdx)
+
+    shardSizes = [(0, k) for k in range(min(shardCount, len(componentRules)))]
+    shardRuleIndices = [[] for _ in shardSizes]
+    for indices in sorted(componentRules.values(), key=len, reverse=True):
+        size, k = heapq.heappop(shardSizes)
+        shardRuleIndices[k].extend(indices)
+        heapq.heappush(shardSizes, (size + len(indices), k))
+
+    for indices in shardRuleIndices:
+        indices.sort()
+    shardRuleIndices.sort(key=lambda indices: indices[0])
+    return [[rules[i] for i in indices] for indices in shardRuleIndices]
+
+
+def write_shards(snakefilePath, shards, rulePrinter, maxWorkers=None):
+    """
+    Write each shard to rules/part_K.smk next to snakefilePath and a Snakefile, which
+    includes them. All files are first written to temporary files and only renamed
+    once all of them were written successfully. Parts of a previous run beyond the
+    new number of shards are removed afterwards.
+    :param shards: list of lists of rules, e.g. from shard_by_count
+    :param maxWorkers: number of writer threads, by default one per shard (at most 32)
+    :raises OSError
+    """
+    baseDir = os.path.dirname(os.path.abspath(snakefilePath))
+    os.makedirs(os.path.join(baseDir, RULES_DIR), exist_ok=True)
+    relPaths = [os.path.join(RULES_DIR, 'part_{}.smk'.format(k)) for k in range(1, len(shards) + 1)]
+
+    files = []
+    try:
+        for relPath in relPaths:
+            files.append(AtomicFile(os.path.join(baseDir, relPath)))
+        snakefile = AtomicFile(snakefilePath)
+        files.append(snakefile)
+
+        if maxWorkers is None:
+            maxWorkers = min(32, len(shards)) or 1
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futures = [executor.submit(_write_shard, f, shard, rulePrinter)
+                       for f, shard in zip(files, shards)]
+            sink = OutputSink(snakefile)
+            for relPath in relPaths:
+                sink.write('include: "{}"\n'.format(relPath))
+            sink.close()
+            for future in futures:
+                future.result()
+    except BaseException:
+        for f in files:
+            f.discard()
+        raise
+
+    # the Snakefile comes last, so it never includes a missing part
+    for f in files:
+        f.commit()
+    _remove_stale_parts(os.path.join(baseDir, RULES_DIR), len(shards))
+
+
+def _write_shard(fileobj, rules, rulePrinter):
+    # executed in a writer thread
+    sink = OutputSink(fileobj)
+    for rule in rules:
+        sink.write(rulePrinter.render(rule))
+    sink.close()
+
+
+def _remove_stale_parts(rulesDir, shardCount):
+    for name in os.listdir(rulesDir):
+        m = _PART_NAME.match(name)
+        if m is not None and int(m.group(1)) > shardCount:
+            os.remove(os.path.join(rulesDir, name))
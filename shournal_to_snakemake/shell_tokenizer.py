@@ -1,3 +1,5 @@
+import re
+
 
 from shournal_to_snakemake.abstract_class_helpers import SimpleEquality
 
@@ -30,156 +32,169 @@ class ShellTokenizer:
     Further shlex does not correctly support parenthesis and nested
     double-quotes, e.g foo="$(echo "bar")".
     maybe_todo: also support $'string' (see man bash)
+
+    The command is scanned with precompiled regular expressions: runs of characters without
+    special meaning are consumed at once, only the remaining characters are dispatched one by one.
+    Nested double quotes and command-substitutions are tracked on an explicit stack instead of
+    by recursion, so neither the nesting depth nor the command length is limited, and the time
+    is linear in the command length.
+    A tokenizer may be reused for several commands.
     """
     # If command-substitution occurs within double-quotes (or backticks) it is replaced
     # in the resolved outer token with the following sequence:
     COMMAND_SUBST_PLACEHOLDER = '$(...)'
 
+    # splitters with one char
+    splitters1 = frozenset({'|', '&', ';', '(', ')', '=', '<', '>', ' ', '\t', '\n', '`'})
+    # splitters with two chars
+    splitters2 = frozenset({'||', '&&', ';;', ';&',
+                            '|&', '>>', '<<', '$('})
+    escapes1 = frozenset({'\\'})
+    comments = frozenset({'#'})
+
+    # Characters without special meaning outside of quotes: no splitter, escape, quote or
+    # comment and no $ starting a command-substitution (the only splitter2 starting with
+    # a non-splitter1 char).
+    _RE_WORD_RUN = re.compile(r'(?:[^|&;()=<>\t\n `\\\'"#$]+|\$(?!\())+')
+    # characters without special meaning within double quotes
+    _RE_DOUBLEQUOTED_RUN = re.compile(r'(?:[^\\`"$]+|\$(?!\())+')
+    # within double quotes a backslash only escapes these
+    _DOUBLEQUOTE_ESCAPES = frozenset({'$', '`', '"', '\\'})
+
     def __init__(self):
         self.comand = "" # the raw command-sequence passed on split
         self.idx = 0
         self.tokens = []
-        # splitters with one char
-        self.splitters1 = {'|', '&', ';', '(', ')', '=', '<', '>', ' ', '\t', '\n', '`'}
-        # splitters with two chars
-        self.splitters2 = { '||', '&&', ';;', ';&',
-                            '|&', '>>', '<<', '$(' }
-        self.escapes1 = {'\\'}
-        self.comments = {'#'}
-        self.debug = 0
-
 
     def split(self, s):
+        """
+        :return: list of Token
+        :raises ValueError: on unbalanced quotes or command-substitutions
+        """
         self.comand = s
-        return self._private_split(closingString=None)
-
-
-    def _private_split(self, closingString):
-        if closingString is not None:
-            assert len(closingString) == 1
-
-        startIdx = self.idx
-
-        token = None
-        escapeSeen = False
-        while self.idx < len(self.comand):
-            current=self.comand[self.idx]
-            next = None if self.idx >= len(self.comand) - 1 else self.comand[self.idx+1]
-            currentAndNext = None if next is None else current + next
+        self.idx = 0
+        self.tokens = []
+        # The innermost context is on top. The outermost one is the whole command.
+        stack = [_SplitContext(closingString=None, startIdx=0)]
+        while True:
+            context = stack[-1]
+            if type(context) is _SplitContext:
+                inner = self._split(context)
+            else:
+                inner = self._scan_doublequotes(context)
+            if inner is None:
+                # context finished at self.idx (e.g. a closing quote) -> continue after it in the outer one
+                stack.pop()
+                if not stack:
+                    return self.tokens
+                self.idx += 1
+            else:
+                stack.append(inner)
 
-            if escapeSeen:
-                self._logdbg('was previously escaped: «{}»'.format(current))
-                assert token is not None
-                # the last character was escaped -> append current
-                token.string += current
-                escapeSeen = False
-            elif current in self.escapes1:
-                self._logdbg('escape-char: «{}»'.format(current))
+    def _split(self, context):
+        """
+        Tokenize from self.idx until the end of the command or the context's closing string,
+        where self.idx is left, or until a double quote starts. In that case self.idx is
+        left after the quote.
+        :type context: _SplitContext
+        :return: the context of a starting double quote or None, if the context is finished
+        """
+        s = self.comand
+        n = len(s)
+        tokens = self.tokens
+        matchWordRun = self._RE_WORD_RUN.match
+        splitters1 = self.splitters1
+        splitters2 = self.splitters2
+        closingString = context.closingString
+
+        idx = self.idx
+        # the current word token and the parts of its string, joined when it is finalized
+        token = context.token
+        parts = context.parts
+        while idx < n:
+            m = matchWordRun(s, idx)
+            if m is not None:
                 if token is None:
-                    token = self._createAppendToken("", isSplitter=False, startIdx=self.idx)
-                else:
-                    assert not token.isSplitter
-                escapeSeen = True
-            elif closingString is not None and current == closingString:
-                self._logdbg('found closing string: «{}»'.format(closingString))
-                # return from double-quote command-substitution recursion
-                self._finalizeTokenIfAny(token)
-                token = None
-                self._createAppendToken(string=closingString, isSplitter=True, startIdx=self.idx, endIdx=self.idx + len(closingString))
-                return
-            elif current == "'":
+                    token = Token('', isSplitter=False, startIdx=idx)
+                    tokens.append(token)
+                    parts = []
+                parts.append(m.group())
+                idx = m.end()
+                continue
+
+            current = s[idx]
+            if current == '\\':
                 if token is None:
-                    token = self._createAppendToken('', isSplitter=False, startIdx=self.idx)
+                    token = Token('', isSplitter=False, startIdx=idx)
+                    tokens.append(token)
+                    parts = []
+                # the next character is taken literally (if any)
+                parts.append(s[idx + 1:idx + 2])
+                idx += 2
+            elif current == closingString:
+                # end of a double-quote command-substitution
+                _finalize_token(token, parts, idx)
+                tokens.append(Token(closingString, isSplitter=True, startIdx=idx, endIdx=idx + 1))
+                self.idx = idx
+                return None
+            elif current == "'" or current == '"':
+                if token is None:
+                    token = Token('', isSplitter=False, startIdx=idx)
+                    tokens.append(token)
+                    parts = []
                 # else: append the string between the quotes to the previous token.
                 # This also covers cases like echo abc'de'fg'hij'.
-                self._handle_singlequote(token)
-            elif current == '"':
-                if token is None:
-                    token = self._createAppendToken('', isSplitter=False, startIdx=self.idx)
-                # else: see else-comment for handling for single quotes
-                self._handle_doublequotes(token)
-            # be greedy and first try to consume two splitters, then one.
-            elif currentAndNext is not None and currentAndNext in self.splitters2:
-                self._finalizeTokenIfAny(token)
+                if current == '"':
+                    # continue with this token once the double quote is closed
+                    context.token = token
+                    context.parts = parts
+                    self.idx = idx + 1
+                    return _DoubleQuoteContext(startIdx=idx, parts=parts)
+                idx = self._handle_singlequote(idx, parts) + 1
+            elif s[idx:idx + 2] in splitters2:
+                # be greedy and first try to consume two splitters, then one.
+                _finalize_token(token, parts, idx)
                 token = None
-                self._createAppendToken(string=currentAndNext, isSplitter=True, startIdx=self.idx, endIdx=self.idx + 2)
-                # consumed two chars: (idx is incremented also below at loop end)
-                self.idx += 1
-            elif current in self.splitters1:
-                self._finalizeTokenIfAny(token)
-                token = None
-                self._createAppendToken(string=current, isSplitter=True, startIdx=self.idx, endIdx=self.idx + 1)
-            elif current in self.comments:
-                self._finalizeTokenIfAny(token)
+                tokens.append(Token(s[idx:idx + 2], isSplitter=True, startIdx=idx, endIdx=idx + 2))
+                idx += 2
+            elif current in splitters1:
+                _finalize_token(token, parts, idx)
                 token = None
-                self._handleComment()
+                tokens.append(Token(current, isSplitter=True, startIdx=idx, endIdx=idx + 1))
+                idx += 1
             else:
-                # collect that char for current token
-                if token is None:
-                    token = self._createAppendToken(string=current, isSplitter=False, startIdx=self.idx)
-                else:
-                    assert not token.isSplitter
-                    token.string += current
-
-            self.idx += 1
+                assert current in self.comments
+                _finalize_token(token, parts, idx)
+                token = None
+                # comments end on newline, which is skipped as well
+                newlineIdx = s.find('\n', idx + 1)
+                idx = n if newlineIdx == -1 else newlineIdx + 1
 
         if closingString is not None:
-            raise ValueError(
-                "missing closing «{}» started near index {}: {}".format(closingString, startIdx, self.comand[startIdx:]))
+            raise ValueError("missing closing «{}» started near index {}: {}".format(
+                closingString, context.startIdx, s[context.startIdx:]))
 
         # handle the final token, if any
-        self._finalizeTokenIfAny(token)
-        return self.tokens
-
-    def _createAppendToken(self, *args, **kwargs):
-        token = Token(*args, **kwargs)
-        self.tokens.append(token)
-        return token
+        _finalize_token(token, parts, n)
+        self.idx = n
+        return None
 
-    def _finalizeTokenIfAny(self, token):
-        """
-        To be called when a new splitter was detected -> the new splitter shall
-        not be part of the token, so end-idx is self.idx-1
-        :param token:
-        :return:
-        """
-        if token is None:
-            return
-        self._logdbg("finalizing token: {}".format(token.string))
-        assert token.startIdx >= 0
-        assert token.startIdx < self.idx
-        token.endIdx = self.idx
-
-    def _handleComment(self):
-        self.idx += 1
-        while self.idx < len(self.comand):
-            current = self.comand[self.idx]
-            # comments end on newline
-            if current == '\n':
-                return
-            self.idx += 1
-
-    def _handle_singlequote(self, token):
+    def _handle_singlequote(self, idx, parts):
         """
          The most simple case -> do not interpret anything until we hit
          another single quote. Following bash, no escaping is possible,
          also not single-quotes!
-
+        :param idx: index of the opening quote
+        :return: index of the closing quote
         :raises ValueError
         """
-        startIdx = self.idx
-        self.idx += 1
-        while self.idx < len(self.comand):
-            current = self.comand[self.idx]
-            if current == "'":
-                # do not set startidx here, we might be appending to a previous token!
-                token.string += self.comand[startIdx + 1:self.idx]
-                return
-            self.idx += 1
-
-        raise ValueError("missing closing singlequotes started at index {}: {}".format(startIdx, self.comand[startIdx:]))
+        endIdx = self.comand.find("'", idx + 1)
+        if endIdx == -1:
+            raise ValueError("missing closing singlequotes started at index {}: {}".format(idx, self.comand[idx:]))
+        parts.append(self.comand[idx + 1:endIdx])
+        return endIdx
 
-    def _handle_doublequotes(self, token):
+    def _scan_doublequotes(self, context):
         """
         Quoting bash v4.4 manual:
         >> Enclosing characters in double quotes preserves the  literal  value  of
@@ -193,65 +208,82 @@ class ShellTokenizer:
 
         As a consequence since we may not execute commands, nor do we resolve variables,
         only tokenize command-substitutions $( and `
+        Scans from self.idx (within the quotes) until the closing quote, where self.idx is left,
+        or until a command-substitution starts.
 
+        :type context: _DoubleQuoteContext
+        :return: the context of a starting command-substitution or None, if the double quote is closed
         :raises ValueError
         """
-
-        startIdx = self.idx
+        s = self.comand
+        n = len(s)
+        matchRun = self._RE_DOUBLEQUOTED_RUN.match
         # we treat everything within the double-quotes as a single token *except* text between command-substitution
         # (and escaped chars) -> append all text outside command-substitution to the token. As a result, the self.tokens-list
-        # will first contain the outer double quoted strings and then possibly inner tokens (recursion!).
-        escapeSeen = False
-        self.idx += 1
-        while self.idx < len(self.comand):
-            current = self.comand[self.idx]
-            next = None if self.idx >= len(self.comand) - 1 else self.comand[self.idx + 1]
-            currentAndNext = None if next is None else current + next
-
-            if escapeSeen:
-                self._logdbg('was previously escaped: {}'.format(current))
-                # the last character was escaped -> append current
-                token.string += current
-                escapeSeen = False
-            elif current == '\\':
-                if next in {'$', '`', '"',  '\\'}:
-                    self._logdbg('escape-char: {}'.format(current))
-                    escapeSeen = True
+        # will first contain the outer double quoted strings and then possibly inner tokens.
+        parts = context.parts
+        idx = self.idx
+        while idx < n:
+            m = matchRun(s, idx)
+            if m is not None:
+                parts.append(m.group())
+                idx = m.end()
+                continue
+
+            current = s[idx]
+            if current == '\\':
+                if s[idx + 1:idx + 2] in self._DOUBLEQUOTE_ESCAPES:
+                    parts.append(s[idx + 1])
+                    idx += 2
                 else:
-                    token.string += current
-            elif currentAndNext is not None and currentAndNext == '$(':
-                # make it clear in the outer token that command-substitution occurred
-                token.string += ShellTokenizer.COMMAND_SUBST_PLACEHOLDER
-                self._createAppendToken(string=currentAndNext, isSplitter=True, startIdx=self.idx, endIdx=self.idx + len(currentAndNext))
-                self.idx += 2
-                self._private_split(closingString=')')
-            elif current == '`':
-                # make it clear in the outer token that command-substitution occurred
-                token.string += ShellTokenizer.COMMAND_SUBST_PLACEHOLDER
-                self._createAppendToken(string=current, isSplitter=True, startIdx=self.idx, endIdx=self.idx + len(current))
-                self.idx += 1
-                self._private_split(closingString='`')
+                    parts.append(current)
+                    idx += 1
             elif current == '"':
                 # remember that the token might *not* be at the back of self.tokens if command-subst. occurred.
-                return
+                self.idx = idx
+                return None
             else:
-                token.string += current
-            self.idx += 1
+                # $( or `
+                # make it clear in the outer token that command-substitution occurred
+                parts.append(ShellTokenizer.COMMAND_SUBST_PLACEHOLDER)
+                opening = '$(' if current == '$' else '`'
+                self.tokens.append(Token(opening, isSplitter=True, startIdx=idx, endIdx=idx + len(opening)))
+                self.idx = idx + len(opening)
+                return _SplitContext(closingString=')' if current == '$' else '`', startIdx=self.idx)
         raise ValueError(
-            "missing closing doublequotes started at index {}: {}".format(startIdx, self.comand[startIdx:]))
-
-
-
-    def _logdbg(self, msg, loglvl=1):
-        if self.debug >= loglvl:
-            print('ShellTokenizer debug:', msg)
-
-
+            "missing closing doublequotes started at index {}: {}".format(context.startIdx, s[context.startIdx:]))
 
 
+class _SplitContext:
+    """
+    Tokenizing the whole command or a command-substitution within double quotes
+    """
+    __slots__ = ('closingString', 'startIdx', 'token', 'parts')
 
+    def __init__(self, closingString, startIdx):
+        self.closingString = closingString
+        self.startIdx = startIdx
+        # the word token interrupted by a double quote and its string parts
+        self.token = None
+        self.parts = None
 
 
+class _DoubleQuoteContext:
+    __slots__ = ('startIdx', 'parts')
 
+    def __init__(self, startIdx, parts):
+        self.startIdx = startIdx
+        # string parts of the token the double quote belongs to
+        self.parts = parts
 
 
+def _finalize_token(token, parts, endIdx):
+    """
+    To be called when a new splitter was detected -> the new splitter shall
+    not be part of the token, so its end-idx is the splitter's start.
+    """
+    if token is None:
+        return
+    assert token.startIdx < endIdx
+    token.string = ''.join(parts)
+    token.endIdx = endIdx
@@ -0,0 +1,145 @@
+"""
+Read commands and their file events directly from shournal's sqlite database
+instead of its json output. The relevant part of the database scheme:
+
+    cmd(id, envId, hashmetaId, txt, returnVal, startTime, endTime, workingDirectory, sessionId)
+    env(id, hostname, username)
+    hashmeta(id, chunkSize, maxCountOfReads)
+    writtenFile(id, cmdId, path, name, mtime, size, hash)
+    readFile(id, path, name, mtime, size, mode, hash, isStoredToDisk)
+    readFileCmd(cmdId, readFileId)
+
+File paths are stored split into directory (path) and filename (name).
+"""
+
+import base64
+import binascii
+import os
+import pathlib
+import sqlite3
+import uuid
+
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.command_selection import CommandSelection
+
+
+class ShournalDatabase:
+
+    def __init__(self, dbPath):
+        """
+        Open the database read-only.
+        :raises sqlite3.Error
+        """
+        uri = pathlib.Path(dbPath).absolute().as_uri() + '?mode=ro'
+        self._conn = sqlite3.connect(uri, uri=True)
+        # Filters, None means no filtering
+        self.sessionId = None  # uuid or base64 encoded uuid (like $SHOURNAL_SESSION_ID)
+        self.workingDir = None
+        self.selection = CommandSelection()
+
+    def close(self):
+        self._conn.close()
+
+    def iter_commands(self):
+        """
+        Fetch the commands matching the filters, ordered by id. Commands, written and read files
+        are each selected with a single query ordered by command id, so the events of a command
+        can be attached by walking all three result sets in lockstep.
+        :return: generator of Command
+        :raises ValueError: on an invalid session id
+        """
+        cmdFilter, params = self._build_cmd_filter()
+        cmdRows = self._conn.execute(
+            'SELECT cmd.id, cmd.txt, cmd.returnVal, env.username, env.hostname, '
+            '       hashmeta.chunkSize, hashmeta.maxCountOfReads, cmd.sessionId, '
+            '       cmd.startTime, cmd.endTime, cmd.workingDirectory '
+            'FROM cmd '
+            'LEFT JOIN env ON env.id = cmd.envId '
+            'LEFT JOIN hashmeta ON hashmeta.id = cmd.hashmetaId '
+            'WHERE {} ORDER BY cmd.id'.format(cmdFilter), params)
+        writeRows = self._conn.execute(
+            'SELECT cmdId, id, path, name, size, mtime, hash FROM writtenFile '
+            'WHERE cmdId IN (SELECT cmd.id FROM cmd WHERE {}) '
+            'ORDER BY cmdId, id'.format(cmdFilter), params)
+        readRows = self._conn.execute(
+            'SELECT readFileCmd.cmdId, readFile.id, readFile.path, readFile.name, readFile.size, '
+            '       readFile.mtime, readFile.hash, readFile.isStoredToDisk '
+            'FROM readFileCmd JOIN readFile ON readFile.id = readFileCmd.readFileId '
+            'WHERE readFileCmd.cmdId IN (SELECT cmd.id FROM cmd WHERE {}) '
+            'ORDER BY readFileCmd.cmdId, readFile.id'.format(cmdFilter), params)
+
+        writeGroups = _RowsByCmdId(writeRows)
+        readGroups = _RowsByCmdId(readRows)
+        for (cmdId, txt, returnVal, username, hostname, chunkSize, maxCountOfReads,
+             sessionId, startTime, endTime, workingDir) in cmdRows:
+            fileWriteEvents = [FileWriteEvent(id=fId, path=os.path.join(path, name),
+                                              size=size, mtime=mtime, hash=hash_)
+                               for _, fId, path, name, size, mtime, hash_ in writeGroups.take(cmdId)]
+            fileReadEvents = [FileReadEvent(id=fId, path=os.path.join(path, name), size=size,
+                                            mtime=mtime, hash=hash_, isStoredToDisk=bool(isStored))
+                              for _, fId, path, name, size, mtime, hash_, isStored in readGroups.take(cmdId)]
+            yield Command(id=cmdId, command=txt, returnValue=returnVal, username=username,
+                          hostname=hostname, hashChunkSize=chunkSize, hashMaxCountOfReads=maxCountOfReads,
+                          sessionUuid=None if sessionId is None else base64.b64encode(sessionId).decode(),
+                          startTime=startTime, endTime=endTime, workingDir=workingDir,
+                          fileReadEvents=fileReadEvents, fileWriteEvents=fileWriteEvents)
+
+    def _build_cmd_filter(self):
+        conditions = ['1']
+        params = []
+        if self.sessionId is not None:
+            conditions.append('cmd.sessionId = ?')
+            params.append(_session_id_to_blob(self.sessionId))
+        if self.workingDir is not None:
+            conditions.append('cmd.workingDirectory = ?')
+            params.append(self.workingDir)
+        sel = self.selection
+        if sel.firstId is not None:
+            conditions.append('cmd.id >= ?')
+            params.append(sel.firstId)
+        if sel.lastId is not None:
+            conditions.append('cmd.id <= ?')
+            params.append(sel.lastId)
+        if sel.startTimeFrom is not None:
+            conditions.append('cmd.startTime >= ?')
+            params.append(sel.startTimeFrom)
+        if sel.startTimeTo is not None:
+            conditions.append('cmd.startTime < ?')
+            params.append(sel.startTimeTo)
+        if sel.lastCount is not None:
+            # the last N of the otherwise matching commands
+            conditions = ['cmd.id IN (SELECT cmd.id FROM cmd WHERE {} ORDER BY cmd.id DESC LIMIT ?)'
+                          .format(' AND '.join(conditions))]
+            params.append(sel.lastCount)
+        return ' AND '.join(conditions), params
+
+
+class _RowsByCmdId:
+    """
+    Hand out consecutive rows of a result set ordered by command id (the first column).
+    """
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._next = next(self._rows, None)
+
+    def take(self, cmdId):
+        """
+        :return: all rows of the given command id. Rows of smaller ids are skipped.
+        """
+        taken = []
+        while self._next is not None and self._next[0] <= cmdId:
+            if self._next[0] == cmdId:
+                taken.append(self._next)
+            self._next = next(self._rows, None)
+        return taken
+
+
+def _session_id_to_blob(sessionId):
+    try:
+        return uuid.UUID(sessionId).bytes
+    except ValueError:
+        pass
+    try:
+        return base64.b64decode(sessionId, validate=True)
+    except binascii.Error:
+        raise ValueError("invalid session id: {}".format(sessionId))
@@ -0,0 +1,129 @@
+"""
+Update a previously generated Snakefile in place, instead of regenerating it:
+rules are matched by the fingerprint markers written by RulePrinter (see
+fingerprint_marker). Unchanged rules are kept as they are, including their names
+and positions, a changed rule replaces the rule writing the same outputs and
+new rules are appended. Rules of the existing file which are not generated
+again, as well as all text which is not part of a generated rule, are kept.
+"""
+
+import re
+
+from shournal_to_snakemake.rule_printer import OutputSink, AtomicFile, FINGERPRINT_MARKER, rule_digests
+
+_RULE_LINE = re.compile(r'^rule (\w+):', re.MULTILINE)
+_MARKER = re.compile(r'^[ \t]*' + re.escape(FINGERPRINT_MARKER) + r'rule=([0-9a-f]+) output=([0-9a-f]+)[ \t]*$',
+                     re.MULTILINE)
+_GENERATED_NAME = re.compile(r'undefined_(\d+)$')
+
+
+class _Block:
+    """
+    A rule of the existing Snakefile, from its rule-line up to the next one.
+    """
+    __slots__ = ('name', 'text', 'ruleDigest', 'outputDigest')
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        marker = _MARKER.search(text)
+        self.ruleDigest, self.outputDigest = marker.groups() if marker else (None, None)
+
+
+def parse_snakefile(text):
+    """
+    :return: (text before the first rule, list of _Block's)
+    """
+    starts = [m.start() for m in _RULE_LINE.finditer(text)]
+    if not starts:
+        return text, []
+    ends = starts[1:] + [len(text)]
+    blocks = [_Block(_RULE_LINE.match(text, start).group(1), text[start:end])
+              for start, end in zip(starts, ends)]
+    return text[:starts[0]], blocks
+
+
+def update_snakefile(path, rules, rulePrinter):
+    """
+    Merge the rules into the Snakefile at path, which is created, if it does not exist,
+    and written atomically.
+    :param rules: iterable of named rules, all read before the first one is matched
+    :param rulePrinter: RulePrinter, its fingerprints are enabled
+    :return: (number of unchanged, changed and added rules)
+    :raises OSError, UnicodeDecodeError
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        text = ''
+    header, blocks = parse_snakefile(text)
+
+    # digest -> indices of the blocks, which were not yet matched by a generated rule
+    blocksByRule = {}
+    blocksByOutput = {}
+    ruleNumber = 0
+    for idx, block in enumerate(blocks):
+        if block.ruleDigest is not None:
+            blocksByRule.setdefault(block.ruleDigest, []).append(idx)
+            blocksByOutput.setdefault(block.outputDigest, []).append(idx)
+        m = _GENERATED_NAME.match(block.name)
+        if m is not None:
+            ruleNumber = max(ruleNumber, int(m.group(1)))
+
+    rulePrinter.fingerprints = True
+    rules = list(rules)
+    matched = set()
+    # First keep all unchanged rules, so a changed rule does not take the block of a
+    # later unchanged rule with the same outputs.
+    unmatchedRules = []
+    for rule in rules:
+        ruleDigest, outputDigest = rule_digests(rule)
+        if _pop_unmatched(blocksByRule.get(ruleDigest), matched) is None:
+            unmatchedRules.append((rule, outputDigest))
+    unchangedCount = len(rules) - len(unmatchedRules)
+
+    changedCount = 0
+    added = []
+    for rule, outputDigest in unmatchedRules:
+        idx = _pop_unmatched(blocksByOutput.get(outputDigest), matched)
+        if idx is not None:
+            # replace in place under the old name
+            rule.rulename = blocks[idx].name
+            blocks[idx].text = rulePrinter.render(rule)
+            changedCount += 1
+            continue
+        # continue the numbering of the existing rules
+        ruleNumber += 1
+        rule.rulename = 'undefined_{}'.format(ruleNumber)
+        added.append(rule)
+
+    outputFile = AtomicFile(path)
+    try:
+        sink = OutputSink(outputFile)
+        sink.write(header)
+        for block in blocks:
+            sink.write(block.text)
+        if added and text and not text.endswith('\n\n'):
+            # separate the new rules by an empty line
+            sink.write('\n' if text.endswith('\n') else '\n\n')
+        for rule in added:
+            sink.write(rulePrinter.render(rule))
+        sink.close()
+    except BaseException:
+        outputFile.discard()
+        raise
+    outputFile.commit()
+    return unchangedCount, changedCount, len(added)
+
+
+def _pop_unmatched(indices, matched):
+    """
+    :return: the first block index not in matched, which is then added to it, or None
+    """
+    while indices:
+        idx = indices.pop(0)
+        if idx not in matched:
+            matched.add(idx)
+            return idx
+    return None
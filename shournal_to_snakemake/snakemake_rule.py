@@ -1,6 +1,5 @@
 
 import os
-import sys
 import logging
 import itertools
 
@@ -13,10 +12,15 @@ from ordered_set import OrderedSet
 from shournal_to_snakemake.shell_tokenizer import ShellTokenizer
 from shournal_to_snakemake.command import FileReadEvent, FileWriteEvent
 from shournal_to_snakemake.shell_tokenizer import Token
+from shournal_to_snakemake.lru_cache import LruCache
 
 
 thislogger = logging.getLogger()
 
+# Parsed commands by (command string, working dir). Commands like make or ./run.sh are
+# typically executed many times, so they only need to be tokenized once.
+PARSE_CACHE = LruCache(maxSize=1024)
+
 
 class SnakemakeRule:
     """
@@ -38,21 +42,17 @@ class SnakemakeRule:
         # if we are able to find them in the raw shell command.
         self.processedCommandString = command.command
 
-        tokenizer = ShellTokenizer()
-
         try:
-            tokens = tokenizer.split(command.command)
+            tokens, resolvedPathTokensDict = self._parse_command(command.command, command.workingDir)
         except ValueError as e:
             thislogger.warning('Unable to parse shell command {} - {}'.format(command.command, e))
-            self.input[:] = [x.path for x in command.fileReadEvents]
-            self.output[:] = [x.path for x in command.fileWriteEvents]
+            self.input = OrderedSet(command.fileReadEvents)
+            self.output = OrderedSet(command.fileWriteEvents)
             return
 
-        filenameTokensDict = self._build_filename_tokens_dict(tokens)
-
         # Order of input/output token assignment matters!
-        inputFilesNoToken = self._assing_input_tokens( filenameTokensDict, command.fileReadEvents)
-        outputFilesNoToken = self._assign_output_tokens( filenameTokensDict, command.fileWriteEvents)
+        inputFilesNoToken = self._assing_input_tokens(resolvedPathTokensDict, command.fileReadEvents)
+        outputFilesNoToken = self._assign_output_tokens(resolvedPathTokensDict, command.fileWriteEvents)
 
         cmdMeta = self._check_if_IO_qualifiers_needed(tokens)
         # if not all io-files could be assigned use qualifiers anyway:
@@ -67,16 +67,44 @@ class SnakemakeRule:
         self.processedCommandString = self._generate_command_string_with_IO_vars(cmdMeta)
 
 
-    def _build_filename_tokens_dict(self, tokens):
+    def _parse_command(self, commandString, workingDir):
+        """
+        Tokenize the command string and build its resolved path tokens dict or take both from
+        PARSE_CACHE, if the same command was already executed in the same working dir.
+        :return: (tokens, resolvedPathTokensDict), whose tokens have no file events attached
+        :raises ValueError: if the command can not be tokenized
+        """
+        key = (commandString, workingDir)
+        parsed = PARSE_CACHE.get(key)
+        if parsed is None:
+            try:
+                tokens = ShellTokenizer().split(commandString)
+            except ValueError as e:
+                parsed = _ParsedCommand(None, None, str(e))
+            else:
+                parsed = _ParsedCommand(tokens, self._build_resolved_path_tokens_dict(tokens, workingDir), None)
+            PARSE_CACHE.put(key, parsed)
+        elif parsed.tokens is not None:
+            # reused -> detach the file events of the previous rule
+            for token in parsed.tokens:
+                token.attachedFileEvent = None
+
+        if parsed.error is not None:
+            raise ValueError(parsed.error)
+        return parsed.tokens, parsed.resolvedPathTokensDict
+
+    def _build_resolved_path_tokens_dict(self, tokens, workingDir):
         """
-        Build a dictionary with possible file-names as key and the corresponding
-        tokens as values (the same file-name might appear in multiple tokens).
-        A possible file-name is considered the whole token-string, if no path separator
-        is found, else the <file-name> of os.path.split(p)
+        Build a dictionary with possible file-paths as key and the corresponding
+        tokens as values (the same path might appear in multiple tokens). The path of a
+        word token is its string made absolute (relative to workingDir) and normalized,
+        so a file event's tokens are found by a single lookup of its path.
+        Tokens without a file-name, i.e. whose string is empty or only consists of
+        path separators, are skipped.
         """
 
-        # a filename might appear in multiple tokens -> defaultdict(list)
-        filenameTokensDict = defaultdict(list)
+        # a path might appear in multiple tokens -> defaultdict(list)
+        resolvedPathTokensDict = defaultdict(list)
         for token in tokens:
             # dynamically add some meta data field about the token which we need later
             token.attachedFileEvent = None
@@ -88,25 +116,24 @@ class SnakemakeRule:
             # ignore trailing slashes
             tokenStr = token.string[:-1] if token.string.endswith('/') else token.string
 
-            # each token is expected to contain at most one path,
-            # where we extract the filename (the last entry) from:
-            filename = os.path.split(tokenStr)[1]
-            if not filename:
+            # each token is expected to contain at most one path
+            if not os.path.split(tokenStr)[1]:
                 continue
-            filenameTokensDict[filename].append(token)
+            # to abs path, if not already absolute
+            resolved = tokenStr if tokenStr.startswith('/') else os.path.join(workingDir, tokenStr)
+            resolvedPathTokensDict[os.path.normpath(resolved)].append(token)
 
-        return filenameTokensDict
+        return resolvedPathTokensDict
 
 
-    def _assing_input_tokens(self, filenameTokensDict, readEvents):
+    def _assing_input_tokens(self, resolvedPathTokensDict, readEvents):
         """
         Assign file read events to tokens. The same file path may appear in multiple tokens.
         :return set of read events that could not be assigned.
         """
         notFoundEvents = set()
         for file in readEvents:
-            matchingTokens = self._findMatchingTokensForPath(filenameTokensDict, file.path,
-                                                             self.command.workingDir)
+            matchingTokens = self._findMatchingTokensForPath(resolvedPathTokensDict, file)
             if not matchingTokens:
                 notFoundEvents.add(file)
                 continue
@@ -117,7 +144,7 @@ class SnakemakeRule:
         return notFoundEvents
 
 
-    def _assign_output_tokens(self, filenameTokensDict, writeEvents):
+    def _assign_output_tokens(self, resolvedPathTokensDict, writeEvents):
         """
         Assign file write events to tokens. This is called, *after* the read events were
         assigned to the tokens. The same file path may appear in multiple tokens.
@@ -127,8 +154,7 @@ class SnakemakeRule:
         """
         notFoundEvents = set()
         for file in writeEvents:
-            matchingTokens = self._findMatchingTokensForPath(filenameTokensDict, file.path,
-                                                             self.command.workingDir)
+            matchingTokens = self._findMatchingTokensForPath(resolvedPathTokensDict, file)
             if not matchingTokens:
                 notFoundEvents.add(file)
                 continue
@@ -155,21 +181,13 @@ class SnakemakeRule:
         return notFoundEvents
 
 
-    def _findMatchingTokensForPath(self, filenameTokensDict, path, workingDir):
-        matchingTokens = filenameTokensDict.get(os.path.split(path)[1], None)
-        if matchingTokens is None:
-            return []
-
-        for i in range(len(matchingTokens) - 1, -1, -1):
-            t = matchingTokens[i]
-            # to abs path, if not already absolute
-            resolved = t.string if t.string.startswith('/') else os.path.join(workingDir, t.string)
-            resolved = os.path.normpath(resolved)
-            if resolved != path:
-                thislogger.debug("discarding path «{}» not matching «{}»".format(resolved, path))
-                del matchingTokens[i]
-
-        return matchingTokens
+    def _findMatchingTokensForPath(self, resolvedPathTokensDict, fileEvent):
+        """
+        :return: the tokens resolving to the path of the file event. The returned list
+                 belongs to resolvedPathTokensDict and must not be modified, so the dict
+                 may be reused for other file events and rules.
+        """
+        return resolvedPathTokensDict.get(fileEvent.path, ())
 
 
     def _check_if_IO_qualifiers_needed(self, tokens):
@@ -289,6 +307,7 @@ class SnakemakeRule:
         Replace all found paths in the command-string with either unqualified
         {input/output} (if all input file-paths occurred in a row) or qualified
         {intput.f1/output.f2} variables and return the new command string.
+        If the paths to replace overlap, the command string is returned unchanged.
         """
         # _dbg_print_tokens(cmdMeta.inputTokens)
         # _dbg_print_tokens(cmdMeta.outputTokens)
@@ -307,29 +326,31 @@ class SnakemakeRule:
             if cmdMeta.outputTokens:
                 replaceTokens.append(_UnqualifiedToken(cmdMeta.outputTokens))
 
-        # we <replace> stuff in a string, do it from backwards
-        replaceTokens.sort(key=lambda t: t.startIdx, reverse=True)
-
-        newCommandStr = self.command.command
-        lastStartIdx = sys.maxsize
+        # Walk the replacement spans in order and join the unchanged segments between them
+        # with the variables once at the end.
+        replaceTokens.sort(key=attrgetter('startIdx'))
+        commandStr = self.command.command
+        segments = []
+        lastEndIdx = 0
         for t in replaceTokens:
-            # TODO:
-            #  rather warning than assert? Could that happen in case
-            #  of recursive double-quote resolution?
-            assert t.endIdx < lastStartIdx and t.startIdx < t.endIdx
-
+            if t.startIdx < lastEndIdx or t.startIdx >= t.endIdx:
+                # Could that happen in case of recursive double-quote resolution? Better keep
+                # the command as it is than generating a broken one.
+                thislogger.warning("Unable to replace the file paths of command {} by {{input}}/{{output}}, "
+                                   "because they overlap at index {}: {}"
+                                   .format(self.command.id, t.startIdx, commandStr))
+                return commandStr
+
+            segments.append(commandStr[lastEndIdx:t.startIdx])
             if isinstance(t, _UnqualifiedToken):
-                inputOrOutput = "{input}" if t.isInput else "{output}"
-                newCommandStr = newCommandStr[:t.startIdx] + inputOrOutput \
-                                 + newCommandStr[t.endIdx:]
+                segments.append("{input}" if t.isInput else "{output}")
             else:
                 inputOrOutput = "input" if isinstance(t.attachedFileEvent, FileReadEvent) else "output"
-                newCommandStr = newCommandStr[:t.startIdx] +\
-                                "{" + inputOrOutput + "." + t.attachedFileEvent.varnameIO + "}" + \
-                                    newCommandStr[t.endIdx:]
-            lastStartIdx = t.startIdx
+                segments.append("{" + inputOrOutput + "." + t.attachedFileEvent.varnameIO + "}")
+            lastEndIdx = t.endIdx
+        segments.append(commandStr[lastEndIdx:])
 
-        return newCommandStr
+        return ''.join(segments)
 
 
 class _UnqualifiedToken(Token):
@@ -345,6 +366,19 @@ class _UnqualifiedToken(Token):
         self.isInput = isinstance(tokenlist[0].attachedFileEvent, FileReadEvent)
 
 
+class _ParsedCommand:
+    """
+    Cached result of tokenizing a command string. tokens and resolvedPathTokensDict are
+    None, if tokenizing failed with the given error.
+    """
+    __slots__ = ('tokens', 'resolvedPathTokensDict', 'error')
+
+    def __init__(self, tokens, resolvedPathTokensDict, error):
+        self.tokens = tokens
+        self.resolvedPathTokensDict = resolvedPathTokensDict
+        self.error = error
+
+
 class _CommandMeta:
     def __init__(self):
         # All tokens with belonging input event, naturally ordered by occurrence
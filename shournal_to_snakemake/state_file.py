@@ -0,0 +1,51 @@
+"""
+Persist the state of a conversion, so a later run on the grown session only
+processes the commands which are newer than the last run's. Rule names and
+duplicate suppression then stay consistent with a full run.
+"""
+
+import json
+import os
+
+_STATE_VERSION = 3
+# Version 1 kept the paths of each command in the duplicate index, versions 1 and 2 a
+# single last command id for all hosts. CommandLoader.restore_state still reads them.
+_SUPPORTED_VERSIONS = (1, 2, 3)
+
+
+def load_state(path, cmdLoader, ruleGenerator):
+    """
+    Restore the state of cmdLoader and ruleGenerator from the given file.
+    :return: False, if the file does not exist (yet)
+    :raises OSError, ValueError: if the file can not be read or is invalid
+    """
+    try:
+        f = open(path, 'r')
+    except FileNotFoundError:
+        return False
+    with f:
+        state = json.load(f)
+    try:
+        if state['version'] not in _SUPPORTED_VERSIONS:
+            raise ValueError("unsupported state version {}".format(state['version']))
+        cmdLoader.restore_state(state['commandLoader'])
+        ruleGenerator.ruleCounter = state['ruleCounter']
+    except (KeyError, TypeError) as e:
+        raise ValueError("invalid state file: {}".format(e))
+    return True
+
+
+def save_state(path, cmdLoader, ruleGenerator):
+    """
+    Atomically (over)write the state file.
+    :raises OSError
+    """
+    state = {
+        'version': _STATE_VERSION,
+        'commandLoader': cmdLoader.to_state(),
+        'ruleCounter': ruleGenerator.ruleCounter,
+    }
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmpPath, path)
@@ -0,0 +1,103 @@
+"""
+Commands, file events and rules shared by several tests. File paths are given
+relative to the command's working dir (by default WORKING_DIR) or absolute.
+"""
+
+import itertools
+import json
+import os
+
+from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
+from shournal_to_snakemake.dependency_graph import DependencyGraph
+from shournal_to_snakemake.snakemake_rule import SnakemakeRule
+
+WORKING_DIR = '/home/user'
+
+# ids of commands and file events, if not given explicitly
+_ids = itertools.count(1)
+
+
+def make_read_event(path):
+    eventId = next(_ids)
+    return FileReadEvent(id=eventId, path=path, size=eventId, hash=123, isStoredToDisk=False)
+
+
+def make_write_event(path):
+    eventId = next(_ids)
+    return FileWriteEvent(id=eventId, path=path, size=eventId, hash=123)
+
+
+def make_command(cmdId=None, readPaths=(), writePaths=(), command=None, workingDir=WORKING_DIR, **kwargs):
+    """
+    :param cmdId: by default the next unused id
+    :param command: the command string, by default cmd<cmdId>
+    :param kwargs: further attributes of the Command, e.g. startTime
+    """
+    if cmdId is None:
+        cmdId = next(_ids)
+    return Command(command='cmd{}'.format(cmdId) if command is None else command, id=cmdId,
+                   workingDir=workingDir,
+                   fileReadEvents=[make_read_event(os.path.join(workingDir, p)) for p in readPaths],
+                   fileWriteEvents=[make_write_event(os.path.join(workingDir, p)) for p in writePaths],
+                   **kwargs)
+
+
+def make_graph(*commands):
+    graph = DependencyGraph()
+    for c in commands:
+        graph.add_command(c)
+    return graph
+
+
+def make_commands(count):
+    """
+    :return: the commands 1 ... count of make_rule
+    """
+    return [_make_cat_command(i) for i in range(1, count + 1)]
+
+
+def make_rule(i):
+    """
+    :return: the rule undefined_<i> of command i «cat r<i> > w<i>.txt», started at minute i
+    """
+    rule = SnakemakeRule(_make_cat_command(i))
+    rule.rulename = 'undefined_{}'.format(i)
+    return rule
+
+
+def make_rule_of(command=None, readPaths=(), writePaths=(), **kwargs):
+    """
+    :return: an unnamed rule of a new command, see make_command
+    """
+    return SnakemakeRule(make_command(readPaths=readPaths, writePaths=writePaths, command=command, **kwargs))
+
+
+def make_raw_command(cmdId, command, readPaths=(), writePaths=(), startTime=None, workingDir=WORKING_DIR,
+                     hostname='host'):
+    """
+    :return: a dict in the layout of shournal's json output of a command, started at second cmdId
+             by default.
+    """
+    if startTime is None:
+        startTime = '2020-05-18T17:{:02}:{:02}'.format(*divmod(cmdId, 60))
+    return {'id': cmdId, 'command': command, 'workingDir': workingDir, 'hostname': hostname,
+            'startTime': startTime, 'endTime': startTime, 'returnValue': 0,
+            'fileReadEvents': [{'id': next(_ids), 'path': os.path.join(workingDir, p), 'size': 1, 'hash': 123,
+                                'mtime': startTime, 'isStoredToDisk': False} for p in readPaths],
+            'fileWriteEvents': [{'id': next(_ids), 'path': os.path.join(workingDir, p), 'size': 1, 'hash': 123,
+                                 'mtime': startTime} for p in writePaths]}
+
+
+def make_session_bytes(rawCommands):
+    """
+    :return: the session of the raw commands, as printed by shournal --query --output-format json
+    """
+    lines = ['HEADER:' + json.dumps({'pathToReadFiles': '/tmp'})]
+    lines += ['COMMAND:' + json.dumps(raw) for raw in rawCommands]
+    lines.append('FOOTER:{}')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _make_cat_command(i):
+    return make_command(i, ['r{}'.format(i)], ['w{}.txt'.format(i)], command='cat r{0} > w{0}.txt'.format(i),
+                        startTime='2020-05-18T17:{:02}:00'.format(i), endTime='2020-05-18T17:{:02}:30'.format(i))
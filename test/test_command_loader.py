@@ -0,0 +1,233 @@
+import json
+import tracemalloc
+import unittest
+
+from shournal_to_snakemake.command_loader import CommandLoader
+from shournal_to_snakemake.command import Command
+from shournal_to_snakemake.path_table import PATHS
+from test.factories import make_command
+
+
+class CommandLoaderTest(unittest.TestCase):
+    def test_duplicates(self):
+        loader = CommandLoader()
+        c1 = make_command(readPaths=['r1'], writePaths=['w1'], command='cat r1 > w1')
+        c2 = make_command(readPaths=['r1'], writePaths=['w1'], command='cat r1 > w1')
+        c3 = make_command(readPaths=['r2'], writePaths=['w1'], command='cat r1 > w1')
+
+        self.assertTrue(loader.maybde_add_command(c1))
+        self.assertFalse(loader.maybde_add_command(c2))
+        self.assertTrue(loader.maybde_add_command(c3))
+        self.assertEqual([c1, c3], loader.commands)
+
+    def test_duplicates_fingerprint(self):
+        loader = CommandLoader()
+        c1 = make_command(readPaths=['a', 'b'], writePaths=['w1'], command='cat a b > w1')
+        c2 = make_command(readPaths=['b', 'a'], writePaths=['w1'], command='cat a b > w1')
+        # same paths, but read instead of written
+        c3 = make_command(readPaths=['w1'], writePaths=['a', 'b'], command='cat a b > w1')
+        self.assertTrue(loader.maybde_add_command(c1))
+        self.assertFalse(loader.maybde_add_command(c2))
+        self.assertTrue(loader.maybde_add_command(c3))
+
+    def test_include_exclude_roots(self):
+        loader = CommandLoader()
+        loader.excludeRoots = ['/usr', '/home/user/.cache']
+        loader.includeRoots = ['/data', '/usr/share/data']
+        c1 = make_command(readPaths=['run.py', '/usr/lib/python.so', '.cache/x', '/usr/share/data/ref', '/etc/passwd'],
+                          writePaths=['/data/out', '/tmp/log', '.cache/y'], command='python run.py > /data/out')
+        self.assertTrue(loader.maybde_add_command(c1))
+        self.assertEqual(['/home/user/run.py', '/usr/share/data/ref', '/etc/passwd'],
+                         [f.path for f in c1.fileReadEvents])
+        self.assertEqual(['/data/out'], [f.path for f in c1.fileWriteEvents])
+
+    def test_working_dir_itself_is_outside(self):
+        loader = CommandLoader()
+        loader.ignoreWfilesOutsideCwd = True
+        c1 = make_command(writePaths=['/home/user', 'out'], command='mkdir -p out')
+        self.assertTrue(loader.maybde_add_command(c1))
+        self.assertEqual(['/home/user/out'], [f.path for f in c1.fileWriteEvents])
+
+    def test_normalize_file_events(self):
+        loader = CommandLoader()
+        c1 = make_command(readPaths=['a', './b', '/usr/lib/x', 'b', 'a'], writePaths=['out', '/tmp/log', 'sub/../out'],
+                          command='python run.py')
+        self.assertTrue(loader.maybde_add_command(c1))
+        # the last event of a path is kept, the order is otherwise unchanged
+        self.assertEqual(['/usr/lib/x', '/home/user/b', '/home/user/a'], [f.path for f in c1.fileReadEvents])
+        self.assertEqual(['/home/user/out'], [f.path for f in c1.fileWriteEvents])
+        self.assertEqual({'duplicate read path': 2, 'duplicate written path': 1, 'filtered written path': 1},
+                         dict(loader.dropCounts))
+
+    def test_order_by_dependencies(self):
+        loader = CommandLoader()
+        c1 = make_command(readPaths=['a'], writePaths=['b'], command='cat a > b')
+        c2 = make_command(writePaths=['c'], command='echo x > c')
+        c3 = make_command(writePaths=['a'], command='echo x > a')
+        for c in (c1, c2, c3):
+            loader.maybde_add_command(c)
+        with self.assertLogs('shournal_to_snakemake.command_loader', 'WARNING') as logs:
+            loader.maybde_add_command(make_command(writePaths=['c'], command='echo y > c'))
+            loader.order_by_dependencies()
+        self.assertEqual([c2, c3, c1], loader.commands[:3])
+        self.assertIn('/home/user/c is written by multiple commands', logs.output[0])
+
+    def test_restrict_to_targets(self):
+        loader = CommandLoader()
+        c1 = make_command(writePaths=['a'], command='echo x > a')
+        c2 = make_command(writePaths=['b'], command='echo x > b')
+        c3 = make_command(readPaths=['a'], writePaths=['c'], command='cat a > c')
+        for c in (c1, c2, c3):
+            loader.maybde_add_command(c)
+        self.assertEqual(['/home/user/nope'], loader.restrict_to_targets(['/home/user/c', '/home/user/nope']))
+        loader.order_by_dependencies()
+        self.assertEqual([c1, c3], loader.commands)
+
+    def test_stream(self):
+        loader = CommandLoader()
+        loader.keepCommands = False
+        c1 = make_command(writePaths=['w1'], command='echo a > w1')
+        c2 = make_command(readPaths=['w1'], command='ls')
+        c3 = make_command(writePaths=['w1'], command='echo a > w1', workingDir='/other')
+        c4 = make_command(writePaths=['w1'], command='echo a > w1')
+        c5 = make_command(readPaths=['w1'], writePaths=['w2'], command='cat w1 > w2')
+
+        self.assertEqual([c1, c5], list(loader.iter_accepted([c1, c2, c3, c4, c5])))
+        self.assertEqual([], loader.commands)
+        self.assertEqual('/home/user', loader.cwd)
+
+    def test_stream_interns_only_kept_paths(self):
+        loader = CommandLoader()
+        loader.keepCommands = False
+        loader.excludeRoots = ['/usr']
+        c1 = make_command(readPaths=['/usr/stream/lib', 'r1'], writePaths=['w1', '/tmp/stream/log'],
+                          command='cat lib > w1', workingDir='/home/stream')
+        c2 = make_command(writePaths=['w2'], command='echo a > w2', workingDir='/other/stream')
+        c3 = make_command(readPaths=['r3'], writePaths=['/tmp/stream/log3'], command='echo a > log',
+                          workingDir='/home/stream')
+        self.assertEqual([c1], list(loader.iter_accepted([c1, c2, c3])))
+        # streaming does not build a dependency graph, so no path is interned at all
+        for path in ('/home/stream/r1', '/home/stream/w1', '/usr/stream/lib', '/tmp/stream/log',
+                     '/other/stream/w2', '/home/stream/r3', '/tmp/stream/log3'):
+            self.assertIsNone(PATHS.get_id(path), path)
+
+    def test_path_caches_are_bounded(self):
+        loader = CommandLoader()
+        loader.keepCommands = False
+        loader.PATH_CACHE_SIZE = 10
+        for i in range(50):
+            loader.maybde_add_command(make_command(readPaths=['r{}'.format(i)], writePaths=['w{}'.format(i)],
+                                                   command='echo a > w'))
+        self.assertLessEqual(len(loader._cleanPaths), 10)
+        for _, decisions in loader._pathFilters.values():
+            self.assertLessEqual(len(decisions), 10)
+
+    def test_stream_memory_is_bounded(self):
+        loader = CommandLoader()
+        loader.keepCommands = False
+        loader.PATH_CACHE_SIZE = 64
+
+        def commands(start, count):
+            for i in range(start, start + count):
+                paths = ['/home/user/bounded/{}/{}'.format(i, k) for k in range(20)]
+                yield make_command(readPaths=paths[:10], writePaths=paths[10:], command='cat r > w')
+
+        def retained(start, count):
+            tracemalloc.start()
+            try:
+                for _ in loader.iter_accepted(commands(start, count)):
+                    pass
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        tableSize = len(PATHS)
+        retained(0, 100)
+        small = retained(100, 200)
+        large = retained(300, 2000)
+        self.assertEqual(tableSize, len(PATHS))
+        # only the fixed-size duplicate index entry of each command is retained
+        self.assertLess(large / 2000, 400)
+        self.assertLess(large - small, 1800 * 400)
+
+    def test_state(self):
+        loader = CommandLoader()
+        c1 = make_command(readPaths=['r1'], writePaths=['w1'], command='cat r1 > w1')
+        c2 = make_command(readPaths=['r1'], command='ls')
+        loader.maybde_add_command(c1)
+        loader.maybde_add_command(c2)
+        state = json.loads(json.dumps(loader.to_state()))
+
+        loader = CommandLoader()
+        loader.restore_state(state)
+        self.assertEqual('/home/user', loader.cwd)
+        self.assertEqual({'': c2.id}, loader.lastCommandIds)
+        c3 = make_command(readPaths=['r1'], writePaths=['w1'], command='cat r1 > w1')
+        c4 = make_command(readPaths=['r1'], writePaths=['w1'], command='cat r1 > w1', workingDir='/other')
+        self.assertFalse(loader.maybde_add_command(c3))
+        self.assertFalse(loader.maybde_add_command(c4))
+        self.assertEqual({'': c4.id}, loader.lastCommandIds)
+        # already processed
+        c2.command = 'cat r1 > w2'
+        self.assertFalse(loader.maybde_add_command(c2))
+
+    def test_restore_old_state(self):
+        loader = CommandLoader()
+        loader.restore_state({'cwd': '/home/user', 'lastCommandId': 7,
+                              'duplicateIndex': {'cat r1 > w1': [[7, ['/home/user/w1'], ['/home/user/r1']]]}})
+        c1 = make_command(8, ['r1'], ['w1'], command='cat r1 > w1', hostname='a')
+        c2 = make_command(7, ['r2'], ['w2'], command='cat r2 > w2', hostname='b')
+        self.assertFalse(loader.maybde_add_command(c1))
+        self.assertFalse(loader.maybde_add_command(c2))
+        c2.id = 8
+        self.assertTrue(loader.maybde_add_command(c2))
+
+    def test_state_of_several_hosts(self):
+        # each host has its own id space
+        def session(cmdIds):
+            commands = []
+            for hostname, cmdId in cmdIds:
+                commands.append(make_command(cmdId, writePaths=[str(cmdId)], command='echo {0} > {0}'.format(cmdId),
+                                             hostname=hostname))
+            return commands
+
+        loader = CommandLoader()
+        self.assertEqual(2, len(list(loader.iter_accepted(session([('a', 500), ('b', 3)])))))
+        state = json.loads(json.dumps(loader.to_state()))
+
+        loader = CommandLoader()
+        loader.restore_state(state)
+        accepted = loader.iter_accepted(session([('a', 500), ('a', 501), ('b', 3), ('b', 4)]))
+        self.assertEqual([('a', 501), ('b', 4)], [(c.hostname, c.id) for c in accepted])
+        self.assertEqual({'a': 501, 'b': 4}, loader.lastCommandIds)
+
+    def test_quick_reject(self):
+        loader = CommandLoader()
+        noWrites = {'command': 'echo \\"fileWriteEvents\\":[]', 'workingDir': '/home/user',
+                    'fileReadEvents': [{'path': '/x'}], 'fileWriteEvents': []}
+        writes = dict(noWrites, fileWriteEvents=[{'path': '/home/user/x'}])
+        otherDir = dict(writes, workingDir='/home/user2')
+        self.assertTrue(loader.quick_reject(json.dumps(noWrites).encode()))
+        self.assertTrue(loader.quick_reject(json.dumps(noWrites, separators=(',', ':')).encode()))
+        self.assertFalse(loader.quick_reject(json.dumps(writes).encode()))
+        # the working dir is not known yet
+        self.assertFalse(loader.quick_reject(json.dumps(otherDir).encode()))
+
+        loader.cwd = '/home/user'
+        self.assertFalse(loader.quick_reject(json.dumps(writes).encode()))
+        self.assertTrue(loader.quick_reject(json.dumps(otherDir).encode()))
+        self.assertEqual(3, loader.quickRejectCount)
+
+    def test_lazy_read_events(self):
+        raw = {'id': 1, 'command': 'ls', 'workingDir': '/home/user',
+               'fileReadEvents': [{'id': 2, 'path': '/home/user/r1'}], 'fileWriteEvents': []}
+        cmd = Command.from_json(raw)
+        self.assertIsNone(cmd._fileReadEvents)
+        self.assertFalse(CommandLoader().maybde_add_command(cmd))
+        # rejected because of the missing write events -> read events never materialized
+        self.assertIsNone(cmd._fileReadEvents)
+        self.assertEqual(['/home/user/r1'], [f.path for f in cmd.fileReadEvents])
+
+
+if __name__ == '__main__':
+    unittest.main()
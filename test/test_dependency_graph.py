@@ -0,0 +1,52 @@
+import unittest
+
+from shournal_to_snakemake.path_table import PATHS
+from test.factories import make_command, make_graph
+
+
+class DependencyGraphTest(unittest.TestCase):
+    def test_execution_order_is_kept(self):
+        graph = make_graph(make_command(1, [], ['a']),
+                           make_command(2, ['x'], ['b']),
+                           make_command(3, ['a', 'b'], ['c']),
+                           make_command(4, ['a'], ['d']))
+        self.assertEqual({2, 3}, graph.successors(0))
+        self.assertEqual({0, 1}, graph.predecessors(2))
+        self.assertEqual(([0, 1, 2, 3], []), graph.topological_order())
+
+    def test_producer_comes_first(self):
+        # the file was read before it was (re-)created
+        graph = make_graph(make_command(1, ['a'], ['b']),
+                           make_command(2, [], ['c']),
+                           make_command(3, [], ['a']))
+        self.assertEqual(([1, 2, 0], []), graph.topological_order())
+
+    def test_in_place_modification_is_no_self_dependency(self):
+        graph = make_graph(make_command(1, [], ['a']),
+                           make_command(2, ['a'], ['a']))
+        self.assertEqual(set(), graph.successors(1))
+        self.assertEqual(([0, 1], []), graph.topological_order())
+        self.assertEqual({PATHS.get_id('/home/user/a'): [0, 1]}, graph.rewritten_paths())
+
+    def test_required_commands(self):
+        graph = make_graph(make_command(1, [], ['a']),
+                           make_command(2, [], ['b']),
+                           make_command(3, ['a'], ['c']),
+                           make_command(4, ['b'], ['d']),
+                           make_command(5, ['c', 'x'], ['e']))
+        pathId = PATHS.get_id
+        self.assertEqual([0, 2, 4], graph.required_commands([pathId('/home/user/e')]))
+        self.assertEqual([0, 1, 2, 3], graph.required_commands([pathId('/home/user/c'), pathId('/home/user/d')]))
+        self.assertEqual([], graph.required_commands([]))
+
+    def test_cycle(self):
+        graph = make_graph(make_command(1, [], ['x']),
+                           make_command(2, ['a'], ['b']),
+                           make_command(3, ['b'], ['a']),
+                           make_command(4, ['a'], ['c']),
+                           make_command(5, ['x'], ['d']))
+        self.assertEqual(([0, 4, 1, 2, 3], [1, 2, 3]), graph.topological_order())
+
+
+if __name__ == '__main__':
+    unittest.main()
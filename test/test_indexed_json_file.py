@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+
+from shournal_to_snakemake.indexed_json_file import IndexedJsonFile, INDEX_SUFFIX
+from shournal_to_snakemake.json_decoder import JsonDecoder
+from shournal_to_snakemake.command_selection import CommandSelection
+
+
+def _write_session(path, nCommands):
+    with open(path, 'w') as f:
+        f.write('HEADER:' + json.dumps({'pathToReadFiles': '/tmp'}) + '\n')
+        for i in range(1, nCommands + 1):
+            cmd = {'id': i * 10, 'command': 'cmd{}'.format(i), 'workingDir': '/home/user',
+                   'startTime': '2020-05-18T17:00:{:02d}'.format(i),
+                   'fileReadEvents': [], 'fileWriteEvents': [{'id': i, 'path': '/home/user/f{}'.format(i)}]}
+            f.write('COMMAND:' + json.dumps(cmd) + '\n')
+        f.write('FOOTER:{}\n')
+
+
+class IndexedJsonFileTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmpdir.name, 'session.json')
+        _write_session(self.path, 10)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _select_ids(self, decoder, selection):
+        f = IndexedJsonFile(self.path, decoder)
+        try:
+            return [c.id for c in f.iter_commands(f.select(selection))]
+        finally:
+            f.close()
+
+    def test_select(self):
+        for backend in ('json', 'auto'):
+            decoder = JsonDecoder(backend)
+            f = IndexedJsonFile(self.path, decoder)
+            self.assertEqual(10, len(f))
+            self.assertTrue(f.headerLine.startswith(b'HEADER:'))
+            self.assertEqual(list(range(10, 110, 10)), [c.id for c in f.iter_commands()])
+            f.close()
+
+            selection = CommandSelection()
+            selection.firstId = 30
+            selection.lastId = 50
+            self.assertEqual([30, 40, 50], self._select_ids(decoder, selection))
+
+            selection = CommandSelection()
+            selection.startTimeFrom = '2020-05-18T17:00:02'
+            selection.startTimeTo = '2020-05-18T17:00:08'
+            selection.lastCount = 2
+            self.assertEqual([60, 70], self._select_ids(decoder, selection))
+
+    def test_index_reuse(self):
+        decoder = JsonDecoder('json')
+        IndexedJsonFile(self.path, decoder).close()
+        self.assertTrue(os.path.exists(self.path + INDEX_SUFFIX))
+
+        # the index is used instead of the content
+        selection = CommandSelection()
+        selection.lastCount = 1
+        self.assertEqual([100], self._select_ids(decoder, selection))
+
+        # outdated index
+        _write_session(self.path, 12)
+        self.assertEqual([120], self._select_ids(decoder, selection))
+
+    def test_selection_stream(self):
+        selection = CommandSelection()
+        selection.firstId = 2
+        selection.lastCount = 2
+
+        class _Cmd:
+            def __init__(self, id):
+                self.id = id
+                self.startTime = ''
+        self.assertEqual([4, 5], [c.id for c in selection.filter_commands(_Cmd(i) for i in range(6))])
+
+
+if __name__ == '__main__':
+    unittest.main()
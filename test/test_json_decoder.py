@@ -0,0 +1,34 @@
+import json
+import unittest
+
+from shournal_to_snakemake.json_decoder import JsonDecoder, BACKENDS
+from shournal_to_snakemake.command import FileReadEvent, FileWriteEvent
+
+
+_RAW_COMMAND = {'command': 'cat r1 > w1', 'id': 3, 'workingDir': '/home/user',
+                'fileReadEvents': [{'id': 1, 'path': '/home/user/r1', 'isStoredToDisk': False}],
+                'fileWriteEvents': [{'id': 2, 'path': '/home/user/w1'}]}
+
+
+class JsonDecoderTest(unittest.TestCase):
+    def test_backends(self):
+        data = json.dumps(_RAW_COMMAND).encode()
+        for backend in BACKENDS:
+            try:
+                decoder = JsonDecoder(backend)
+            except ImportError:
+                continue
+            cmd = decoder.decode_command(data)
+            self.assertEqual(3, cmd.id)
+            self.assertEqual('cat r1 > w1', cmd.command)
+            self.assertIsInstance(cmd.fileReadEvents[0], FileReadEvent)
+            self.assertIsInstance(cmd.fileWriteEvents[0], FileWriteEvent)
+            self.assertEqual('/home/user/w1', cmd.fileWriteEvents[0].path)
+
+    def test_auto(self):
+        decoder = JsonDecoder()
+        self.assertIn(decoder.backend, BACKENDS)
+
+
+if __name__ == '__main__':
+    unittest.main()
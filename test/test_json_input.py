@@ -0,0 +1,61 @@
+import gzip
+import json
+import lzma
+import os
+import tempfile
+import unittest
+
+from shournal_to_snakemake.json_input import open_input, parse_header, iter_commands, merge_by_start_time
+from shournal_to_snakemake.json_decoder import JsonDecoder
+
+
+def _session_bytes(cmdIdsAndTimes):
+    lines = ['HEADER:' + json.dumps({'pathToReadFiles': '/tmp'})]
+    for cmdId, startTime in cmdIdsAndTimes:
+        cmd = {'id': cmdId, 'command': 'cmd', 'workingDir': '/home/user', 'startTime': startTime,
+               'fileReadEvents': [], 'fileWriteEvents': []}
+        lines.append('COMMAND:' + json.dumps(cmd))
+    lines.append('FOOTER:{}')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+class JsonInputTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _write(self, name, opener, data):
+        path = os.path.join(self._tmpdir.name, name)
+        with opener(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_merge_compressed(self):
+        decoder = JsonDecoder('json')
+        paths = [
+            self._write('s1.json', open, _session_bytes([(1, '2020-01-01T10:00'), (4, '2020-01-01T13:00')])),
+            self._write('s2.json.gz', gzip.open, _session_bytes([(2, '2020-01-01T11:00')])),
+            self._write('s3.json.xz', lzma.open, _session_bytes([(3, '2020-01-01T12:00'),
+                                                                 (5, '2020-01-01T14:00')])),
+        ]
+        streams = []
+        for path in paths:
+            f = open_input(path)
+            header = parse_header(f.readline(), decoder)
+            self.assertEqual('/tmp', header.pathToReadFiles)
+            streams.append(iter_commands(f, decoder))
+
+        self.assertEqual([1, 2, 3, 4, 5], [c.id for c in merge_by_start_time(streams)])
+
+    def test_invalid_header(self):
+        decoder = JsonDecoder('json')
+        with self.assertRaises(ValueError):
+            parse_header(b'', decoder)
+        with self.assertRaises(ValueError):
+            parse_header(b'COMMAND:{}', decoder)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from shournal_to_snakemake.lru_cache import LruCache
+
+
+class LruCacheTest(unittest.TestCase):
+    def test_eviction(self):
+        cache = LruCache(maxSize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        # b was used least recently
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(2, len(cache))
+        self.assertEqual((3, 1), (cache.hits, cache.misses))
+
+    def test_disabled(self):
+        cache = LruCache(maxSize=0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import re
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from shournal_to_snakemake.__main__ import real_main
+from test.factories import make_raw_command, make_session_bytes
+
+# (id, command, read paths, written paths), in the order of execution
+_SESSION = [
+    (1, 'echo a > a', [], ['a']),
+    (2, 'echo b > b', [], ['b']),
+    (3, 'ls', ['a'], []),
+    (4, 'cat a b > c', ['a', 'b'], ['c']),
+    (5, 'echo a > a', [], ['a']),
+    (6, 'sort c > d', ['c', '/usr/bin/sort'], ['d', '/tmp/sort.log']),
+    # second half
+    (7, 'cat a b > c', ['a', 'b'], ['c']),
+    (8, 'wc -l d > e', ['d'], ['e']),
+    (9, 'echo x > x', [], ['x']),
+    (10, 'cat x e > f', ['x', 'e'], ['f']),
+]
+_FIRST_HALF = 6
+
+
+class MainTest(unittest.TestCase):
+    """
+    Each mode of operation must produce the same rules as the default run.
+    """
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.session = self._write_session('session.json', _SESSION)
+        self.expected = self._run_to_file('default', self.session)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self._tmpdir.name, name)
+
+    def _write_session(self, name, commands):
+        path = self._path(name)
+        with open(path, 'wb') as f:
+            f.write(make_session_bytes([make_raw_command(*c) for c in commands]))
+        return path
+
+    def _run(self, *args):
+        with mock.patch.object(sys, 'argv', ['shournal-to-snakemake'] + list(args)):
+            real_main()
+
+    def _run_to_file(self, name, *args):
+        path = self._path(name)
+        self._run('-o', path, *args)
+        return _read(path)
+
+    def test_default(self):
+        # without duplicates and commands, which did not write files
+        self.assertEqual(['echo a > a', 'echo b > b', 'cat a b > c', 'sort c > d', 'wc -l d > e', 'echo x > x',
+                          'cat x e > f'], re.findall(r'# raw: (.*)', self.expected))
+
+    def test_stream(self):
+        self.assertEqual(self.expected, self._run_to_file('stream', '--stream', self.session))
+        self.assertEqual(self.expected, self._run_to_file('stream_jobs', '--stream', '--jobs', '2', self.session))
+
+    def test_jobs(self):
+        self.assertEqual(self.expected, self._run_to_file('jobs', '--jobs', '2', self.session))
+
+    def test_state(self):
+        first = self._write_session('first.json', _SESSION[:_FIRST_HALF])
+        second = self._write_session('second.json', _SESSION[_FIRST_HALF:])
+        state = self._path('state')
+        output = self._run_to_file('first', '--state', state, first)
+        output += self._run_to_file('second', '--state', state, second)
+        self.assertEqual(self.expected, output)
+
+    def test_update(self):
+        snakefile = self._path('Snakefile')
+        self._run('--update', snakefile, self.session)
+        withFingerprints = _read(snakefile)
+        self.assertEqual(self.expected, re.sub(r'(?m)^ *# fingerprint: .*\n', '', withFingerprints))
+        self._run('--update', snakefile, self.session)
+        self.assertEqual(withFingerprints, _read(snakefile))
+
+    def test_shards(self):
+        snakefile = self._path('Snakefile')
+        self._run('-o', snakefile, '--shards', '3', self.session)
+        self.assertEqual(''.join('include: "rules/part_{}.smk"\n'.format(k) for k in range(1, 4)), _read(snakefile))
+        parts = [_read(self._path('rules/part_{}.smk'.format(k))) for k in range(1, 4)]
+        self.assertEqual(self.expected, ''.join(parts))
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from shournal_to_snakemake.path_filter import PathPrefixFilter
+
+
+class PathPrefixFilterTest(unittest.TestCase):
+    def test_most_specific_root_wins(self):
+        f = PathPrefixFilter(default=True)
+        f.add_root('/mnt', False)
+        f.add_root('/mnt/data', True)
+        f.add_root('/mnt/data/tmp', False)
+
+        self.assertTrue(f.keeps('/home/user/file'))
+        self.assertFalse(f.keeps('/mnt/file'))
+        self.assertFalse(f.keeps('/mnt/database'))
+        self.assertTrue(f.keeps('/mnt/data/file'))
+        self.assertTrue(f.keeps('/mnt/data'))
+        self.assertFalse(f.keeps('/mnt/data/tmp/a/b'))
+
+    def test_default_drop(self):
+        f = PathPrefixFilter(default=False)
+        f.add_root('/home/user', True)
+        self.assertTrue(f.keeps('/home/user/a'))
+        self.assertFalse(f.keeps('/home/user2/a'))
+        self.assertFalse(f.keeps('/usr/lib/a'))
+
+    def test_exclude_root_itself(self):
+        f = PathPrefixFilter(default=False)
+        f.add_root('/home/user', True, includeRoot=False)
+        self.assertTrue(f.keeps('/home/user/a'))
+        self.assertFalse(f.keeps('/home/user'))
+        f.add_root('/home/user/a', False)
+        self.assertFalse(f.keeps('/home/user/a/b'))
+        # an equal root overwrites the decision for the paths below
+        f.add_root('/home/user', False)
+        self.assertFalse(f.keeps('/home/user/b'))
+
+    def test_filesystem_root(self):
+        f = PathPrefixFilter(default=True)
+        f.add_root('/', False)
+        f.add_root('/home/', True)
+        self.assertFalse(f.keeps('/usr/lib/a'))
+        self.assertTrue(f.keeps('/home/a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import pickle
+import unittest
+
+from shournal_to_snakemake.path_table import PathTable, PATHS
+from shournal_to_snakemake.command import FileReadEvent, FileWriteEvent
+
+
+class PathTableTest(unittest.TestCase):
+    def test_intern(self):
+        table = PathTable()
+        self.assertIsNone(table.get_id('/a/b'))
+        i1 = table.intern('/a/b')
+        i2 = table.intern('/a/c')
+        self.assertNotEqual(i1, i2)
+        self.assertEqual(i1, table.intern('/a/' + 'b'))
+        self.assertEqual(i1, table.get_id('/a/b'))
+        self.assertEqual('/a/c', table.paths[i2])
+        self.assertEqual(2, len(table))
+
+    def test_file_events(self):
+        r1 = FileReadEvent(id=1, path='/home/user/f')
+        r2 = FileReadEvent(id=2, path='/home/user/' + 'f')
+        w1 = FileWriteEvent(id=3, path='/home/user/f')
+        self.assertEqual(r1.pathId, w1.pathId)
+        self.assertEqual(r1, r2)
+        self.assertEqual(r1.pathId, r2.pathId)
+        self.assertIs(r1.path, r2.path)
+        self.assertNotEqual(r1, w1)
+        self.assertEqual(1, len({r1, r2}))
+        self.assertEqual(PATHS.get_id('/home/user/f'), r1.pathId)
+
+    def test_pickle(self):
+        r1 = FileReadEvent(id=1, path='/home/user/pickled', isStoredToDisk=True)
+        r1.varnameIO = 'in_0'
+        r2 = pickle.loads(pickle.dumps(r1))
+        self.assertEqual(r1, r2)
+        self.assertEqual('in_0', r2.varnameIO)
+        self.assertTrue(r2.isStoredToDisk)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import io
+import json
+import unittest
+
+from shournal_to_snakemake.record_printer import JsonLinesPrinter, MsgpackPrinter, rule_record
+from shournal_to_snakemake.rule_grouping import group_rules
+from shournal_to_snakemake.rule_printer import OutputSink
+from test.factories import make_rule
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class RecordPrinterTest(unittest.TestCase):
+    def test_record(self):
+        self.assertEqual({'rulename': 'undefined_1', 'commandId': 1,
+                          'startTime': '2020-05-18T17:01:00', 'endTime': '2020-05-18T17:01:30',
+                          'workingDir': '/home/user',
+                          'rawCommand': 'cat r1 > w1.txt', 'processedCommand': 'cat {input} > {output}',
+                          'input': [{'path': '/home/user/r1', 'varname': None}],
+                          'output': [{'path': '/home/user/w1.txt', 'varname': None}]},
+                         rule_record(make_rule(1)))
+
+    def test_wildcard_record(self):
+        _, wildcardRule = group_rules([make_rule(1), make_rule(2), make_rule(3)])
+        record = rule_record(wildcardRule)
+        self.assertEqual(['2', '3'], record['wildcardValues'])
+        self.assertEqual([2, 3], record['memberCommandIds'])
+        self.assertEqual('/home/user/w{wildcard}.txt', record['output'][0]['path'])
+
+    def test_jsonl(self):
+        printer = JsonLinesPrinter()
+        out = io.BytesIO()
+        printer.sink = OutputSink(out)
+        rules = [make_rule(i) for i in range(1, 4)]
+        for rule in rules:
+            printer.print(rule)
+        printer.sink.close()
+        lines = out.getvalue().decode().splitlines()
+        self.assertEqual([rule_record(r) for r in rules], [json.loads(line) for line in lines])
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        printer = MsgpackPrinter()
+        out = io.BytesIO()
+        printer.sink = OutputSink(out, encoding=None)
+        rules = [make_rule(i) for i in range(1, 4)]
+        for rule in rules:
+            printer.print(rule)
+        printer.sink.close()
+        unpacker = msgpack.Unpacker(io.BytesIO(out.getvalue()), raw=False)
+        self.assertEqual([rule_record(r) for r in rules], list(unpacker))
+
+
+if __name__ == '__main__':
+    unittest.main()
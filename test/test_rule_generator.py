@@ -0,0 +1,61 @@
+import threading
+import time
+import unittest
+
+from shournal_to_snakemake.rule_generator import RuleGenerator
+from test.factories import make_commands
+
+
+class RuleGeneratorTest(unittest.TestCase):
+    def test_sequential(self):
+        generator = RuleGenerator()
+        rules = list(generator.generate(make_commands(3)))
+        self.assertEqual(['undefined_1', 'undefined_2', 'undefined_3'], [r.rulename for r in rules])
+        self.assertEqual(3, generator.ruleCounter)
+
+    def test_parallel_keeps_order(self):
+        cmds = make_commands(50)
+        expected = [(r.rulename, r.processedCommandString, r.rawCommandString)
+                    for r in RuleGenerator().generate(cmds)]
+
+        generator = RuleGenerator()
+        generator.jobs = 3
+        generator.chunkSize = 4
+        actual = [(r.rulename, r.processedCommandString, r.rawCommandString)
+                  for r in generator.generate(make_commands(50))]
+        self.assertEqual(expected, actual)
+
+    def test_parallel_idle_input(self):
+        cmds = make_commands(5)
+        inputDone = threading.Event()
+
+        def growing_session():
+            yield from cmds[:3]
+            # e.g. waiting for the user to run the next command
+            inputDone.wait(30)
+            yield from cmds[3:]
+
+        generator = RuleGenerator()
+        generator.jobs = 2
+        generator.idleTimeout = 0.05
+        rules = generator.generate(growing_session())
+        startTime = time.monotonic()
+        self.assertEqual(['undefined_1', 'undefined_2', 'undefined_3'], [next(rules).rulename for _ in range(3)])
+        self.assertLess(time.monotonic() - startTime, 20)
+        inputDone.set()
+        self.assertEqual(['undefined_4', 'undefined_5'], [r.rulename for r in rules])
+
+    def test_parallel_input_error(self):
+        def failing_session():
+            yield from make_commands(2)
+            raise ValueError('invalid input')
+
+        generator = RuleGenerator()
+        generator.jobs = 2
+        generator.idleTimeout = 0.05
+        with self.assertRaises(ValueError):
+            list(generator.generate(failing_session()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from shournal_to_snakemake.rule_grouping import group_rules, WildcardRule
+from shournal_to_snakemake.rule_printer import RulePrinter
+from test.factories import make_rule_of
+
+
+class RuleGroupingTest(unittest.TestCase):
+    def test_sample_loop(self):
+        rules = [make_rule_of('touch ref.fa', [], ['ref.fa'])]
+        for s in ('s1', 's2', 's10'):
+            rules.append(make_rule_of('bwa mem ref.fa raw/{0}.fq > aln/{0}.sam'.format(s),
+                                      ['ref.fa', 'raw/{}.fq'.format(s)], ['aln/{}.sam'.format(s)]))
+        rules.append(make_rule_of('cat aln/s1.sam > all', ['aln/s1.sam'], ['all']))
+
+        grouped = group_rules(rules)
+        self.assertEqual([rules[0], rules[4]], [grouped[0], grouped[2]])
+        wildcardRule = grouped[1]
+        self.assertIsInstance(wildcardRule, WildcardRule)
+        self.assertEqual(rules[1:4], wildcardRule.members)
+        self.assertEqual(['1', '2', '10'], wildcardRule.wildcardValues)
+        self.assertEqual('bwa mem {input} > {output}', wildcardRule.processedCommandString)
+        self.assertEqual(['/home/user/ref.fa', '/home/user/raw/s{wildcard}.fq'],
+                         [f.path for f in wildcardRule.input])
+        self.assertEqual(['/home/user/aln/s{wildcard}.sam'], [f.path for f in wildcardRule.output])
+
+    def test_inconsistent_wildcards(self):
+        rules = [make_rule_of('cat a1.txt > b2.txt', ['a1.txt'], ['b2.txt']),
+                 make_rule_of('cat a2.txt > b3.txt', ['a2.txt'], ['b3.txt'])]
+        self.assertEqual(rules, group_rules(rules))
+
+    def test_whole_file_name_is_no_wildcard(self):
+        rules = [make_rule_of('echo x > a', [], ['a']),
+                 make_rule_of('echo x > b', [], ['b'])]
+        self.assertEqual(rules, group_rules(rules))
+
+    def test_unreferenced_files(self):
+        # the files read by the interpreter are not part of the command string
+        rules = [make_rule_of('python run.py {0}.csv > {0}.out'.format(s),
+                              ['lib/{}.py'.format(n) for n in ('b', 'a', 'c')] + ['run.py', s + '.csv'],
+                              [s + '.out'])
+                 for s in ('x0', 'x1', 'x2')]
+        # ... and their order is arbitrary
+        missing = [f for f in rules[2].input if 'missing' in f.varnameIO]
+        rules[2].input = missing[::-1] + [f for f in rules[2].input if f not in missing]
+        grouped = group_rules(rules)
+        self.assertEqual(2, len(grouped))
+        self.assertEqual([('/home/user/run.py', 'in_0'), ('/home/user/x{wildcard}.csv', 'in_1'),
+                          ('/home/user/lib/a.py', 'in_missing_0'), ('/home/user/lib/b.py', 'in_missing_1'),
+                          ('/home/user/lib/c.py', 'in_missing_2')],
+                         [(f.path, f.varnameIO) for f in grouped[1].input])
+
+    def test_first_rule_stays_concrete(self):
+        # the first rule is snakemake's default target, which must not have wildcards
+        rules = [make_rule_of('cat raw/{0}.fq > {0}.out'.format(s), ['raw/{}.fq'.format(s)], ['{}.out'.format(s)])
+                 for s in ('s1', 's2', 's3')]
+        grouped = group_rules(rules)
+        self.assertIs(rules[0], grouped[0])
+        self.assertEqual(rules[1:], grouped[1].members)
+        self.assertEqual(['2', '3'], grouped[1].wildcardValues)
+
+        self.assertEqual(rules[:2], group_rules(rules[:2]))
+
+    def test_render_wildcard_constraints(self):
+        rules = [make_rule_of('touch ref.fa', [], ['ref.fa'])]
+        rules += [make_rule_of('cat raw/{0}.fq > {0}.out'.format(s), ['raw/{}.fq'.format(s)], ['{}.out'.format(s)])
+                  for s in ('s.1', 's.2', 's.10')]
+        wildcardRule = group_rules(rules)[1]
+        self.assertEqual('rule {}:\n'
+                         '    input:\n'
+                         '        "raw/s.{{wildcard}}.fq",\n'
+                         '    output:\n'
+                         '        "s.{{wildcard}}.out",\n'
+                         '    wildcard_constraints:\n'
+                         '        wildcard="1|2|10",\n'
+                         '    shell:\n'
+                         '        # raw: cat raw/s.1.fq > s.1.out\n'
+                         '        "cat {{input}} > {{output}}"\n'
+                         '\n\n'.format(wildcardRule.rulename), RulePrinter().render(wildcardRule))
+
+        wildcardRule.wildcardValues = ['a.b', 'c+']
+        self.assertIn('        wildcard="a\\\\.b|c\\\\+",\n', RulePrinter().render(wildcardRule))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from shournal_to_snakemake.rule_printer import RulePrinter, OutputSink, ThreadedOutputSink, AtomicFile
+from test.factories import make_rule
+
+
+class _FailingFile:
+    def write(self, data):
+        raise OSError("disk full")
+
+    def flush(self):
+        pass
+
+
+class _FlushRecordingFile(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.flushed = threading.Event()
+
+    def flush(self):
+        super().flush()
+        self.flushed.set()
+
+
+class RulePrinterTest(unittest.TestCase):
+    def test_render(self):
+        self.assertEqual('rule undefined_1:\n'
+                         '    input:\n'
+                         '        "r1",\n'
+                         '    output:\n'
+                         '        "w1.txt",\n'
+                         '    shell:\n'
+                         '        # raw: cat r1 > w1.txt\n'
+                         '        "cat {input} > {output}"\n'
+                         '\n\n', RulePrinter().render(make_rule(1)))
+
+    def test_sinks(self):
+        printer = RulePrinter()
+        rules = [make_rule(i) for i in range(50)]
+        expected = ''.join(printer.render(r) for r in rules).encode()
+        for sinkClass in (OutputSink, ThreadedOutputSink):
+            out = io.BytesIO()
+            printer.sink = sinkClass(out, chunkSize=100)
+            for rule in rules:
+                printer.print(rule)
+            printer.sink.close()
+            self.assertEqual(expected, out.getvalue())
+
+    def test_auto_flush(self):
+        printer = RulePrinter()
+        rule = make_rule(1)
+        for sinkClass in (OutputSink, ThreadedOutputSink):
+            out = _FlushRecordingFile()
+            printer.sink = sinkClass(out)
+            printer.sink.autoFlush = True
+            printer.print(rule)
+            # written before the sink is closed
+            self.assertTrue(out.flushed.wait(timeout=5))
+            self.assertEqual(printer.render(rule).encode(), out.getvalue())
+            printer.sink.close()
+
+    def test_threaded_sink_error(self):
+        sink = ThreadedOutputSink(_FailingFile(), chunkSize=1, maxPendingChunks=1)
+        with self.assertRaises(OSError):
+            for _ in range(100):
+                sink.write('x')
+            sink.close()
+
+    def test_atomic_file(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            path = os.path.join(tmpDir, 'Snakefile')
+            with open(path, 'w') as f:
+                f.write('old')
+            f = AtomicFile(path)
+            f.write(b'new')
+            f.discard()
+            self.assertEqual(['Snakefile'], os.listdir(tmpDir))
+            with open(path) as f:
+                self.assertEqual('old', f.read())
+
+            f = AtomicFile(path)
+            f.write(b'new')
+            f.commit()
+            self.assertEqual(['Snakefile'], os.listdir(tmpDir))
+            with open(path) as f:
+                self.assertEqual('new', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from shournal_to_snakemake.rule_generator import RuleGenerator
+from shournal_to_snakemake.rule_printer import RulePrinter
+from shournal_to_snakemake.sharded_output import shard_by_count, shard_by_component, write_shards
+from test.factories import make_command, make_graph
+
+
+def _make_graph_and_rules(*commands):
+    return make_graph(*commands), list(RuleGenerator().generate(commands))
+
+
+class ShardedOutputTest(unittest.TestCase):
+    def test_shard_by_count(self):
+        rules = list(range(7))
+        self.assertEqual([[0, 1, 2], [3, 4], [5, 6]], shard_by_count(rules, 3))
+        self.assertEqual([[0], [1]], shard_by_count(rules[:2], 3))
+
+    def test_shard_by_component(self):
+        graph, rules = _make_graph_and_rules(make_command(1, [], ['a']),
+                                             make_command(2, [], ['b']),
+                                             make_command(3, ['a'], ['c']),
+                                             make_command(4, ['x'], ['d']),
+                                             make_command(5, ['c'], ['e']))
+        self.assertEqual([0, 1, 0, 3, 0], graph.connected_components())
+        shards = shard_by_component(rules, graph, 2)
+        self.assertEqual([['undefined_1', 'undefined_3', 'undefined_5'], ['undefined_2', 'undefined_4']],
+                         [[r.rulename for r in shard] for shard in shards])
+        self.assertEqual(3, len(shard_by_component(rules, graph, 5)))
+
+    def test_shard_by_component_parallel(self):
+        commands = [make_command(1, [], ['a']),
+                    make_command(2, [], ['b']),
+                    make_command(3, ['a'], ['c'])]
+        graph = make_graph(*commands)
+        generator = RuleGenerator()
+        generator.jobs = 2
+        generator.chunkSize = 1
+        shards = shard_by_component(list(generator.generate(commands)), graph, 2)
+        self.assertEqual([['undefined_1', 'undefined_3'], ['undefined_2']],
+                         [[r.rulename for r in shard] for shard in shards])
+
+    def test_write_shards(self):
+        graph, rules = _make_graph_and_rules(make_command(1, [], ['a']),
+                                             make_command(2, ['a'], ['b']),
+                                             make_command(3, [], ['c']))
+        printer = RulePrinter()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            snakefile = os.path.join(tmpdir, 'Snakefile')
+            write_shards(snakefile, shard_by_count(rules, 2), printer)
+            self.assertEqual(['Snakefile', 'rules'], sorted(os.listdir(tmpdir)))
+            self.assertEqual(['part_1.smk', 'part_2.smk'], sorted(os.listdir(os.path.join(tmpdir, 'rules'))))
+            with open(snakefile) as f:
+                self.assertEqual('include: "rules/part_1.smk"\ninclude: "rules/part_2.smk"\n', f.read())
+            with open(os.path.join(tmpdir, 'rules', 'part_1.smk')) as f:
+                self.assertEqual(printer.render(rules[0]) + printer.render(rules[1]), f.read())
+
+    def test_write_fewer_shards(self):
+        _, rules = _make_graph_and_rules(*[make_command(i, [], ['w{}'.format(i)]) for i in range(1, 5)])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            snakefile = os.path.join(tmpdir, 'Snakefile')
+            rulesDir = os.path.join(tmpdir, 'rules')
+            write_shards(snakefile, shard_by_count(rules, 4), RulePrinter())
+            with open(os.path.join(rulesDir, 'notes.txt'), 'w') as f:
+                f.write('not generated')
+            write_shards(snakefile, shard_by_count(rules, 2), RulePrinter())
+            self.assertEqual(['notes.txt', 'part_1.smk', 'part_2.smk'], sorted(os.listdir(rulesDir)))
+
+
+if __name__ == '__main__':
+    unittest.main()
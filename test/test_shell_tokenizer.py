@@ -135,7 +135,33 @@ class ShellTokenizerTest(unittest.TestCase):
 
         self.assertEqual([t1, t2, t3, t4, t5], tokens)
 
+    def test_deep_nesting(self):
+        tokenizer = ShellTokenizer()
+        depth = 3000
+        cmd = 'echo ' + '"$(echo ' * depth + 'x' + ')"' * depth
+        tokens = tokenizer.split(cmd)
 
+        # echo, ' ', and per level: outer token, $(, echo, ' ' and finally x and the closing )'s
+        self.assertEqual(2 + depth * 4 + 1 + depth, len(tokens))
+        self.assertEqual(Token(string=ShellTokenizer.COMMAND_SUBST_PLACEHOLDER, isSplitter=False,
+                               startIdx=5, endIdx=len(cmd)), tokens[2])
+        innermost = depth * len('"$(echo ') + 5
+        self.assertEqual(Token(string='x', isSplitter=False, startIdx=innermost, endIdx=innermost + 1),
+                         tokens[2 + depth * 4])
+        for t in tokens:
+            if t.isSplitter:
+                self.assertEqual(t.string, cmd[t.startIdx:t.endIdx])
+
+        with self.assertRaises(ValueError):
+            tokenizer.split(cmd[:-1])
+
+    def test_long_command(self):
+        tokenizer = ShellTokenizer()
+        quoted = 'line\n' * 100000
+        cmd = "cat <<< '" + quoted + "' > out.txt"
+        tokens = tokenizer.split(cmd)
+        self.assertEqual(['cat', ' ', '<<', '<', ' ', quoted, ' ', '>', ' ', 'out.txt'], [t.string for t in tokens])
+        self.assertEqual(len(cmd), tokens[-1].endIdx)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from shournal_to_snakemake.shell_tokenizer import ShellTokenizer
+from test.reference_shell_tokenizer import ReferenceShellTokenizer
+
+# weighted towards the characters with special meaning
+_ALPHABET = ['a', 'b', 'foo', '/', '.', '$', '(', ')', '$(', '`', '"', "'", '\\', ' ', '\t', '\n',
+             '|', '||', '&', ';', '=', '<', '>', '>>', '#', 'ä']
+
+
+def _tokenize(tokenizer, cmd):
+    try:
+        return [(t.string, t.isSplitter, t.startIdx, t.endIdx) for t in tokenizer.split(cmd)]
+    except ValueError as e:
+        return str(e)
+
+
+class ShellTokenizerDifferentialTest(unittest.TestCase):
+    """
+    The scanner-based ShellTokenizer must produce exactly the tokens (or errors)
+    of the original implementation.
+    """
+    def test_random_commands(self):
+        rand = random.Random(4711)
+        tokenizer = ShellTokenizer()
+        for _ in range(20000):
+            cmd = ''.join(rand.choice(_ALPHABET) for _ in range(rand.randint(0, 25)))
+            self.assertEqual(_tokenize(ReferenceShellTokenizer(), cmd), _tokenize(tokenizer, cmd), repr(cmd))
+
+    def test_realistic_commands(self):
+        tokenizer = ShellTokenizer()
+        for cmd in ('cat "$(ls -1 *.txt)" > all.txt',
+                    'for s in s1 s2; do bwa mem ref.fa raw/$s.fq > aln/$s.sam; done # align',
+                    "awk '{print $1}' in.tsv | sort -u >> out\\ file.txt",
+                    'echo "`date` \\"quoted\\" $(echo \'x\')" && python run.py --in=data/a.csv'):
+            self.assertEqual(_tokenize(ReferenceShellTokenizer(), cmd), _tokenize(tokenizer, cmd), cmd)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import uuid
+
+from shournal_to_snakemake.shournal_database import ShournalDatabase
+from shournal_to_snakemake.command_selection import CommandSelection
+
+
+_SCHEME = """
+CREATE TABLE env (id INTEGER PRIMARY KEY, hostname TEXT, username TEXT);
+CREATE TABLE hashmeta (id INTEGER PRIMARY KEY, chunkSize INTEGER, maxCountOfReads INTEGER);
+CREATE TABLE cmd (id INTEGER PRIMARY KEY, envId INTEGER, hashmetaId INTEGER, txt TEXT,
+                  returnVal INTEGER, startTime DATETIME, endTime DATETIME,
+                  workingDirectory TEXT, sessionId BLOB);
+CREATE TABLE writtenFile (id INTEGER PRIMARY KEY, cmdId INTEGER, path TEXT, name TEXT,
+                          mtime DATETIME, size INTEGER, hash INTEGER);
+CREATE TABLE readFile (id INTEGER PRIMARY KEY, path TEXT, name TEXT, mtime DATETIME,
+                       size INTEGER, mode INTEGER, hash INTEGER, isStoredToDisk INTEGER);
+CREATE TABLE readFileCmd (cmdId INTEGER, readFileId INTEGER, PRIMARY KEY (cmdId, readFileId));
+CREATE INDEX writtenFile_cmdId ON writtenFile(cmdId);
+"""
+
+_SESSION_1 = uuid.UUID('12345678-1234-5678-1234-567812345678')
+_SESSION_2 = uuid.UUID('87654321-4321-8765-4321-876543218765')
+
+
+def _create_fixture_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEME)
+    conn.execute("INSERT INTO env VALUES (1, 'host', 'user')")
+    conn.execute("INSERT INTO hashmeta VALUES (1, 4096, 20)")
+    cmds = [
+        (1, 'echo stuff > foo', '2020-05-18T17:00:00', '/home/user', _SESSION_1),
+        (2, 'cat foo > bar', '2020-05-18T17:00:05', '/home/user', _SESSION_1),
+        (3, 'ls', '2020-05-18T17:00:10', '/home/user', _SESSION_1),
+        (4, 'cat foo > baz', '2020-05-19T09:00:00', '/tmp', _SESSION_2),
+    ]
+    for cmdId, txt, startTime, cwd, session in cmds:
+        conn.execute("INSERT INTO cmd VALUES (?, 1, 1, ?, 0, ?, ?, ?, ?)",
+                     (cmdId, txt, startTime, startTime, cwd, session.bytes))
+    conn.execute("INSERT INTO writtenFile VALUES (1, 1, '/home/user', 'foo', '', 6, 11)")
+    conn.execute("INSERT INTO writtenFile VALUES (2, 2, '/home/user', 'bar', '', 6, 12)")
+    conn.execute("INSERT INTO writtenFile VALUES (3, 4, '/tmp', 'baz', '', 6, 13)")
+    conn.execute("INSERT INTO readFile VALUES (1, '/home/user', 'foo', '', 6, 0, 11, 0)")
+    conn.execute("INSERT INTO readFile VALUES (2, '/usr/bin', 'ls', '', 6, 0, 14, 1)")
+    conn.execute("INSERT INTO readFileCmd VALUES (2, 1)")
+    conn.execute("INSERT INTO readFileCmd VALUES (3, 2)")
+    conn.execute("INSERT INTO readFileCmd VALUES (4, 1)")
+    conn.commit()
+    conn.close()
+
+
+class ShournalDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.dbPath = os.path.join(self._tmpdir.name, 'database.db')
+        _create_fixture_db(self.dbPath)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_all_commands(self):
+        db = ShournalDatabase(self.dbPath)
+        cmds = list(db.iter_commands())
+        db.close()
+
+        self.assertEqual([1, 2, 3, 4], [c.id for c in cmds])
+        self.assertEqual(['/home/user/foo'], [f.path for f in cmds[0].fileWriteEvents])
+        self.assertEqual([], cmds[0].fileReadEvents)
+        self.assertEqual(['/home/user/foo'], [f.path for f in cmds[1].fileReadEvents])
+        self.assertEqual(['/home/user/bar'], [f.path for f in cmds[1].fileWriteEvents])
+        self.assertEqual('/usr/bin/ls', cmds[2].fileReadEvents[0].path)
+        self.assertTrue(cmds[2].fileReadEvents[0].isStoredToDisk)
+        self.assertEqual('user', cmds[3].username)
+        self.assertEqual(4096, cmds[3].hashChunkSize)
+
+    def test_filters(self):
+        db = ShournalDatabase(self.dbPath)
+        db.sessionId = str(_SESSION_1)
+        self.assertEqual([1, 2, 3], [c.id for c in db.iter_commands()])
+
+        db.selection.lastCount = 2
+        self.assertEqual([2, 3], [c.id for c in db.iter_commands()])
+        db.selection.lastCount = None
+
+        db.selection.startTimeFrom = '2020-05-18T17:00:05'
+        db.selection.startTimeTo = '2020-05-18T17:00:10'
+        self.assertEqual([2], [c.id for c in db.iter_commands()])
+
+        db.sessionId = None
+        db.selection = CommandSelection()
+        db.selection.firstId = 2
+        db.selection.lastId = 3
+        self.assertEqual([2, 3], [c.id for c in db.iter_commands()])
+
+        db.selection = CommandSelection()
+        db.workingDir = '/tmp'
+        cmds = list(db.iter_commands())
+        self.assertEqual([4], [c.id for c in cmds])
+        self.assertEqual(['/home/user/foo'], [f.path for f in cmds[0].fileReadEvents])
+        db.close()
+
+    def test_read_only(self):
+        db = ShournalDatabase(self.dbPath)
+        with self.assertRaises(sqlite3.OperationalError):
+            db._conn.execute("DELETE FROM cmd")
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
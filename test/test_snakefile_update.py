@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from shournal_to_snakemake.rule_generator import RuleGenerator
+from shournal_to_snakemake.rule_printer import RulePrinter
+from shournal_to_snakemake.snakefile_update import update_snakefile, parse_snakefile
+from test.factories import make_command
+
+
+def _update(path, *commands):
+    rules = RuleGenerator().generate(commands)
+    return update_snakefile(path, rules, RulePrinter())
+
+
+def _rule_names_and_commands(path):
+    with open(path) as f:
+        _, blocks = parse_snakefile(f.read())
+    return [(b.name, b.text.split('# raw: ')[1].split('\n')[0]) for b in blocks]
+
+
+class SnakefileUpdateTest(unittest.TestCase):
+    def test_update(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            path = os.path.join(tmpDir, 'Snakefile')
+            self.assertEqual((0, 0, 2), _update(path,
+                                                make_command(1, [], ['a'], command='echo a > a'),
+                                                make_command(2, ['a'], ['b'], command='cat a > b')))
+            with open(path) as f:
+                firstVersion = f.read()
+            self.assertEqual((2, 0, 0), _update(path,
+                                                make_command(1, [], ['a'], command='echo a > a'),
+                                                make_command(2, ['a'], ['b'], command='cat a > b')))
+            with open(path) as f:
+                self.assertEqual(firstVersion, f.read())
+
+            # a is created differently, a new rule was executed before the others
+            self.assertEqual((1, 1, 1), _update(path,
+                                                make_command(3, [], ['c'], command='echo c > c'),
+                                                make_command(4, [], ['a'], command='echo A > a'),
+                                                make_command(5, ['a'], ['b'], command='cat a > b')))
+            self.assertEqual([('undefined_1', 'echo A > a'),
+                              ('undefined_2', 'cat a > b'),
+                              ('undefined_3', 'echo c > c')], _rule_names_and_commands(path))
+            self.assertEqual([], [p for p in os.listdir(tmpDir) if p.endswith('.tmp')])
+
+    def test_unchanged_rules_are_matched_first(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            path = os.path.join(tmpDir, 'Snakefile')
+            self.assertEqual((0, 0, 1), _update(path, make_command(1, [], ['a'], command='echo a > a')))
+            # the new rule writing a comes before the unchanged one
+            self.assertEqual((1, 0, 1), _update(path,
+                                                make_command(2, [], ['a'], command='echo A > a'),
+                                                make_command(3, [], ['a'], command='echo a > a')))
+            self.assertEqual([('undefined_1', 'echo a > a'),
+                              ('undefined_2', 'echo A > a')], _rule_names_and_commands(path))
+
+    def test_foreign_text_is_kept(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            path = os.path.join(tmpDir, 'Snakefile')
+            with open(path, 'w') as f:
+                f.write('configfile: "config.yaml"\n\nrule all:\n    input: "b"\n')
+            self.assertEqual((0, 0, 1), _update(path, make_command(1, [], ['b'], command='echo b > b')))
+            with open(path) as f:
+                text = f.read()
+            self.assertTrue(text.startswith('configfile: "config.yaml"\n\nrule all:\n    input: "b"\n\n'
+                                            'rule undefined_1:\n    # fingerprint: rule='))
+
+
+if __name__ == '__main__':
+    unittest.main()
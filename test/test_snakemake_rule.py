@@ -2,42 +2,18 @@ import unittest
 from os.path import join as joinpath
 
 
-from shournal_to_snakemake.snakemake_rule import SnakemakeRule
-from shournal_to_snakemake.command import Command, FileReadEvent, FileWriteEvent
-
-def _make_read_event(path):
-    _make_read_event.counter += 1
-    f = FileReadEvent(id=_make_read_event.counter, path=path, hash=123,
-                      size= _make_read_event.counter, isStoredToDisk=False)
-    return f
-
-_make_read_event.counter = 0
-
-def _make_write_event(path):
-    _make_write_event.counter += 1
-    f = FileWriteEvent(id=_make_write_event.counter, path=path, hash=123,
-                      size= _make_write_event.counter)
-    return f
-
-_make_write_event.counter = 0
-
-
-def _make_command(cmdstring, workingDir):
-    _make_command.counter += 1
-    c = Command(command=cmdstring, id = _make_command.counter, workingDir=workingDir,
-                fileWriteEvents=[], fileReadEvents=[])
-    return c
-
-_make_command.counter = 0
+from shournal_to_snakemake.snakemake_rule import SnakemakeRule, PARSE_CACHE, _CommandMeta
+from shournal_to_snakemake.shell_tokenizer import Token
+from test.factories import make_command, make_read_event, make_write_event
 
 
 class SnakemakeRuleTest(unittest.TestCase):
     def test_simple(self):
         workingdir = "/home/user"
-        r1 = _make_read_event(joinpath(workingdir, 'r1'))
-        w1 = _make_write_event(joinpath(workingdir, 'w1'))
+        r1 = make_read_event(joinpath(workingdir, 'r1'))
+        w1 = make_write_event(joinpath(workingdir, 'w1'))
 
-        cmd = _make_command("echo hi > w1;cat {}".format(r1.path), workingDir=workingdir )
+        cmd = make_command(command="echo hi > w1;cat {}".format(r1.path), workingDir=workingdir)
         cmd.fileReadEvents.append(r1)
         cmd.fileReadEvents.append(w1)
         rule = SnakemakeRule(cmd)
@@ -51,15 +27,15 @@ class SnakemakeRuleTest(unittest.TestCase):
 
     def test_multi(self):
         workingdir = "/home/user"
-        r1 = _make_read_event(joinpath(workingdir, 'r1'))
+        r1 = make_read_event(joinpath(workingdir, 'r1'))
         # spaces should also work...
-        r2 = _make_read_event(joinpath(workingdir, 'r 2'))
+        r2 = make_read_event(joinpath(workingdir, 'r 2'))
 
-        r3 = _make_read_event(joinpath(workingdir, 'r 3'))
-        w1 = _make_write_event(joinpath(workingdir, 'w1'))
+        r3 = make_read_event(joinpath(workingdir, 'r 3'))
+        w1 = make_write_event(joinpath(workingdir, 'w1'))
 
         # test nested double quotes (r 2) and escaped space (r 3)
-        cmd = _make_command('echo "$(cat r1 "r 2"   r\\ 3)" > w1', workingDir=workingdir)
+        cmd = make_command(command='echo "$(cat r1 "r 2"   r\\ 3)" > w1', workingDir=workingdir)
         cmd.fileReadEvents = [r1, r2, r3]
         cmd.fileReadEvents.append(w1)
         rule = SnakemakeRule(cmd)
@@ -73,10 +49,10 @@ class SnakemakeRuleTest(unittest.TestCase):
 
     def test_vars_simple(self):
         workingdir = "/home/user"
-        r1 = _make_read_event(joinpath(workingdir, 'r1'))
-        r2 = _make_read_event(joinpath(workingdir, 'r2'))
-        w1 = _make_write_event(joinpath(workingdir, 'w1'))
-        cmd = _make_command('cat r1;cat r2 > w1', workingDir=workingdir)
+        r1 = make_read_event(joinpath(workingdir, 'r1'))
+        r2 = make_read_event(joinpath(workingdir, 'r2'))
+        w1 = make_write_event(joinpath(workingdir, 'w1'))
+        cmd = make_command(command='cat r1;cat r2 > w1', workingDir=workingdir)
         cmd.fileReadEvents = [r1, r2]
         cmd.fileReadEvents.append(w1)
         rule = SnakemakeRule(cmd)
@@ -89,7 +65,59 @@ class SnakemakeRuleTest(unittest.TestCase):
         self.assertEqual('cat {{input.{}}};cat {{input.{}}} > {{output}}'.format(r1.varnameIO, r2.varnameIO)
                          , rule.processedCommandString)
 
+    def test_same_filename_in_multiple_dirs(self):
+        workingdir = "/home/user"
+        r1 = make_read_event(joinpath(workingdir, 'a/x'))
+        r2 = make_read_event(joinpath(workingdir, 'b/x'))
+        r3 = make_read_event('/data/x')
+        w1 = make_write_event(joinpath(workingdir, 'x'))
+        cmd = make_command(command='cat ./a/x b/../b/x /data/x > x', workingDir=workingdir)
+        cmd.fileReadEvents = [r3, r2, r1]
+        cmd.fileWriteEvents = [w1]
+        rule = SnakemakeRule(cmd)
 
+        self.assertEqual('cat {input} > {output}', rule.processedCommandString)
+        self.assertEqual([r1, r2, r3], list(rule.input))
+
+    def test_overlapping_paths_keep_command(self):
+        workingdir = "/home/user"
+        r1 = make_read_event(joinpath(workingdir, 'r1'))
+        r1.varnameIO = 'in_0'
+        w1 = make_write_event(joinpath(workingdir, 'w1'))
+        w1.varnameIO = 'out_0'
+        cmd = make_command(command='cat r1 > w1', workingDir=workingdir)
+        rule = SnakemakeRule(cmd)
+
+        cmdMeta = _CommandMeta()
+        cmdMeta.inputNeedsQualifier = cmdMeta.outputNeedsQualifier = True
+        t1 = Token('r1', isSplitter=False, startIdx=4, endIdx=11)
+        t1.attachedFileEvent = r1
+        t2 = Token('w1', isSplitter=False, startIdx=9, endIdx=11)
+        t2.attachedFileEvent = w1
+        cmdMeta.inputTokens.append(t1)
+        cmdMeta.outputTokens.append(t2)
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual('cat r1 > w1', rule._generate_command_string_with_IO_vars(cmdMeta))
+
+        t1.endIdx = 6
+        self.assertEqual('cat {input.in_0} > {output.out_0}', rule._generate_command_string_with_IO_vars(cmdMeta))
+
+    def test_parse_cache(self):
+        workingdir = "/home/user"
+        rules = []
+        hits = PARSE_CACHE.hits
+        for r, w in (('r1', 'w1'), ('r1', 'w2'), ('r1', 'r1')):
+            cmd = make_command(command='cat r1 > w1; cat w1', workingDir=workingdir)
+            cmd.fileReadEvents = [make_read_event(joinpath(workingdir, r))]
+            cmd.fileWriteEvents = [make_write_event(joinpath(workingdir, w))]
+            rules.append(SnakemakeRule(cmd))
+
+        self.assertEqual(hits + 2, PARSE_CACHE.hits)
+        self.assertEqual('cat {input} > {output.out_0}; cat {output.out_0}', rules[0].processedCommandString)
+        # the same command string, but other files were written
+        self.assertEqual('cat {input} > w1; cat w1', rules[1].processedCommandString)
+        self.assertEqual(['out_missing_0'], [f.varnameIO for f in rules[1].output])
+        self.assertEqual('cat {input} > w1; cat w1', rules[2].processedCommandString)
 
 
 if __name__ == '__main__':